@@ -0,0 +1,320 @@
+"""Batch evaluation of many submissions from the command line.
+
+Usage:
+    python batch.py submissions.jsonl --output results.jsonl
+
+Each manifest line is a JSON object (or CSV row) with:
+    id           unique submission ID
+    source       GitHub URL or path to a .zip file
+    description  path to a .txt project description (optional)
+
+Links in any field (the source, a demo URL, ...) are checked concurrently
+before anything is fetched, and submissions with a broken source link fail
+at once. Ingestion runs in a process pool, LLM calls share the bounded async
+client, and one JSON line is appended to the output per submission.
+Re-running with the same output file skips submissions that already
+completed.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dedup import get_default_index
+from evaluator import (DEFAULT_MAX_TOTAL_BYTES, evaluate_project_async, ingest_source,
+                       summarize_records_async)
+from fetcher import is_github_url
+from link_checker import LinkChecker, extract_urls, format_result, is_broken, is_url
+from llm_client import get_default_client
+from metrics_store import DEFAULT_RUBRIC, get_default_store
+from model_tiers import configure_tiers, get_default_tiers
+from results_store import get_default_results_store
+from summary_cache import SummaryCache
+import tracing
+
+STAGES = ('ingest', 'summarize', 'evaluate')
+
+
+def read_manifest(path):
+    """
+    Read submissions from a JSONL or CSV manifest
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            submissions = [dict(row) for row in csv.DictReader(f)]
+        else:
+            submissions = [json.loads(line) for line in f if line.strip() and not line.lstrip().startswith('#')]
+    for submission in submissions:
+        if not submission.get('id') or not submission.get('source'):
+            raise ValueError(f"Manifest entry needs 'id' and 'source': {submission}")
+    return submissions
+
+
+def completed_ids(output_path):
+    """
+    IDs already written successfully to the output file
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash
+                continue
+            if entry.get('status') == 'ok':
+                done.add(entry['id'])
+    return done
+
+
+def ingest_submission(submission, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES, trace=False):
+    """
+    Process-pool worker: fetch and read one submission and its description
+
+    Returns:
+        dict with 'records' (None on failure), 'doc_text', 'seconds' and, if trace is
+        set, the 'trace' recorded in this process for tracing.merge
+    """
+    if trace:
+        tracing.enable()
+    start = time.perf_counter()
+    source = submission['source']
+    is_github_link = is_github_url(source)
+    if is_url(source) and not is_github_link:
+        raise ValueError(f"Only GitHub links and .zip paths are supported, not {source}")
+    records = ingest_source(source, is_github_link, max_total_bytes)
+
+    doc_text = ''
+    if submission.get('description'):
+        with open(submission['description'], 'r', encoding='utf-8', errors='ignore') as f:
+            doc_text = f.read()
+    return {'records': records, 'doc_text': doc_text, 'seconds': time.perf_counter() - start,
+            'trace': tracing.collect() if trace else None}
+
+
+def submission_urls(submission):
+    """
+    Links of a manifest entry: its source if that is a URL, then any URL in its other fields
+    (a demo or video link, for example)
+    """
+    urls = [submission['source']] if is_url(submission['source']) else []
+    for name, value in submission.items():
+        if name != 'source' and isinstance(value, str):
+            urls.extend(extract_urls(value))
+    return list(dict.fromkeys(urls))
+
+
+class BatchRunner:
+    def __init__(self, output_path, ingest_workers=None, max_in_flight=8, mode='per_metric', cache=None,
+                 rubric=None, results=None, duplicates=None, links=None):
+        """
+        Args:
+            output_path (str): JSONL file results are appended to
+            ingest_workers (int): Processes used for ingestion (default: CPU count)
+            max_in_flight (int): Submissions being summarized or evaluated at once; the
+                LLM client's own concurrency limit bounds the requests underneath
+            mode (str): evaluate_project mode
+            rubric (metrics_store.Rubric): Metrics every submission is scored against, so a
+                metrics change during the run cannot mix rubric versions
+            results (results_store.ResultsStore): If given, every evaluation is recorded there
+            duplicates (dedup.DuplicateIndex): If given, submissions are matched against each
+                other and earlier runs for shared template code
+            links (link_checker.LinkChecker): If given, the links of all submissions are
+                checked before anything is fetched; submissions whose source link is broken
+                fail without being fetched
+        """
+        self.output_path = output_path
+        self.ingest_workers = ingest_workers
+        self.max_in_flight = max_in_flight
+        self.mode = mode
+        self.cache = cache
+        self.rubric = rubric
+        self.results = results
+        self.duplicates = duplicates
+        self.links = links
+        self.link_results = {}
+        self.timings = {stage: [] for stage in STAGES}
+        self.succeeded = 0
+        self.failed = 0
+
+    def run(self, submissions):
+        if self.rubric is None:
+            self.rubric = get_default_store().get_rubric()
+        done = completed_ids(self.output_path)
+        pending = [submission for submission in submissions if submission['id'] not in done]
+        skipped = len(submissions) - len(pending)
+        if skipped:
+            print(f"Skipping {skipped} submissions already in {self.output_path}")
+
+        start = time.perf_counter()
+        # Submissions are handed to the pool from the LLM client's loop thread; forking a threaded
+        # process can copy locks other threads hold, so workers are spawned
+        with open(self.output_path, 'a', encoding='utf-8') as output, \
+                ProcessPoolExecutor(max_workers=self.ingest_workers,
+                                    mp_context=multiprocessing.get_context('spawn')) as pool:
+            get_default_client().run(self._run_all(pending, pool, output))
+        self.print_summary(time.perf_counter() - start)
+
+    async def _run_all(self, submissions, pool, output):
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        write_lock = asyncio.Lock()
+        if self.links is not None:
+            await self._check_links(submissions)
+
+        async def run_one(submission):
+            async with in_flight:
+                entry = await self._evaluate_submission(submission, pool)
+            async with write_lock:
+                output.write(json.dumps(entry) + '\n')
+                # Flush every line so a crash loses at most the submissions in flight
+                output.flush()
+                os.fsync(output.fileno())
+            status = 'done' if entry['status'] == 'ok' else f"failed: {entry['error']}"
+            print(f"[{self.succeeded + self.failed}/{len(submissions)}] {submission['id']} {status}")
+
+        await asyncio.gather(*(run_one(submission) for submission in submissions))
+
+    async def _check_links(self, submissions):
+        urls = [url for submission in submissions for url in submission_urls(submission)]
+        start = time.perf_counter()
+        try:
+            with tracing.span('preflight', links=len(urls)) as span:
+                self.link_results = await self.links.check_all(urls)
+                broken = [result for result in self.link_results.values() if is_broken(result)]
+                span.set(broken=len(broken))
+        finally:
+            await self.links.aclose()
+        print(f"Checked {len(self.link_results)} links in {time.perf_counter() - start:.1f}s, {len(broken)} broken")
+        for result in broken:
+            print(f"  {format_result(result)}")
+
+    async def _evaluate_submission(self, submission, pool):
+        entry = {'id': submission['id'], 'source': submission['source'], 'timings': {}}
+        loop = asyncio.get_running_loop()
+        links = [self.link_results[url] for url in submission_urls(submission) if url in self.link_results]
+        if links:
+            entry['links'] = [{key: result[key] for key in ('url', 'ok', 'status', 'final_url', 'error')}
+                              for result in links]
+        try:
+            source_link = self.link_results.get(submission['source'])
+            if source_link is not None and is_broken(source_link):
+                raise RuntimeError(f"Broken source link: {format_result(source_link)}")
+            ingested = await loop.run_in_executor(pool, ingest_submission, submission, DEFAULT_MAX_TOTAL_BYTES,
+                                                  tracing.is_enabled())
+            tracing.merge(ingested['trace'])
+            self._record(entry, 'ingest', ingested['seconds'])
+            if ingested['records'] is None:
+                raise RuntimeError("Could not fetch or read the archive")
+
+            start = time.perf_counter()
+            summary_report = {}
+            code_summary = await summarize_records_async(ingested['records'], repo=submission['source'],
+                                                         cache=self.cache, report=summary_report,
+                                                         duplicates=self.duplicates)
+            self._record(entry, 'summarize', time.perf_counter() - start)
+
+            start = time.perf_counter()
+            evaluation_report = {}
+            evaluation = await evaluate_project_async(ingested['doc_text'], code_summary, cache=self.cache,
+                                                      repo=submission['source'], mode=self.mode,
+                                                      report=evaluation_report, rubric=self.rubric,
+                                                      duplicates=summary_report.get('duplicates'))
+            self._record(entry, 'evaluate', time.perf_counter() - start)
+            if self.results is not None:
+                await loop.run_in_executor(None, self.results.record, submission['id'], self.rubric,
+                                           evaluation_report['model'], evaluation)
+        except Exception as e:
+            self.failed += 1
+            entry.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+            return entry
+
+        self.succeeded += 1
+        entry.update({
+            'status': 'ok',
+            'evaluation': evaluation,
+            'rubric': evaluation_report.get('rubric'),
+            'summary': code_summary,
+            'included_files': sum(1 for f in summary_report['manifest']['files'] if f['status'] == 'included'),
+            'changes': summary_report.get('diff'),
+            'static_analysis': summary_report.get('static_analysis'),
+            'duplicates': {key: value for key, value in (summary_report.get('duplicates') or {}).items()
+                           if key != 'matches'} or None,
+            'prompt_tokens': evaluation_report.get('prompt_tokens'),
+        })
+        return entry
+
+    def _record(self, entry, stage, seconds):
+        entry['timings'][stage] = round(seconds, 3)
+        self.timings[stage].append(seconds)
+
+    def print_summary(self, elapsed):
+        total = self.succeeded + self.failed
+        print("---------------------------------------")
+        print(f"Submissions processed: {total} ({self.succeeded} ok, {self.failed} failed)")
+        print(f"Wall time: {elapsed:.1f}s")
+        if elapsed > 0:
+            print(f"Throughput: {total / elapsed * 3600:.1f} submissions/hour")
+        for stage in STAGES:
+            times = self.timings[stage]
+            if times:
+                print(f"  {stage:<10} total {sum(times):8.1f}s  mean {sum(times) / len(times):6.2f}s  "
+                      f"max {max(times):6.2f}s")
+        tier_stats = get_default_tiers().format_stats()
+        if tier_stats:
+            print("Model tiers:")
+            for line in tier_stats.splitlines():
+                print(f"  {line}")
+        print("---------------------------------------")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate many hackathon submissions")
+    parser.add_argument('manifest', help="JSONL or CSV file with id, source and description columns")
+    parser.add_argument('--output', default='results.jsonl', help="JSONL file to append results to")
+    parser.add_argument('--ingest-workers', type=int, default=None, help="Processes used for ingestion")
+    parser.add_argument('--max-in-flight', type=int, default=8, help="Submissions in the LLM stages at once")
+    parser.add_argument('--mode', choices=['single', 'per_metric'], default='per_metric')
+    parser.add_argument('--rubric', default=DEFAULT_RUBRIC, help="Rubric set to score against")
+    parser.add_argument('--rubric-version', type=int, default=None, help="Rubric version (default: latest)")
+    parser.add_argument('--no-results', action='store_true', help="Do not record results for the leaderboard")
+    parser.add_argument('--no-dedup', action='store_true', help="Do not match submissions for shared code")
+    parser.add_argument('--small-model', help="Model for chunk summaries and factors (default: EVALBUDDY_SMALL_MODEL)")
+    parser.add_argument('--large-model', help="Model for evaluation and escalations (default: EVALBUDDY_LARGE_MODEL)")
+    parser.add_argument('--no-escalation', action='store_true',
+                        help="Do not retry invalid small-model output on the large model")
+    parser.add_argument('--no-link-check', action='store_true', help="Do not check submission links before fetching")
+    parser.add_argument('--no-cache', action='store_true', help="Do not use the persistent summary cache")
+    parser.add_argument('--trace', help="Append timing spans to this JSON lines file")
+    parser.add_argument('--metrics', help="Write counters and timings to this file in Prometheus text format")
+    args = parser.parse_args()
+
+    if args.trace or args.metrics:
+        tracing.enable()
+    rubric = get_default_store().get_rubric(args.rubric, args.rubric_version)
+    if rubric is None:
+        parser.error(f"Unknown rubric {args.rubric}" + (f" version {args.rubric_version}" if args.rubric_version
+                                                        else ""))
+    print(f"Scoring against rubric {rubric.id} ({len(rubric.metrics)} metrics)")
+    tiers = configure_tiers(args.small_model, args.large_model, escalate=False if args.no_escalation else None)
+    print(f"Models: small {tiers.models['small']}, large {tiers.models['large']}")
+    cache = None if args.no_cache else SummaryCache()
+    runner = BatchRunner(args.output, ingest_workers=args.ingest_workers, max_in_flight=args.max_in_flight,
+                         mode=args.mode, cache=cache, rubric=rubric,
+                         results=None if args.no_results else get_default_results_store(),
+                         duplicates=None if args.no_dedup else get_default_index(),
+                         links=None if args.no_link_check else LinkChecker())
+    runner.run(read_manifest(args.manifest))
+    if args.trace:
+        print(f"Wrote {tracing.export_jsonl(args.trace)} spans to {args.trace}")
+    if args.metrics:
+        tracing.write_prometheus(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Benchmarks for the evaluation pipeline against a local fake Ollama server.
+
+Usage:
+    python bench.py --sizes 10,1000,10000 --output bench-results.json
+    python bench.py --compare bench-results.json --output bench-new.json
+
+Every case runs in a fresh process so its peak RSS is its own. The fake
+server (see fake_ollama.py) counts the requests and prompt bytes each case
+sends. Results are written as JSON; --compare prints the change against an
+earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from fake_ollama import FakeOllama
+from synthetic_repo import iter_files, make_zip
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 50000)
+DEFAULT_SUMMARY_BYTES = 20000
+DEFAULT_DOC_TEXT = "A dashboard that evaluates hackathon projects against configurable metrics using a local LLM."
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def synthetic_code(n_bytes, seed=0):
+    """
+    Concatenated synthetic source files of about n_bytes
+    """
+    parts = []
+    size = 0
+    for path, data in iter_files(10 ** 6, seed, binary_fraction=0, ignored_fraction=0):
+        text = f"\n\n=== File: {path} ===\n{data.decode()}"
+        parts.append(text)
+        size += len(text)
+        if size >= n_bytes:
+            break
+    return "".join(parts)
+
+
+def run_case(case, host):
+    """
+    Run one benchmark case in the current (fresh) process and measure it
+    """
+    os.environ['OLLAMA_HOST'] = host
+    import evaluator
+
+    kind = case['kind']
+    start = time.perf_counter()
+    if kind == 'extract_and_summarize_code':
+        with open(case['zip'], 'rb') as archive:
+            evaluator.extract_and_summarize_code(archive, False)
+    elif kind == 'summarize_code':
+        evaluator.summarize_code(synthetic_code(case['bytes']), "Complete Codebase")
+    elif kind == 'evaluate_project':
+        code_summary = evaluator.summarize_code(synthetic_code(DEFAULT_SUMMARY_BYTES), "Complete Codebase")
+        start = time.perf_counter()
+        evaluator.evaluate_project(DEFAULT_DOC_TEXT, code_summary, mode=case['mode'])
+    elif kind == 'get_llm_response':
+        if case['response_type'] == 'json':
+            prompt = (f"Project: {DEFAULT_DOC_TEXT}\nStructured Analysis (in JSON format):\n"
+                      f"{evaluator.STRUCTURED_ANALYSIS_SCHEMA}")
+        else:
+            prompt = f"Describe this project: {DEFAULT_DOC_TEXT}"
+        evaluator.get_llm_response(prompt, case['response_type'])
+    else:
+        raise ValueError(f"Unknown benchmark case {kind}")
+    return {'wall_seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+
+
+def build_cases(sizes, work_dir, seed=0):
+    cases = []
+    for n_files in sizes:
+        path = make_zip(os.path.join(work_dir, f"repo-{n_files}.zip"), n_files, seed)
+        cases.append({'name': f"extract_and_summarize_code[{n_files} files]", 'kind': 'extract_and_summarize_code',
+                      'zip': path, 'n_files': n_files, 'zip_bytes': os.path.getsize(path)})
+    cases.append({'name': f"summarize_code[{DEFAULT_SUMMARY_BYTES} bytes]", 'kind': 'summarize_code',
+                  'bytes': DEFAULT_SUMMARY_BYTES})
+    for mode in ('single', 'per_metric'):
+        cases.append({'name': f"evaluate_project[{mode}]", 'kind': 'evaluate_project', 'mode': mode})
+    for response_type in ('text', 'json'):
+        cases.append({'name': f"get_llm_response[{response_type}]", 'kind': 'get_llm_response',
+                      'response_type': response_type})
+    return cases
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, latency=0.0, tokens_per_second=0.0, repeat=1, seed=0):
+    """
+    Run every case against a fresh fake server and return the results document
+    """
+    work_dir = tempfile.mkdtemp(prefix='evalbuddy-bench-')
+    context = get_context('spawn')
+    results = []
+    try:
+        cases = build_cases(sizes, work_dir, seed)
+        with FakeOllama(latency=latency, tokens_per_second=tokens_per_second) as server:
+            for case in cases:
+                runs = []
+                for _ in range(repeat):
+                    server.reset_stats()
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        measured = pool.submit(run_case, case, server.url).result()
+                    stats = server.stats()
+                    runs.append(dict(measured, requests=stats['requests'], prompt_bytes=stats['prompt_bytes'],
+                                     output_tokens=stats['output_tokens']))
+                runs.sort(key=lambda run: run['wall_seconds'])
+                # The median run, so one slow outlier does not decide the result
+                result = dict(runs[len(runs) // 2], name=case['name'], runs=len(runs),
+                              wall_seconds_min=runs[0]['wall_seconds'])
+                result.update({key: case[key] for key in ('n_files', 'zip_bytes') if key in case})
+                results.append(result)
+                print(f"{case['name']:<45} {result['wall_seconds']:8.3f}s  "
+                      f"{result['peak_rss_mb'] or 0:8.1f} MB  {result['requests']:5d} requests  "
+                      f"{result['prompt_bytes']:10d} prompt bytes")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'sizes': list(sizes), 'latency': latency, 'tokens_per_second': tokens_per_second,
+                     'repeat': repeat, 'seed': seed},
+        'results': results,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """
+    Print the change of each measurement between two results documents
+    """
+    before = {result['name']: result for result in previous['results']}
+    print(f"Compared with {previous.get('commit') or 'previous run'} from {previous.get('created')}:")
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None:
+            continue
+        changes = []
+        for key in ('wall_seconds', 'peak_rss_mb', 'requests', 'prompt_bytes'):
+            if old.get(key) and result.get(key) is not None:
+                changes.append(f"{key} {(result[key] - old[key]) / old[key] * 100:+.1f}%")
+        print(f"  {result['name']:<45} " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation pipeline against a fake Ollama server")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated synthetic repository sizes in files")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake server seconds before the first token")
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help="Fake server output rate, 0 for unlimited")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case; the median is reported")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench-results.json', help="JSON file to write results to")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    document = run_benchmarks(sizes, args.latency, args.tokens_per_second, max(args.repeat, 1), args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), document)
+
+
+if __name__ == "__main__":
+    main()
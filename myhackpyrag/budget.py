@@ -0,0 +1,246 @@
+# budget.py
+"""
+Token budget planning and prompt compaction.
+
+Sits between ingestion and prompting: counts tokens, ranks files by how much
+they tell the model about the project, strips comments and blank lines,
+drops minified, generated and duplicate files, and fills a token budget with
+the most important files first. Every decision is recorded in a manifest so
+the resulting summaries can be explained.
+"""
+import hashlib
+import io
+import posixpath
+import re
+import tokenize
+
+# Context window requested from Ollama for every call; the default of the server
+# is much smaller and silently truncates long prompts
+DEFAULT_NUM_CTX = 8192
+# Tokens of code that fit in one prompt alongside the instructions and the answer
+DEFAULT_CONTEXT_TOKENS = 6000
+# Upper bound on code sent through map-reduce summarization
+DEFAULT_MAX_CODE_TOKENS = 200000
+
+# Lines longer than this on average mark a file as minified or generated
+MINIFIED_AVG_LINE_CHARS = 300
+
+_WORD_RE = re.compile(r'[A-Za-z]+')
+_LONG_WORD_RE = re.compile(r'[A-Za-z]{8,}')
+_NUMBER_RE = re.compile(r'\d{1,3}')
+_SYMBOL_RE = re.compile(r'[^\sA-Za-z\d]')
+_LINE_RE = re.compile(r'\n')
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7f]')
+
+README_NAMES = ('readme', 'readme.md', 'readme.rst', 'readme.txt')
+ENTRY_POINT_NAMES = (
+    'main.py', 'app.py', '__main__.py', 'manage.py', 'server.py', 'wsgi.py', 'streamlit_app.py',
+    'index.js', 'index.ts', 'main.js', 'main.ts', 'app.js', 'app.ts', 'server.js', 'main.go', 'main.rs',
+    'main.c', 'main.cpp', 'program.cs',
+)
+MANIFEST_NAMES = (
+    'requirements.txt', 'environment.yml', 'pyproject.toml', 'setup.py', 'package.json', 'cargo.toml',
+    'go.mod', 'pom.xml', 'build.gradle', 'dockerfile', 'docker-compose.yml',
+)
+LOCKFILE_NAMES = (
+    'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'pipfile.lock', 'cargo.lock',
+    'composer.lock', 'gemfile.lock', 'go.sum',
+)
+GENERATED_PATTERNS = re.compile(
+    r'(\.min\.(js|css)$|\.map$|_pb2(_grpc)?\.py$|\.pb\.go$|(^|/)(dist|build|vendor|migrations)/)')
+
+SOURCE_EXTENSIONS = {
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.kt', '.go', '.rs', '.c', '.h', '.cpp', '.hpp', '.cc',
+    '.cs', '.rb', '.php', '.swift', '.scala', '.r', '.jl', '.dart', '.vue', '.svelte', '.sh', '.sql', '.ipynb',
+}
+DOC_EXTENSIONS = {'.md', '.rst', '.txt'}
+CONFIG_EXTENSIONS = {'.json', '.yml', '.yaml', '.toml', '.ini', '.cfg', '.xml', '.html', '.css'}
+
+# Comments are only stripped where string literals can be told apart from them: Python is
+# tokenized, the C-like languages below are scanned for quoted strings. Shell, Ruby, YAML
+# and the like (heredocs, block scalars) are left as they are.
+SLASH_COMMENT_EXTENSIONS = {
+    '.js', '.jsx', '.ts', '.tsx', '.java', '.kt', '.go', '.rs', '.c', '.h', '.cpp', '.hpp', '.cc', '.cs',
+    '.php', '.swift', '.scala', '.dart', '.css',
+}
+
+# String literals are matched so the comment markers inside them are left alone
+_C_CODE_RE = re.compile(r"""
+    "(?:\\.|[^"\\\n])*"      # "string"
+  | '(?:\\.|[^'\\\n])*'      # 'string' or 'c'har
+  | `(?:\\.|[^`\\])*`        # `template`, may span lines
+  | /\*.*?\*/               # block comment
+  | //[^\n]*                # line comment
+""", re.S | re.X)
+_TRAILING_SPACE_RE = re.compile(r'(?m)[ \t]+$')
+_BLANK_LINES_RE = re.compile(r'\n{2,}')
+
+
+def count_tokens(text):
+    """
+    Approximate the number of llama-family tokens in text without a tokenizer
+
+    Words count as one token plus one per 8 further letters, numbers as one token
+    per 3 digits, and every symbol, line break and non-ASCII character as one token.
+    """
+    return (len(_WORD_RE.findall(text))
+            + sum(len(word) // 8 for word in _LONG_WORD_RE.findall(text))
+            + len(_NUMBER_RE.findall(text))
+            + len(_SYMBOL_RE.findall(text))
+            + len(_LINE_RE.findall(text))
+            + len(_NON_ASCII_RE.findall(text)))
+
+
+def file_importance(path):
+    """
+    Score how useful a file is for understanding the project. 0 means never include.
+
+    Returns:
+        (score, reason) tuple
+    """
+    lower = path.lower()
+    name = posixpath.basename(lower)
+    extension = posixpath.splitext(name)[1]
+    depth = lower.count('/')
+
+    if name in LOCKFILE_NAMES:
+        return 0, 'lockfile'
+    if GENERATED_PATTERNS.search(lower):
+        return 0, 'generated'
+    if name in README_NAMES:
+        score, reason = 100, 'readme'
+    elif name in ENTRY_POINT_NAMES:
+        score, reason = 90, 'entry point'
+    elif name in MANIFEST_NAMES:
+        score, reason = 80, 'dependency manifest'
+    elif extension in SOURCE_EXTENSIONS:
+        is_test = name.startswith('test') or '/test' in '/' + lower or name.endswith(('_test.py', '.test.js'))
+        score, reason = (35, 'test') if is_test else (60, 'source')
+    elif extension in DOC_EXTENSIONS:
+        score, reason = 40, 'documentation'
+    elif extension in CONFIG_EXTENSIONS:
+        score, reason = 20, 'config'
+    else:
+        score, reason = 10, 'other'
+    # Prefer files near the top of the tree
+    return max(score - 2 * depth, 1), reason
+
+
+def compact_content(path, text):
+    """
+    Strip comments, trailing whitespace and repeated blank lines. Indentation is kept.
+    """
+    extension = posixpath.splitext(path.lower())[1]
+    if extension == '.py':
+        text = _strip_python_comments(text)
+    elif extension in SLASH_COMMENT_EXTENSIONS:
+        text = _strip_c_comments(text)
+    text = _TRAILING_SPACE_RE.sub('', text)
+    return _BLANK_LINES_RE.sub('\n', text).strip('\n')
+
+
+def _strip_python_comments(text):
+    """
+    Drop lines holding only a comment (not #! lines), found with tokenize so '#' in strings
+    and docstrings is kept. Code that does not tokenize is returned unchanged.
+    """
+    lines = io.StringIO(text).readlines()
+    try:
+        comments = {token.start[0] for token in tokenize.generate_tokens(iter(lines).__next__)
+                    if token.type == tokenize.COMMENT and not token.string.startswith('#!')
+                    and not token.line[:token.start[1]].strip()}
+    except (tokenize.TokenError, SyntaxError):
+        return text
+    return ''.join(line for number, line in enumerate(lines, 1) if number not in comments)
+
+
+def _strip_c_comments(text):
+    """
+    Remove block comments and whole-line // comments outside string literals
+    """
+    def replace(match):
+        code = match.group()
+        if code.startswith('/*'):
+            return ''
+        if code.startswith('//'):
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            # A trailing // comment is kept: the line's code may be a regex literal or URL
+            return '' if not text[line_start:match.start()].strip() else code
+        return code
+
+    return _C_CODE_RE.sub(replace, text)
+
+
+def is_minified(text):
+    lines = text.count('\n') + 1
+    return len(text) / lines > MINIFIED_AVG_LINE_CHARS
+
+
+def plan_context(records, budget_tokens=DEFAULT_CONTEXT_TOKENS, compact=True, covered=()):
+    """
+    Choose which files to send to the model
+
+    Args:
+        records (list): FileRecords from ingestion
+        budget_tokens (int): Maximum tokens of code to include
+        compact (bool): Strip comments and blank lines before counting
+        covered (set): Paths whose content reaches the model another way (e.g. dependency
+            manifests described by static analysis); they are dropped
+
+    Returns:
+        (records, manifest) where records are the included (compacted) FileRecords,
+        most important first, and manifest describes every input file:
+        {'budget_tokens', 'used_tokens', 'files': [{'path', 'status', 'reason',
+        'tokens', 'original_tokens'}]}
+    """
+    entries = []
+    candidates = []
+    seen_hashes = {}
+    for record in records:
+        original_tokens = count_tokens(record.content)
+        entry = {'path': record.path, 'status': 'dropped', 'reason': '', 'tokens': 0,
+                 'original_tokens': original_tokens}
+        entries.append((entry, record))
+
+        score, reason = file_importance(record.path)
+        entry['score'] = score
+        entry['reason'] = reason
+        if score == 0:
+            continue
+        if record.path in covered:
+            entry['reason'] = 'in static analysis'
+            continue
+        if is_minified(record.content):
+            entry['reason'] = 'minified'
+            continue
+        digest = hashlib.sha1(record.content.encode('utf-8', errors='ignore')).hexdigest()
+        if digest in seen_hashes:
+            entry['reason'] = f"duplicate of {seen_hashes[digest]}"
+            continue
+        seen_hashes[digest] = record.path
+        if not record.content.strip():
+            entry['reason'] = 'empty'
+            continue
+        candidates.append((entry, record))
+
+    candidates.sort(key=lambda item: -item[0]['score'])
+
+    selected = []
+    used_tokens = 0
+    for entry, record in candidates:
+        content = compact_content(record.path, record.content) if compact else record.content
+        tokens = count_tokens(content) + count_tokens(f"\n\n=== File: {record.path} ===\n")
+        entry['tokens'] = tokens
+        if used_tokens + tokens > budget_tokens:
+            entry['reason'] = f"{entry['reason']}, over budget"
+            continue
+        used_tokens += tokens
+        entry['status'] = 'included'
+        selected.append(record._replace(content=content, size=len(content)))
+
+    manifest = {
+        'budget_tokens': budget_tokens,
+        'used_tokens': used_tokens,
+        'files': [entry for entry, _ in entries],
+    }
+    return selected, manifest
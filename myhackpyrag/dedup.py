@@ -0,0 +1,269 @@
+# dedup.py
+"""
+Near-duplicate detection across submissions.
+
+Every file gets a MinHash signature over word shingles of its content. The
+signatures are split into bands and stored in a local SQLite index with the
+band hashes indexed (locality-sensitive hashing), so the files of a new
+submission are only compared with files that share at least one band. Lookups
+stay sub-linear as thousands of repositories are added.
+
+Matching a submission tells which of its files are identical or near-identical
+to files of earlier submissions, how much of its code they make up (template
+overlap) and which submissions it shares code with.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+DEFAULT_DEDUP_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'evalbuddy', 'dedup.sqlite3')
+
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 64
+# 8 bands of 8 rows: files with Jaccard similarity above ~0.77 are likely to share a band
+BANDS = 8
+# Estimated Jaccard similarity from which two files count as the same file
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Files with fewer shingles (empty __init__.py, one-line configs) are not matched
+MIN_SHINGLES = 8
+# Another submission counts as sharing code once it has this fraction of the bytes
+SHARED_SUBMISSION_FRACTION = 0.1
+MAX_TOP_MATCHES = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(20241118)
+_A = _rng.randint(1, 1 << 31, NUM_PERMUTATIONS).astype(np.uint64)
+_B = _rng.randint(0, 1 << 31, NUM_PERMUTATIONS).astype(np.uint64)
+_WORD_RE = re.compile(r'\w+|[^\w\s]')
+_ROWS = NUM_PERMUTATIONS // BANDS
+
+
+def shingles(content):
+    """
+    CRC32 hashes of the overlapping SHINGLE_WORDS-word windows of a text
+    """
+    words = _WORD_RE.findall(content)
+    if len(words) < SHINGLE_WORDS:
+        return np.zeros(0, dtype=np.uint64)
+    texts = (" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1))
+    return np.unique(np.fromiter((zlib.crc32(text.encode('utf-8')) for text in texts), dtype=np.uint64))
+
+
+def minhash(hashes):
+    """
+    MinHash signature (NUM_PERMUTATIONS uint32 values) of a set of shingle hashes
+    """
+    # a * x + b stays below 2**63 for 31-bit a, b and 32-bit x
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % np.uint64(_MERSENNE_PRIME)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature):
+    """
+    One 63-bit hash per band of a signature, used as the LSH bucket
+    """
+    return [int.from_bytes(hashlib.blake2b(signature[band * _ROWS:(band + 1) * _ROWS].tobytes(),
+                                           digest_size=8).digest(), 'little') >> 1
+            for band in range(BANDS)]
+
+
+def file_signatures(records):
+    """
+    Signatures of the files long enough to match
+
+    Returns:
+        [(path, size, content_hash, signature)]
+    """
+    signatures = []
+    for record in records:
+        hashes = shingles(record.content)
+        if len(hashes) < MIN_SHINGLES:
+            continue
+        content_hash = hashlib.sha256(record.content.encode('utf-8', errors='ignore')).hexdigest()
+        signatures.append((record.path, record.size, content_hash, minhash(hashes)))
+    return signatures
+
+
+class DuplicateIndex:
+    def __init__(self, path=DEFAULT_DEDUP_PATH):
+        """
+        Open (or create) a duplicate index
+
+        Args:
+            path (str): Location of the SQLite file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                submission TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                signature BLOB NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_submission ON files (submission)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                file_id INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_key ON bands (band, key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_file ON bands (file_id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                submission TEXT PRIMARY KEY,
+                files INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def add(self, submission, signatures):
+        """
+        Store the file signatures of a submission, replacing any it had before
+        """
+        with self._lock:
+            self._delete(submission)
+            band_rows = []
+            for path, size, content_hash, signature in signatures:
+                file_id = self._conn.execute(
+                    "INSERT INTO files (submission, path, size, content_hash, signature) VALUES (?, ?, ?, ?, ?)",
+                    (submission, path, size, content_hash, signature.tobytes())).lastrowid
+                band_rows.extend((band, key, file_id) for band, key in enumerate(band_keys(signature)))
+            self._conn.executemany("INSERT INTO bands (band, key, file_id) VALUES (?, ?, ?)", band_rows)
+            self._conn.execute("INSERT INTO submissions (submission, files, bytes, updated) VALUES (?, ?, ?, ?)",
+                               (submission, len(signatures), sum(size for _, size, _, _ in signatures), time.time()))
+            self._conn.commit()
+
+    def remove(self, submission):
+        with self._lock:
+            self._delete(submission)
+            self._conn.commit()
+
+    def _delete(self, submission):
+        # Caller holds the lock
+        self._conn.execute("DELETE FROM bands WHERE file_id IN (SELECT id FROM files WHERE submission = ?)",
+                           (submission,))
+        self._conn.execute("DELETE FROM files WHERE submission = ?", (submission,))
+        self._conn.execute("DELETE FROM submissions WHERE submission = ?", (submission,))
+
+    def stats(self):
+        with self._lock:
+            submissions, files = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(files), 0) FROM submissions").fetchone()
+        return {'submissions': submissions, 'files': files}
+
+    def match(self, signatures, submission=None):
+        """
+        Find files of other submissions that are identical or near-identical to these
+
+        Args:
+            signatures (list): file_signatures output
+            submission (str): The submission's own ID, whose stored files are ignored
+
+        Returns:
+            {'files', 'bytes', 'shared_files', 'shared_bytes', 'overlap' (fraction of the
+            bytes in shared files), 'shared_with' (other submissions holding at least
+            SHARED_SUBMISSION_FRACTION of the bytes), 'top_matches': [{'submission',
+            'overlap'}], 'matches': {path: {'submission', 'path', 'similarity'}}}
+        """
+        total_bytes = sum(size for _, size, _, _ in signatures)
+        report = {'files': len(signatures), 'bytes': total_bytes, 'shared_files': 0, 'shared_bytes': 0,
+                  'overlap': 0.0, 'shared_with': 0, 'top_matches': [], 'matches': {}}
+        if not signatures:
+            return report
+
+        keys = [(index, band, key) for index, (_, _, _, signature) in enumerate(signatures)
+                for band, key in enumerate(band_keys(signature))]
+        with self._lock:
+            # One join from the query's buckets into the band index; CROSS JOIN keeps SQLite from
+            # scanning all stored bands instead
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_bands (item INTEGER, band INTEGER, key INTEGER)")
+            self._conn.execute("DELETE FROM query_bands")
+            self._conn.executemany("INSERT INTO query_bands (item, band, key) VALUES (?, ?, ?)", keys)
+            rows = self._conn.execute("""
+                SELECT DISTINCT q.item, f.id, f.submission, f.path, f.content_hash, f.signature
+                FROM query_bands q
+                CROSS JOIN bands b ON b.band = q.band AND b.key = q.key
+                CROSS JOIN files f ON f.id = b.file_id
+                WHERE f.submission IS NOT ?
+            """, (submission,)).fetchall()
+            self._conn.execute("DELETE FROM query_bands")
+            self._conn.commit()
+
+        best = {}
+        shared_by_submission = {}
+        for item, _, other, other_path, content_hash, blob in rows:
+            path, size, own_hash, signature = signatures[item]
+            if content_hash == own_hash:
+                similarity = 1.0
+            else:
+                similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity < NEAR_DUPLICATE_THRESHOLD:
+                continue
+            # Each submission is counted once per file, however many of its files match
+            by_file = shared_by_submission.setdefault(other, {})
+            by_file[path] = size
+            if path not in best or similarity > best[path]['similarity']:
+                best[path] = {'submission': other, 'path': other_path, 'similarity': round(similarity, 3)}
+
+        sizes = {path: size for path, size, _, _ in signatures}
+        shared_bytes = sum(sizes[path] for path in best)
+        overlaps = sorted(((other, sum(by_file.values()) / total_bytes if total_bytes else 0.0)
+                           for other, by_file in shared_by_submission.items()), key=lambda item: -item[1])
+        report.update(
+            shared_files=len(best),
+            shared_bytes=shared_bytes,
+            overlap=round(shared_bytes / total_bytes, 4) if total_bytes else 0.0,
+            shared_with=sum(1 for _, overlap in overlaps if overlap >= SHARED_SUBMISSION_FRACTION),
+            top_matches=[{'submission': other, 'overlap': round(overlap, 4)}
+                         for other, overlap in overlaps[:MAX_TOP_MATCHES]],
+            matches=best,
+        )
+        return report
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def similarity_text(duplicates):
+    """
+    One-line description of a match report for prompts, or '' if nothing is shared
+    """
+    if not duplicates or not duplicates['shared_files']:
+        return ''
+    return (f"{duplicates['shared_files']} of {duplicates['files']} files ({duplicates['overlap'] * 100:.0f}% of "
+            f"the code) are identical or near-identical to files of other submissions (template overlap); "
+            f"shared with {duplicates['shared_with']} other submissions.")
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_default_index():
+    """
+    Process-wide DuplicateIndex (override the location with EVALBUDDY_DEDUP_DB)
+    """
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = DuplicateIndex(os.environ.get('EVALBUDDY_DEDUP_DB', DEFAULT_DEDUP_PATH))
+        return _default_index
@@ -1,10 +1,26 @@
 import time
+# Streamlit runs this script on every interaction; time each run from the very top
+run_start = time.perf_counter()
+import asyncio
+import hashlib
+import io
+import threading
+import uuid
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import random
 import json
-from evaluator import evaluate_project, extract_and_summarize_code, generate_evaluation_factors
+from dedup import get_default_index, similarity_text
+from evaluator import build_code_index, generate_evaluation_factors, ingest_source, submission_key, upload_key
+from jobs import DONE, FAILED, FINISHED, JobManager
+from llm_client import get_default_client
+from metrics_store import DEFAULT_RUBRIC, get_default_store
+from model_tiers import get_default_tiers
+from results_store import get_default_results_store
+from retrieval import VectorIndex, index_dir_for
+from streaming import iterate_events, stream_evaluation_async, stream_summary_async
+from summary_cache import SummaryCache
+import tracing
 
 # Page configuration
 st.set_page_config(layout="wide", page_title="Project Evaluation Dashboard")
@@ -13,32 +29,295 @@ st.set_page_config(layout="wide", page_title="Project Evaluation Dashboard")
 st.title("🎯 MyEvalBuddy")
 
 metrics = []
+
+# One cache shared by every session and rerun
+@st.cache_resource
+def get_summary_cache():
+    return SummaryCache()
+
+summary_cache = get_summary_cache()
+
+# Shared metrics store; concurrent sessions add metrics as new rubric versions
+@st.cache_resource
+def get_metrics_store():
+    return get_default_store()
+
+metrics_store = get_metrics_store()
+
+# Evaluation results of every session, for the leaderboard and cohort comparison
+@st.cache_resource
+def get_results_store():
+    return get_default_results_store()
+
+results_store = get_results_store()
+
+# Signatures of every summarized submission, to spot forks of the same template
+@st.cache_resource
+def get_duplicate_index():
+    return get_default_index()
+
+duplicate_index = get_duplicate_index()
+
+# Small and large models (EVALBUDDY_SMALL_MODEL, EVALBUDDY_LARGE_MODEL); latency and escalations across sessions
+@st.cache_resource
+def get_model_tiers():
+    return get_default_tiers()
+
+model_tiers = get_model_tiers()
+
+# The pooled LLM client and its event loop thread, shared by every session
+@st.cache_resource
+def get_llm_client():
+    return get_default_client()
+
+llm_client = get_llm_client()
+
+# Once per process, load the models in the background (kept resident by the client's keep_alive),
+# so the first summary does not wait for a cold model load
+@st.cache_resource
+def warm_up_models():
+    models = sorted(set(model_tiers.models.values()))
+    status = {'models': models, 'seconds': None, 'error': None}
+    start = time.perf_counter()
+
+    async def warm_up():
+        await asyncio.gather(*(llm_client.warm_up(model) for model in models))
+
+    def done(future):
+        status['seconds'] = time.perf_counter() - start
+        if future.exception() is not None:
+            status['error'] = f"{type(future.exception()).__name__}: {future.exception()}"
+
+    llm_client.submit(warm_up()).add_done_callback(done)
+    return status
+
+warm_up_status = warm_up_models()
+
+# Run times of the script across sessions; the first run in the process is the startup
+@st.cache_resource
+def get_run_timings():
+    return {'lock': threading.Lock(), 'startup': None, 'reruns': 0, 'rerun_seconds': 0.0}
+
+run_timings = get_run_timings()
+
+# Canned insight shown by Feedback; read once, not on every click
+@st.cache_data
+def load_static_insight():
+    try:
+        with open('static_insight.json', 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+# One job manager shared by every session, so identical requests from several judges run once
+@st.cache_resource
+def get_job_manager():
+    return JobManager()
+
+job_manager = get_job_manager()
+
+# Identifies this session as a subscriber of shared jobs, so its Cancel only detaches it
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
+
+# Characters of the text being generated shown while a summary streams in
+LIVE_TEXT_CHARS = 3000
+
+def follow_events(job, stream, visible=('token',)):
+    """
+    Consume a streaming.py event stream inside a job, keeping the text being generated
+    and the metric results so far in job.report for the page to render live
+
+    Args:
+        visible (tuple): Event types the page shows; the first one sets 'first_output_seconds'
+    """
+    texts = {}
+    job.report['metrics'] = {}
+    value = None
+    for event in iterate_events(stream, should_stop=lambda: job.cancelled):
+        if event['type'] in visible or event['type'] == 'result':
+            job.report.setdefault('first_output_seconds', job.elapsed)
+        if event['type'] == 'token':
+            texts[event['call']] = texts.get(event['call'], '') + event['text']
+            job.report['live_text'] = texts[event['call']]
+        elif event['type'] == 'reset':
+            texts.pop(event['call'], None)
+        elif event['type'] == 'metric':
+            job.report['metrics'][event['title']] = event['result']
+        elif event['type'] == 'result':
+            value = event['value']
+    job.check_cancelled()
+    return value
+
+def summarize_job(job, source, is_github_link, index_dir=None, repo=None):
+    job.update(0.05, "Downloading and reading the archive")
+    records = ingest_source(source, is_github_link)
+    if records is None:
+        raise RuntimeError("Could not fetch or read the archive")
+    job.check_cancelled()
+    if index_dir is not None:
+        job.update(0.2, "Building the code index")
+        build_code_index(records, index_dir)
+        job.check_cancelled()
+    job.update(0.4, f"Summarizing {len(records)} files")
+    # Uploads are keyed by their content, so two teams' project.zip stay separate submissions
+    repo = repo or submission_key(source, is_github_link)
+    return follow_events(job, stream_summary_async(records, repo=repo, cache=summary_cache, report=job.report,
+                                                   duplicates=duplicate_index))
+
+def evaluate_job(job, doc_text, code_summary, mode, index_dir=None, rubric=None, submission=None,
+                 duplicates=None):
+    code_index = None
+    if index_dir:
+        try:
+            code_index = VectorIndex.load(index_dir)
+        except FileNotFoundError:
+            job.report['warning'] = "Code index not found, evaluating from the summary only."
+    total = len(rubric.metrics)
+    done = []
+
+    def on_metric(title, result):
+        done.append(title)
+        job.update(len(done) / max(total, 1), f"Scored {len(done)}/{total} metrics")
+
+    job.update(0.0, f"Scored 0/{total} metrics")
+    stream = stream_evaluation_async(doc_text, code_summary, cache=summary_cache, mode=mode, report=job.report,
+                                     on_metric=on_metric, index=code_index, rubric=rubric, duplicates=duplicates)
+    result = follow_events(job, stream, visible=('metric',))
+    if submission:
+        results_store.record(submission, rubric, job.report['model'], result)
+    # Loaded here so the page only draws it
+    job.report['cohort'] = results_store.cohort_percentiles(rubric, job.report['model'])
+    return result
+
+@st.fragment(run_every=1)
+def show_job(state_key, render_live=None):
+    """
+    Poll the job stored under st.session_state[state_key], showing its partial output
+    with render_live(job), and rerun the page once it finishes
+    """
+    job = job_manager.get(st.session_state.get(state_key))
+    if job is None:
+        return
+    if job.status not in FINISHED:
+        st.progress(job.progress, text=f"{job.message} ({job.elapsed:.0f}s)")
+        if st.button("Cancel", key=f"cancel_{state_key}"):
+            job_manager.cancel(job.id, subscriber=session_id)
+            # The job keeps running if other sessions share it; this session stops following it
+            st.session_state[state_key] = None
+            st.rerun()
+        if render_live is not None:
+            render_live(job)
+    elif st.session_state.get(f"{state_key}_shown") != job.id:
+        st.session_state[f"{state_key}_shown"] = job.id
+        st.rerun()
+
+def finished_job(state_key):
+    """
+    Return the job under st.session_state[state_key] if it completed successfully,
+    reporting failures and cancellations
+    """
+    job = job_manager.get(st.session_state.get(state_key))
+    if job is None or job.status not in FINISHED:
+        return None
+    if job.status == FAILED:
+        st.error(f"{job.kind.capitalize()} failed: {job.error}")
+    elif job.status != DONE:
+        st.warning(f"{job.kind.capitalize()} was cancelled")
+    return job if job.status == DONE else None
+
+def timing_text(kind, job):
+    text = f"{kind} computation took {job.elapsed:.3f} seconds"
+    if 'first_output_seconds' in job.report:
+        text += f" (first output after {job.report['first_output_seconds']:.3f} seconds)"
+    return text
+
+def show_live_summary(job):
+    if job.report.get('live_text'):
+        st.text(job.report['live_text'][-LIVE_TEXT_CHARS:])
+
+def show_live_evaluation(job):
+    # Copy, since the job thread keeps adding metrics
+    result = dict(job.report.get('metrics', {}))
+    if result:
+        st.plotly_chart(render_radar_chart(result))
+        show_insight(result)
+
 # Function to simulate getting evaluation factors from a language model
-def get_evaluation_factors(title, description):
+def get_evaluation_factors(title, description, rubric_name=DEFAULT_RUBRIC):
     # Get factors from the LLM
-    new_metric = generate_evaluation_factors(title, description)
+    new_metric = generate_evaluation_factors(title, description, cache=summary_cache)
     
-    # Read existing metrics
-    try:
-        with open('metrics.json', 'r') as f:
-            data = json.load(f)
-            metrics = data.get('metrics', [])
-    except FileNotFoundError:
-        metrics = []
-    # Add to metrics list and save
-    metrics.append(new_metric)
-    with open('metrics.json', 'w') as f:
-        json.dump({"metrics": metrics}, f, indent=2)
+    # Saved as a new version of the rubric (and exported to metrics.json for the default one)
+    metrics_store.add_metric(new_metric, rubric_name)
     return new_metric
 
+def show_manifest(summary_report):
+    manifest = summary_report.get('manifest')
+    if not manifest:
+        return
+    included = sum(1 for entry in manifest['files'] if entry['status'] == 'included')
+    with st.expander(f"Context: {included}/{len(manifest['files'])} files, "
+                     f"~{manifest['used_tokens']}/{manifest['budget_tokens']} tokens"):
+        st.dataframe(pd.DataFrame(manifest['files'], columns=['path', 'status', 'reason', 'tokens',
+                                                               'original_tokens']))
+
+def show_changes(summary_report):
+    diff = summary_report.get('diff')
+    if not diff or diff['first_run']:
+        return
+    changed = diff['added'] + diff['modified'] + diff['deleted']
+    if not changed:
+        st.caption(f"No changes since the last run ({diff['unchanged']} files unchanged), summary reused")
+        return
+    with st.expander(f"Changes since the last run: {len(diff['added'])} added, {len(diff['modified'])} modified, "
+                     f"{len(diff['deleted'])} deleted, {diff['unchanged']} unchanged"):
+        rows = ([{'path': path, 'change': 'added'} for path in diff['added']]
+                + [{'path': path, 'change': 'modified'} for path in diff['modified']]
+                + [{'path': path, 'change': 'deleted'} for path in diff['deleted']])
+        st.dataframe(pd.DataFrame(rows, columns=['path', 'change']))
+
+def show_static_analysis(summary_report):
+    facts = summary_report.get('static_analysis')
+    if not facts:
+        return
+    complexity = facts['complexity']
+    title = f"Static analysis: {facts['files']} files, {facts['loc']} lines"
+    if complexity['level']:
+        title += f", {complexity['level']} complexity"
+    with st.expander(title):
+        st.dataframe(pd.DataFrame([dict(language=language, **entry) for language, entry in facts['languages'].items()],
+                                  columns=['language', 'files', 'loc']))
+        for ecosystem, names in facts['dependencies'].items():
+            st.caption(f"{ecosystem} dependencies: {', '.join(names) or 'none'}")
+        if complexity['functions']:
+            st.caption(f"{complexity['functions']} Python functions, average cyclomatic complexity "
+                       f"{complexity['average']}, max {complexity['max']}")
+
+def show_duplicates(summary_report):
+    duplicates = summary_report.get('duplicates')
+    if not duplicates or not duplicates['shared_files']:
+        return
+    with st.expander(f"Shared code: {duplicates['overlap'] * 100:.0f}% overlap with other submissions"):
+        st.caption(similarity_text(duplicates))
+        st.dataframe(pd.DataFrame(
+            [dict(path=path, **match) for path, match in duplicates['matches'].items()],
+            columns=['path', 'submission', 'similarity']), hide_index=True)
+
 # Add a form to accept metric title and description
 st.subheader("Project Metric")
 
 
-def render_radar_chart():
-    with open('metrics.json', 'r') as f:
-        data = json.load(f)
-        metrics = data.get('metrics', [])
+def render_radar_chart(result, cohort=None):
+    """
+    Radar chart of a submission's scores, over the cohort's 25th-75th percentile band
+    and median when cohort (results_store.cohort_percentiles) is given
+    """
+    # Imported on first use, so runs that show no chart do not pay for plotly
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     # Create a DataFrame from the JSON data
     if result:
         df = pd.DataFrame.from_dict(
@@ -49,12 +328,48 @@ def render_radar_chart():
 
 
     fig = px.line_polar(df, r='Score', theta='Metric', line_close=True)
+    if cohort is not None and cohort['count'].sum() > 1:
+        band = cohort.reindex(df['Metric'])
+        theta = list(df['Metric']) + [df['Metric'].iloc[0]]
+        for column, name, fill in (('p75', 'Cohort 75th percentile', None), ('p25', 'Cohort 25th percentile',
+                                                                               'tonext'),
+                                   ('p50', 'Cohort median', None)):
+            values = list(band[column]) + [band[column].iloc[0]]
+            fig.add_trace(go.Scatterpolar(r=values, theta=theta, name=name, fill=fill, mode='lines',
+                                          line=dict(dash='dot' if column == 'p50' else 'solid', width=1)))
+        # Keep the submission on top of the cohort
+        fig.data = fig.data[1:] + fig.data[:1]
     fig.update_layout(
         polar=dict(radialaxis=dict(visible=True, range=[0, 10])),
-        showlegend=False
+        showlegend=cohort is not None
     )
     return fig
 
+def show_leaderboard(rubric):
+    if rubric is None:
+        return
+    for model in results_store.models(rubric):
+        board = results_store.leaderboard(rubric, model)
+        with st.expander(f"Leaderboard: {rubric.id}, {model} ({len(board)} submissions)"):
+            st.dataframe(board, hide_index=True)
+
+def show_insight(result):
+    # Display evaluation results as cards
+    with st.container(border=True):
+        st.header('Insight')
+        for metric, details in result.items():
+            score = details['score']
+            justification = details['justification']
+            # Create a card for each metric
+            st.markdown(f"### {metric}")
+            st.metric(label="Score", value=f"{score}/10")
+            st.write(f"**Justification:** {justification}")
+            st.markdown("---")  # Separator for cards
+
+rubric_sets = metrics_store.rubric_sets() or [DEFAULT_RUBRIC]
+rubric_name = st.selectbox("Rubric", rubric_sets, index=rubric_sets.index(DEFAULT_RUBRIC)
+                           if DEFAULT_RUBRIC in rubric_sets else 0)
+
 # Initial render of the chart
 with st.form("metric_form"):
     metric_title = st.text_input("Metric Title")
@@ -63,7 +378,7 @@ with st.form("metric_form"):
 
     if submitted:
         # Get evaluation factors using the language model
-        evaluation_factors = get_evaluation_factors(metric_title, metric_description)
+        evaluation_factors = get_evaluation_factors(metric_title, metric_description, rubric_name)
         
         # Create a new metric entry
         new_metric = {
@@ -82,20 +397,39 @@ with st.form("metric_form"):
 col1, col2 = st.columns([1, 2])
 if 'code_summary' not in st.session_state:
     st.session_state.code_summary = "None"
+if 'submission' not in st.session_state:
+    st.session_state.submission = None
+if 'duplicates' not in st.session_state:
+    st.session_state.duplicates = None
+if 'index_dir' not in st.session_state:
+    st.session_state.index_dir = None
 if 'doc_text' not in st.session_state:
     st.session_state.doc_text = "Nothing much"
 if 'code_insight' not in st.session_state:
     st.session_state.insight = "Nothing much"
+for state_key in ('summary_job', 'zip_job', 'evaluation_job'):
+    if state_key not in st.session_state:
+        st.session_state[state_key] = None
 with col1:
     
     st.subheader("Project Details")
     github_link = st.text_input("GitHub File Link")
     if st.button("Extract and Summarize Code",key='dynamic'):
-        start_time = time.time()
-        code_summary = extract_and_summarize_code(github_link, True)
-        end_time = time.time()
-        st.info(f"Summary computation took {end_time - start_time:.3f} seconds")
-        st.session_state.code_summary = code_summary
+        index_dir = index_dir_for(github_link)
+        st.session_state.submission = github_link
+        st.session_state.summary_job = job_manager.submit('summarize', summarize_job, github_link, True, index_dir,
+                                                          key=('summarize', github_link), subscriber=session_id)
+        st.session_state.index_dir = index_dir
+    show_job('summary_job', show_live_summary)
+    summary_job = finished_job('summary_job')
+    if summary_job:
+        st.info(timing_text("Summary", summary_job))
+        show_manifest(summary_job.report)
+        show_changes(summary_job.report)
+        show_static_analysis(summary_job.report)
+        show_duplicates(summary_job.report)
+        st.session_state.code_summary = summary_job.result
+        st.session_state.duplicates = summary_job.report.get('duplicates')
     
     # New section for Doc Text input and save button
     st.header('Doc Text')
@@ -114,11 +448,22 @@ with col1:
     uploaded_zip = st.file_uploader("Upload Additional Zip", type=["zip"])
     if uploaded_zip:
         if st.button("Extract and Summarize ZIP"):
-            start_time = time.time()
-            code_summary = extract_and_summarize_code(uploaded_zip, False)
-            end_time = time.time()
-            st.text_area("Code Summary", code_summary)
-            st.info(f"Summary computation took {end_time - start_time:.3f} seconds")
+            data = uploaded_zip.getvalue()
+            # The upload is gone after the next rerun, so the job gets its own copy
+            archive = io.BytesIO(data)
+            archive.name = uploaded_zip.name
+            repo = upload_key(data)
+            st.session_state.zip_job = job_manager.submit('summarize', summarize_job, archive, False, None, repo,
+                                                          key=('summarize', repo), subscriber=session_id)
+        show_job('zip_job', show_live_summary)
+        zip_job = finished_job('zip_job')
+        if zip_job:
+            st.text_area("Code Summary", zip_job.result)
+            st.info(timing_text("Summary", zip_job))
+            show_manifest(zip_job.report)
+            show_changes(zip_job.report)
+            show_static_analysis(zip_job.report)
+            show_duplicates(zip_job.report)
         st.subheader("Evaluate Project")
  
 
@@ -136,35 +481,73 @@ with col2:
     
     # Impact Assessment
 
+    per_metric = st.checkbox("Evaluate each metric independently", value=True)
     if st.button('Feedback'):
-        start_time = time.time()
-        st.info('Evaluation in progress...')
-        try:
-            with open('static_insight.json', 'r') as f:
-                result = json.load(f)
-                st.session_state.code_insight = result  # Load the JSON data into the result variable
-        except FileNotFoundError:
+        st.session_state.code_insight = load_static_insight()
+        if st.session_state.code_insight is None:
             st.error("Error: static_insight.json file not found.")
-            result = {}  
-        result = evaluate_project(st.session_state.doc_text, st.session_state.code_summary)
-        end_time = time.time()
-        st.info(f"Evaluation computation took {end_time - start_time:.3f} seconds")
-        
-        # New section to display evaluation results as cards
-        with st.container(border=True):
-            st.header('Insight')
-            for metric, details in result.items():
-                score = details['score']
-                justification = details['justification']
-                # Create a card for each metric
-                st.markdown(f"### {metric}")
-                st.metric(label="Score", value=f"{score}/10")
-                st.write(f"**Justification:** {justification}")
-                st.markdown("---")  # Separator for cards
-        
-        chart_placeholder.plotly_chart(render_radar_chart())
+        mode = 'per_metric' if per_metric else 'single'
+        rubric = metrics_store.get_rubric(rubric_name)
+        if rubric is None or not rubric.metrics:
+            st.error(f"Rubric {rubric_name} has no metrics.")
+        else:
+            key = ('evaluate', hashlib.sha256(json.dumps(
+                [st.session_state.doc_text, st.session_state.code_summary, mode, st.session_state.index_dir,
+                 rubric.id, st.session_state.submission]).encode()).hexdigest())
+            st.session_state.evaluation_job = job_manager.submit(
+                'evaluation', evaluate_job, st.session_state.doc_text, st.session_state.code_summary, mode,
+                st.session_state.index_dir, rubric, st.session_state.submission, st.session_state.duplicates,
+                key=key, subscriber=session_id)
+    show_job('evaluation_job', show_live_evaluation)
+    evaluation_job = finished_job('evaluation_job')
+    if evaluation_job:
+        result = evaluation_job.result
+        evaluation_report = evaluation_job.report
+        if evaluation_report.get('warning'):
+            st.warning(evaluation_report['warning'])
+        st.info(timing_text("Evaluation", evaluation_job))
+        st.caption(f"Scored against rubric {evaluation_report.get('rubric')}")
+        if evaluation_report.get('metric_latency'):
+            with st.expander("Per-metric latency"):
+                st.table(pd.DataFrame(
+                    [(metric, f"{seconds:.2f}s", evaluation_report['attempts'][metric])
+                     for metric, seconds in evaluation_report['metric_latency'].items()],
+                    columns=['Metric', 'Latency', 'Attempts']))
+
+        show_insight(result)
+        chart_placeholder.plotly_chart(render_radar_chart(result, evaluation_report.get('cohort')))
+    show_leaderboard(metrics_store.get_rubric(rubric_name))
 
 
 # Footer
 st.markdown("---")
 st.caption("Project Evaluation Dashboard v1.0")
+cache_stats = summary_cache.stats()
+st.caption(f"Summary cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+           f"{cache_stats['entries']} entries")
+tier_stats = model_tiers.stats(by_stage=True)
+if tier_stats:
+    with st.expander(f"Model tiers: small {model_tiers.models['small']}, large {model_tiers.models['large']}"):
+        st.dataframe(pd.DataFrame(tier_stats, columns=['tier', 'stage', 'model', 'calls', 'invalid', 'escalations',
+                                                       'escalation_rate', 'mean_seconds', 'max_seconds']))
+if warm_up_status['error']:
+    st.caption(f"Model warm-up failed: {warm_up_status['error']}")
+elif warm_up_status['seconds'] is None:
+    st.caption(f"Warming up {', '.join(warm_up_status['models'])}...")
+else:
+    st.caption(f"Model warm-up ({', '.join(warm_up_status['models'])}): {warm_up_status['seconds']:.2f}s")
+run_seconds = time.perf_counter() - run_start
+tracing.observe('streamlit_run_seconds', run_seconds)
+with run_timings['lock']:
+    if run_timings['startup'] is None:
+        run_timings['startup'] = run_seconds
+    else:
+        run_timings['reruns'] += 1
+        run_timings['rerun_seconds'] += run_seconds
+    startup, reruns, rerun_seconds = run_timings['startup'], run_timings['reruns'], run_timings['rerun_seconds']
+st.caption(f"Startup {startup:.2f}s, this run {run_seconds * 1000:.0f} ms"
+           + (f", mean rerun {rerun_seconds / reruns * 1000:.0f} ms over {reruns} reruns" if reruns else ""))
+# Set EVALBUDDY_TRACE=1 to record timings
+if tracing.is_enabled():
+    with st.expander("Tracing metrics"):
+        st.code(tracing.prometheus_text(), language='text')
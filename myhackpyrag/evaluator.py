@@ -1,15 +1,89 @@
 # evaluator.py
-import io
+import hashlib
 import os
-import tempfile
 import time
 import zipfile
-import shutil
 import json
-from urllib import request
+import ast
+import asyncio
+import functools
+
+from budget import DEFAULT_CONTEXT_TOKENS, DEFAULT_MAX_CODE_TOKENS, DEFAULT_NUM_CTX, count_tokens, plan_context
+from dedup import file_signatures, similarity_text
+from fetcher import FetchError, get_default_fetcher
+from incremental import diff_manifests, hash_records
+from ingest import DEFAULT_MAX_TOTAL_BYTES, chunk_records, iter_archive_files
+from json_stream import IncrementalJSONParser, json_schema, validate
+from llm_client import get_default_client
+from metrics_store import factor_text, get_default_store
+from model_tiers import DEFAULT_MODEL, get_default_tiers
+from retrieval import DEFAULT_TOP_K, VectorIndex, format_chunks
+from static_analysis import analyze_records, covered_paths, format_facts, merge_facts
+import tracing
+
+# Sent with every request; a fixed num_ctx avoids model reloads between calls
+MODEL_OPTIONS = {'num_ctx': DEFAULT_NUM_CTX}
+# Tokens kept free in the context window for the model's answer
+OUTPUT_RESERVE_TOKENS = 1500
+
+# Bump these whenever the matching prompt changes so cached results are not reused
+SUMMARY_PROMPT_VERSION = 'summary-v2'
+EVALUATION_PROMPT_VERSION = 'evaluation-v1'
+FACTORS_PROMPT_VERSION = 'factors-v1'
+CHUNK_PROMPT_VERSION = 'chunk-v1'
+REDUCE_PROMPT_VERSION = 'reduce-v1'
+STATIC_ANALYSIS_VERSION = 'static-v2'
+REPO_SUMMARY_VERSION = (f"{SUMMARY_PROMPT_VERSION}/{CHUNK_PROMPT_VERSION}/{REDUCE_PROMPT_VERSION}/"
+                        f"{STATIC_ANALYSIS_VERSION}")
+
+# Map-reduce summarization settings
+DEFAULT_CHUNK_TOKENS = 6000
+DEFAULT_MAP_WORKERS = 4
+DEFAULT_FAN_IN = 4
+# About one file in this many starts a new chunk, keeping chunk boundaries stable between runs
+CHUNK_ANCHOR_EVERY = 8
+
+# Per-metric evaluation settings
+DEFAULT_METRIC_WORKERS = 4
+DEFAULT_METRIC_RETRIES = 2
+
+
+class InvalidResponseError(ValueError):
+    """
+    Text output whose JSON part is missing or does not match its schema; the text is kept
+    in response so callers can still use it
+    """
+    def __init__(self, message, response):
+        super().__init__(message)
+        self.response = response
 
-import ollama
-import pathspec
+STRUCTURED_ANALYSIS_SCHEMA = """{
+    "summary": "Brief overview of what this code does",
+    "main_functionality": [
+        "List of main functions/features"
+    ],
+    "technologies": {
+        "languages": [],
+        "frameworks": [],
+        "libraries": [],
+        "ai_components": []
+    },
+    "code_patterns": [
+        "List of notable design patterns or coding practices used"
+    ],
+    "complexity_analysis": {
+        "level": "low|medium|high",
+        "explanation": "Brief explanation of complexity assessment"
+    },
+    "potential_improvements": [
+        "List of suggested improvements or optimizations"
+    ]
+}"""
+# Templates (see json_stream.validate) that structured output must match; output that
+# does not is escalated from the small model tier to the large one
+STRUCTURED_ANALYSIS_TEMPLATE = {"summary": None, "main_functionality": [], "technologies": {}, "code_patterns": [],
+                                "complexity_analysis": {}, "potential_improvements": []}
+FACTORS_TEMPLATE = {"title": None, "description": None, "weightage": None, "evaluationFactors": []}
 
 
 def extract_text_from_document(doc_file):
@@ -25,116 +99,497 @@ def extract_text_from_document(doc_file):
     text = doc_file.read().decode('utf-8', errors='ignore')
     return text
 
-def extract_and_summarize_code(source, is_github_link):
-    start = time.perf_counter()
-    temp_dir = tempfile.mkdtemp()  # Temporary directory for extracted files
+def extract_and_summarize_code(source, is_github_link, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES, cache=None,
+                               mode='auto', chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAP_WORKERS,
+                               fan_in=DEFAULT_FAN_IN, index_dir=None, embedder='ollama',
+                               context_tokens=DEFAULT_CONTEXT_TOKENS, max_code_tokens=DEFAULT_MAX_CODE_TOKENS,
+                               report=None):
+    """
+    Summarize a GitHub repository or uploaded ZIP archive
 
-    # Download and extract if it's a GitHub repository
-    if is_github_link:
-        # Convert GitHub URL to ZIP download URL
-        repo_path = source.replace('https://github.com/', '').rstrip('.git')
-        zip_url = f'https://github.com/{repo_path}/archive/refs/heads/master.zip'
-        try:
-            response = request.urlopen(zip_url)
-            zip_data = io.BytesIO(response.read())
-            with zipfile.ZipFile(zip_data) as zip_ref:
-                zip_ref.extractall(temp_dir)
-        except Exception as e:
-            print(f"Error downloading or extracting GitHub repo: {e}")
-            shutil.rmtree(temp_dir)
-            return None
-    else:
-        # Handle uploaded ZIP file directly
-        with zipfile.ZipFile(source) as zip_ref:
-            zip_ref.extractall(temp_dir)
-
-    # Load .gitignore file if it exists
-    gitignore_path = os.path.join(temp_dir, '.gitignore')
-    if os.path.exists(gitignore_path):
-        with open(gitignore_path, 'r') as gitignore_file:
-            gitignore_rules = gitignore_file.read().splitlines()
-        gitignore_spec = pathspec.PathSpec.from_lines("gitwildmatch", gitignore_rules)
-    else:
-        gitignore_spec = None
+    Args:
+        mode (str): 'single' sends the whole codebase in one prompt, 'map_reduce'
+            summarizes chunks concurrently and merges them, 'auto' picks
+            map_reduce once the code no longer fits in one chunk
+        chunk_tokens (int): Token budget of each map-reduce chunk
+        max_workers (int): Concurrent LLM calls during map-reduce
+        fan_in (int): Partial summaries merged per reduce call
+        index_dir (str): If given, a retrieval index over the code is saved there for
+            evaluate_project (see retrieval.index_dir_for)
+        embedder (str): 'ollama' or 'hash' embeddings for the retrieval index
+        context_tokens (int): Code budget of a single-prompt summary
+        max_code_tokens (int): Code budget across all chunks in map-reduce mode
+        report (dict): If given, filled with 'manifest', the budget.plan_context
+            record of which files were included or dropped and why, 'static_analysis',
+            the facts from static_analysis.analyze_records, and (when a cache is used)
+            'diff', the files added, modified and deleted since the last run
+    """
+    records = ingest_source(source, is_github_link, max_total_bytes)
+    if records is None:
+        return None
 
-    # Process the files and create summary
-    all_code = ""
+    if index_dir is not None:
+        with tracing.span('index', files=len(records)):
+            build_code_index(records, index_dir, embedder)
 
-    for root, dirs, files in os.walk(temp_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            # Check if the file should be ignored
-            relative_path = os.path.relpath(file_path, temp_dir)
-            if gitignore_spec and gitignore_spec.match_file(relative_path):
-                continue  # Skip ignored files
+    repo = submission_key(source, is_github_link)
+    return get_default_client().run(summarize_records_async(
+        records, repo=repo, cache=cache, mode=mode, chunk_tokens=chunk_tokens, max_workers=max_workers,
+        fan_in=fan_in, context_tokens=context_tokens, max_code_tokens=max_code_tokens, report=report))
 
+def submission_key(source, is_github_link):
+    """
+    ID a submission's manifest and cached summary are stored under: the URL of a GitHub
+    link, or a hash of an uploaded archive's bytes, since unrelated teams upload files
+    with the same name (project.zip, repo-main.zip)
+    """
+    if is_github_link:
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return upload_key(f.read())
+    if hasattr(source, 'getvalue'):
+        return upload_key(source.getvalue())
+    position = source.tell()
+    data = source.read()
+    source.seek(position)
+    return upload_key(data)
+
+def upload_key(data):
+    return f"upload:{hashlib.sha256(data).hexdigest()}"
+
+def ingest_source(source, is_github_link, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES):
+    """
+    Download (for GitHub links) and read a project archive
+
+    Returns:
+        A list of FileRecords, or None if the archive could not be fetched or read
+    """
+    with tracing.span('ingest', github=is_github_link):
+        # Download if it's a GitHub repository
+        if is_github_link:
+            # Served from the local archive cache when GitHub reports the archive unchanged
+            try:
+                archive = get_default_fetcher().fetch(source)
+            except FetchError as e:
+                print(f"Error downloading GitHub repo: {e}")
+                return None
+        else:
+            # Handle uploaded ZIP file directly
+            archive = source
+
+        # Read the files straight out of the archive
+        with tracing.span('extract') as span:
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    file_content = f.read()
-                    all_code += f"\n\n=== File: {file_path} ===\n"
-                    all_code += file_content
-            except Exception as e:
-                print(f"Error reading file {file_path}: {e}")
-                continue
-
-    # Clean up and return
-    shutil.rmtree(temp_dir)
-    end = time.perf_counter()
-    return summarize_code(all_code, "Complete Codebase")
-
-def summarize_code(code, file_path):
-    start = time.perf_counter()
+                with zipfile.ZipFile(archive) as zip_ref:
+                    records = list(iter_archive_files(zip_ref, max_total_bytes=max_total_bytes))
+            except zipfile.BadZipFile as e:
+                print(f"Error extracting archive: {e}")
+                return None
+            span.set(files=len(records), bytes=sum(record.size for record in records))
+            return records
+
+async def summarize_records_async(records, repo=None, cache=None, mode='auto', chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                                  max_workers=DEFAULT_MAP_WORKERS, fan_in=DEFAULT_FAN_IN,
+                                  context_tokens=DEFAULT_CONTEXT_TOKENS, max_code_tokens=DEFAULT_MAX_CODE_TOKENS,
+                                  report=None, model=None, duplicates=None):
+    """
+    Plan the context for ingested files and summarize them (see extract_and_summarize_code)
+
+    With a cache and a repo, the per-file hash manifest of the last run is compared with
+    this one. An unchanged codebase returns its stored summary immediately; otherwise only
+    chunks containing changed files miss the cache and need the LLM.
+
+    With duplicates (a dedup.DuplicateIndex), the files are matched against those of earlier
+    submissions and then added to the index under repo. The match is reported as
+    report['duplicates'] (pass it to evaluate_project), and the submission's own files are
+    chunked after the files it shares with others, so the shared chunks are the same as in
+    the other submissions and their summaries come from the cache.
+    """
+    with tracing.span('summarize', mode=mode, files=len(records)) as span:
+        own_paths = ()
+        if duplicates is not None:
+            with tracing.span('dedup') as dedup_span:
+                matched, own_paths = await asyncio.get_running_loop().run_in_executor(
+                    None, _match_duplicates, duplicates, records, repo)
+                dedup_span.set(shared_files=matched['shared_files'], overlap=matched['overlap'])
+            if report is not None:
+                report['duplicates'] = matched
+        return await _summarize_records(records, repo, cache, mode, chunk_tokens, max_workers, fan_in,
+                                        context_tokens, max_code_tokens, report, model, span, own_paths)
+
+def _match_duplicates(duplicates, records, repo):
+    """
+    Match records against the index and add them to it
+
+    Returns:
+        (match report, paths of the files that matched nothing)
+    """
+    signatures = file_signatures(records)
+    matched = duplicates.match(signatures, submission=repo)
+    if repo is not None:
+        duplicates.add(repo, signatures)
+    # Files too short to sign are left with the shared ones, so the order of a template
+    # and of its forks agree
+    own_paths = {path for path, _, _, _ in signatures} - set(matched['matches'])
+    return matched, own_paths
+
+async def _summarize_records(records, repo, cache, mode, chunk_tokens, max_workers, fan_in, context_tokens,
+                             max_code_tokens, report, model, span, own_paths=()):
+    repo_key = None
+    if cache is not None and repo is not None:
+        hashes = hash_records(records)
+        if report is not None:
+            report['diff'] = diff_manifests(cache.get_manifest(repo), hashes)
+        repo_key = cache.make_key('repo', get_default_tiers().label(model), REPO_SUMMARY_VERSION, mode, chunk_tokens, fan_in, context_tokens,
+                                  max_code_tokens, json.dumps(hashes, sort_keys=True))
+        stored = cache.get(repo_key)
+        span.set(repo_cache_hit=stored is not None)
+        if stored is not None:
+            cache.put_manifest(repo, hashes)
+            if report is not None:
+                report['manifest'] = stored['manifest']
+                report['static_analysis'] = stored.get('static_analysis')
+            return stored['summary']
+
+    summary, manifest, facts = await _summarize_planned(records, cache, repo, mode, chunk_tokens, max_workers,
+                                                        fan_in, context_tokens, max_code_tokens, model, own_paths)
+    if report is not None:
+        report['manifest'] = manifest
+        report['static_analysis'] = facts
+    if repo_key is not None and summary is not None:
+        cache.put(repo_key, {'summary': summary, 'manifest': manifest, 'static_analysis': facts}, repo=repo)
+        cache.put_manifest(repo, hashes)
+    return summary
+
+async def _summarize_planned(records, cache, repo, mode, chunk_tokens, max_workers, fan_in, context_tokens,
+                             max_code_tokens, model, own_paths=()):
+    loop = asyncio.get_running_loop()
+    # Languages, dependencies and complexity are computed exactly, without the LLM
+    with tracing.span('static_analysis', files=len(records)) as span:
+        facts = await loop.run_in_executor(None, analyze_records, records)
+        span.set(loc=facts['loc'], functions=facts['complexity']['functions'])
+
+    # Rank, compact and de-duplicate files, then fill the token budget, off the event loop
+    with tracing.span('plan_context') as span:
+        selected, manifest = await loop.run_in_executor(
+            None, functools.partial(plan_context, records, context_tokens if mode == 'single' else max_code_tokens,
+                                    covered=covered_paths(records)))
+        span.set(included=len(selected), used_tokens=manifest['used_tokens'])
+
+    if mode == 'map_reduce' or (mode == 'auto' and manifest['used_tokens'] > context_tokens):
+        summary = await summarize_code_map_reduce_async(selected, "Complete Codebase", chunk_tokens=chunk_tokens,
+                                                        max_workers=max_workers, fan_in=fan_in, cache=cache,
+                                                        repo=repo, model=model, facts=facts,
+                                                        own_paths=own_paths)
+    else:
+        all_code = "".join(f"\n\n=== File: {record.path} ===\n{record.content}" for record in selected)
+        summary = await summarize_code_async(all_code, "Complete Codebase", cache=cache, repo=repo, model=model,
+                                             facts=facts)
+    return summary, manifest, facts
+
+def build_code_index(records, index_dir, embedder='ollama'):
+    """
+    Build and save the retrieval index for a codebase, falling back to hash
+    embeddings if the embedding model is unavailable
+    """
+    try:
+        index = VectorIndex.build(records, embedder=embedder)
+    except Exception as e:
+        if embedder == 'hash':
+            raise
+        print(f"Error computing embeddings, using hash embeddings instead: {e}")
+        index = VectorIndex.build(records, embedder='hash')
+    index.save(index_dir)
+    return index
+
+def summarize_code(code, file_path, cache=None, repo=None, model=None):
+    return get_default_client().run(summarize_code_async(code, file_path, cache=cache, repo=repo, model=model))
+
+async def summarize_code_async(code, file_path, cache=None, repo=None, model=None, facts=None):
+    """
+    Summarize code in one prompt
+
+    Args:
+        facts (dict): static_analysis.analyze_records output; it is given to the model and
+            merged into the technologies and complexity_analysis of the result
+    """
+    facts_text = f"\n{format_facts(facts)}\n" if facts else ""
     prompt = f"""
 You are an expert code analyzer. Please analyze the following code file and provide both a detailed narrative summary and structured analysis.
 
 File: {file_path}
-Code:
+{facts_text}Code:
 {code}
 Part 2: Structured Analysis (in JSON format):
-{{
-    "summary": "Brief overview of what this code does",
-    "main_functionality": [
-        "List of main functions/features"
-    ],
-    "technologies": {{
-        "languages": [],
-        "frameworks": [],
-        "libraries": [],
-        "ai_components": []
-    }},
-    "code_patterns": [
-        "List of notable design patterns or coding practices used"
-    ],
-    "complexity_analysis": {{
-        "level": "low|medium|high",
-        "explanation": "Brief explanation of complexity assessment"
-    }},
-    "potential_improvements": [
-        "List of suggested improvements or optimizations"
-    ]
-}}
+{STRUCTURED_ANALYSIS_SCHEMA}
 Ensure the JSON portion is valid JSON. Focus on technical accuracy and be specific about AI-related components if present. Nothings besies a JSON output
 """
-    response = get_llm_response(prompt, 'text')
-    end = time.perf_counter()
-
+    key = None
+    if cache is not None:
+        key = cache.make_key('summary', get_default_tiers().model('summary', model), SUMMARY_PROMPT_VERSION, file_path,
+                             facts_text, code)
+    # The structured part is checked, so malformed small-model output escalates to the large model
+    try:
+        response = await _cached_response_async(cache, key, repo, prompt, 'text', 'summary', model,
+                                                schema=STRUCTURED_ANALYSIS_TEMPLATE)
+    except InvalidResponseError as e:
+        # Even the last model's JSON is malformed; its narrative is still worth keeping (not cached,
+        # so a later run can do better)
+        print(f"Invalid summary of {file_path} ({e}), keeping the raw text")
+        tracing.count('invalid_summaries_kept')
+        response = e.response.strip()
+    if facts:
+        response = _with_facts(response, facts)
     return f"\nSummary of {file_path}:\n{response}\n"
 
-def evaluate_project(doc_text, code_summary):
-    with open('metrics.json', 'r') as f:
-        metrics_data = json.load(f)
+def _with_facts(response, facts):
+    """
+    Merge static analysis facts into the JSON of a summary response, or append them
+    if the response holds no JSON
+    """
+    try:
+        analysis = parse_llm_response(response, 'json')
+    except json.JSONDecodeError:
+        analysis = None
+    if not isinstance(analysis, dict):
+        return f"{response}\n\n{format_facts(facts)}"
+    return json.dumps(merge_facts(analysis, facts), indent=2)
+
+async def summarize_chunk(chunk, cache=None, repo=None, model=None):
+    """
+    Map step: analyze one chunk of the codebase into the structured schema
+    """
+    prompt = f"""
+You are an expert code analyzer. The following is one part of a larger codebase.
+Analyze only the files shown and describe them using the structured analysis below.
 
-    # Create a dynamic string for metrics
-    metric_criteria = "\n".join(
-        [f"{metric['title']}: {metric['description']}\n   Evaluation Factors: {', '.join(metric['evaluationFactors'])}"
-         for metric in metrics_data['metrics']])
+Code:
+{chunk}
 
-    # Create the expected output structure
-    output_structure = {metric['title']: {"score": "<score>", "justification": "<justification>"} for metric in
-                        metrics_data['metrics']}
-    output_structure_str = json.dumps(output_structure, indent=2)
+Structured Analysis (in JSON format):
+{STRUCTURED_ANALYSIS_SCHEMA}
+Ensure the output is valid JSON. Focus on technical accuracy and be specific about AI-related components if present. Nothing besides a JSON output
+"""
+    key = None
+    if cache is not None:
+        key = cache.make_key('chunk', get_default_tiers().model('chunk', model), CHUNK_PROMPT_VERSION, chunk)
+    return await _cached_response_async(cache, key, repo, prompt, 'json', 'chunk', model,
+                                        schema=STRUCTURED_ANALYSIS_TEMPLATE)
 
+async def reduce_summaries(summaries, cache=None, repo=None, model=None):
+    """
+    Reduce step: merge several partial analyses into a single one
+    """
+    partials = "\n\n".join(f"Part {i + 1}:\n{json.dumps(summary, indent=2)}" for i, summary in enumerate(summaries))
     prompt = f"""
+You are an expert code analyzer. The following structured analyses each describe a different part of the same codebase.
+Merge them into one analysis of the whole codebase: combine and de-duplicate lists, write a single overall summary,
+and assess the complexity of the codebase as a whole.
+
+{partials}
+
+Merged Structured Analysis (in JSON format):
+{STRUCTURED_ANALYSIS_SCHEMA}
+Ensure the output is valid JSON. Nothing besides a JSON output
+"""
+    key = None
+    if cache is not None:
+        key = cache.make_key('reduce', get_default_tiers().model('reduce', model), REDUCE_PROMPT_VERSION,
+                             json.dumps(summaries, sort_keys=True))
+    return await _cached_response_async(cache, key, repo, prompt, 'json', 'reduce', model,
+                                        schema=STRUCTURED_ANALYSIS_TEMPLATE)
+
+def summarize_code_map_reduce(records, file_path, chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAP_WORKERS,
+                              fan_in=DEFAULT_FAN_IN, cache=None, repo=None, model=None):
+    """
+    Summarize a codebase too large for one prompt
+
+    Files are packed into chunks of at most chunk_tokens, each chunk is summarized
+    concurrently by up to max_workers LLM calls, and the partial summaries are
+    merged fan_in at a time until one remains.
+
+    Returns:
+        The summary text in the same form as summarize_code
+    """
+    return get_default_client().run(summarize_code_map_reduce_async(
+        records, file_path, chunk_tokens=chunk_tokens, max_workers=max_workers, fan_in=fan_in, cache=cache,
+        repo=repo, model=model))
+
+async def summarize_code_map_reduce_async(records, file_path, chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                                          max_workers=DEFAULT_MAP_WORKERS, fan_in=DEFAULT_FAN_IN, cache=None,
+                                          repo=None, model=None, facts=None, own_paths=()):
+    # Path order and anchored boundaries keep unchanged chunks identical between runs. A
+    # submission's own files (see dedup) go last, so the chunks of code it shares with other
+    # submissions do not depend on them and hit the cache across forks.
+    chunks = chunk_records(sorted(records, key=lambda record: (record.path in own_paths, record.path)),
+                           chunk_tokens, anchor_every=CHUNK_ANCHOR_EVERY)
+    if not chunks:
+        return await summarize_code_async("", file_path, cache=cache, repo=repo, model=model, facts=facts)
+
+    summary = await _map_reduce(chunks, max_workers, max(fan_in, 2), cache, repo, model)
+    if summary is None:
+        return None
+    if facts and isinstance(summary, dict):
+        summary = merge_facts(summary, facts)
+    return f"\nSummary of {file_path}:\n{json.dumps(summary, indent=2)}\n"
+
+async def _map_reduce(chunks, max_workers, fan_in, cache, repo, model):
+    workers = asyncio.Semaphore(max_workers)
+
+    async def map_chunk(chunk):
+        async with workers:
+            try:
+                return await summarize_chunk(chunk, cache=cache, repo=repo, model=model)
+            except ValueError as e:
+                print(f"Error summarizing chunk: {e}")
+                return None
+
+    async def reduce_group(group):
+        if len(group) == 1:
+            return group[0]
+        async with workers:
+            try:
+                return await reduce_summaries(group, cache=cache, repo=repo, model=model)
+            except ValueError as e:
+                # Keep one partial analysis rather than losing the whole summary
+                print(f"Error merging summaries: {e}")
+                return group[0]
+
+    with tracing.span('map', chunks=len(chunks)):
+        level = [summary for summary in await asyncio.gather(*(map_chunk(chunk) for chunk in chunks))
+                 if summary is not None]
+    if not level:
+        return None
+
+    with tracing.span('reduce', partials=len(level)):
+        while len(level) > 1:
+            groups = [level[i:i + fan_in] for i in range(0, len(level), fan_in)]
+            level = list(await asyncio.gather(*(reduce_group(group) for group in groups)))
+    return level[0]
+
+def evaluate_project(doc_text, code_summary, cache=None, repo=None, model=None, mode='single',
+                     group_size=1, max_workers=DEFAULT_METRIC_WORKERS, retries=DEFAULT_METRIC_RETRIES, report=None,
+                     on_metric=None, index=None, top_k=DEFAULT_TOP_K, rubric=None, duplicates=None):
+    """
+    Score the project against every metric of a rubric
+
+    Args:
+        model (str): Model for every request; by default the 'evaluation' stage's model tier
+            (see model_tiers) is used
+        mode (str): 'single' asks for all metrics in one prompt, 'per_metric' evaluates
+            groups of group_size metrics as independent concurrent requests
+        group_size (int): Metrics per request in per_metric mode
+        max_workers (int): Concurrent requests in per_metric mode
+        retries (int): Extra attempts for a group whose output is missing or invalid
+        report (dict): If given, filled with 'rubric', the id of the rubric version used,
+            'model', 'prompt_tokens' and, in per_metric mode, 'metric_latency' and 'attempts' per
+            metric title
+        on_metric (callable): Called as on_metric(title, result) as soon as each metric's
+            result has been generated and validated (on the LLM client's thread)
+        index (retrieval.VectorIndex): If given, the top_k code chunks most relevant to
+            each metric's evaluation factors are added to its prompt
+        rubric (metrics_store.Rubric): Metrics to score against (default: the latest
+            version of the default rubric set)
+        duplicates (dict): report['duplicates'] of the summary; code shared with other
+            submissions is pointed out in the prompt
+
+    Returns:
+        {title: {"score": ..., "justification": ...}} for every metric
+    """
+    return get_default_client().run(evaluate_project_async(
+        doc_text, code_summary, cache=cache, repo=repo, model=model, mode=mode, group_size=group_size,
+        max_workers=max_workers, retries=retries, report=report, on_metric=on_metric, index=index, top_k=top_k,
+        rubric=rubric, duplicates=duplicates))
+
+async def evaluate_project_async(doc_text, code_summary, cache=None, repo=None, model=None, mode='single',
+                                 group_size=1, max_workers=DEFAULT_METRIC_WORKERS, retries=DEFAULT_METRIC_RETRIES,
+                                 report=None, on_metric=None, index=None, top_k=DEFAULT_TOP_K, rubric=None,
+                                 duplicates=None):
+    if rubric is None:
+        # Off the event loop: this may import an edited metrics.json
+        rubric = await asyncio.get_running_loop().run_in_executor(None, get_default_store().get_rubric)
+    if rubric is None or not rubric.metrics:
+        raise ValueError("No evaluation metrics defined")
+    if report is not None:
+        report['rubric'] = rubric.id
+        report['model'] = get_default_tiers().model('evaluation', model)
+
+    # Shared-code findings go with the code summary, where the model looks for implementation facts
+    code_summary = _with_similarity(code_summary, duplicates)
+    with tracing.span('evaluate', mode=mode, metrics=len(rubric.metrics), rubric=rubric.id):
+        if mode == 'per_metric':
+            return await _evaluate_per_metric(
+                doc_text, code_summary, rubric, cache, repo, model, max(group_size, 1),
+                max_workers, retries, report, on_metric, index, top_k)
+        return await _evaluate_single(doc_text, code_summary, rubric, cache, repo, model, retries,
+                                      report, on_metric, index, top_k)
+
+async def _evaluate_single(doc_text, code_summary, rubric, cache, repo, model, retries, report, on_metric, index,
+                           top_k):
+    context = ''
+    if index is not None:
+        hit_lists = await index.search_async([_metric_query(metric) for metric in rubric.metrics], top_k)
+        # Keep the prompt near the size of a single metric's context
+        context = format_chunks(_merge_hits(hit_lists, top_k * 2))
+    prompt = _build_evaluation_prompt(doc_text, code_summary, rubric, context)
+    if report is not None:
+        report['prompt_tokens'] = count_tokens(prompt)
+    output_structure = rubric.output_structure
+    key = None
+    if cache is not None:
+        key = cache.make_key('evaluation', get_default_tiers().model('evaluation', model), EVALUATION_PROMPT_VERSION,
+                             prompt)
+    for attempt in range(retries + 1):
+        try:
+            return await _cached_response_async(cache, key, repo, prompt, 'json', 'evaluation', model,
+                                                schema=output_structure,
+                                                on_member=on_metric)
+        except ValueError as e:
+            if attempt == retries:
+                raise
+            print(f"Invalid evaluation output ({e}), retrying")
+
+def _with_similarity(code_summary, duplicates):
+    text = similarity_text(duplicates)
+    if not text:
+        return code_summary
+    return f"""{code_summary}
+
+    Code Originality (compared with other submissions):
+    {text}
+"""
+
+def _relevant_code_section(context):
+    if not context:
+        return ''
+    return f"""
+    Relevant Code (retrieved for these criteria):
+    {context}
+"""
+
+def _metric_query(metric):
+    """
+    Text used to retrieve code relevant to a metric
+    """
+    factors = ", ".join(factor_text(factor) for factor in metric['evaluationFactors'])
+    return f"{metric['title']}: {metric['description']}\nEvaluation Factors: {factors}"
+
+def _merge_hits(hit_lists, top_k):
+    """
+    Combine retrieval hits for several metrics, dropping duplicate chunks
+    """
+    merged = {}
+    for hits in hit_lists:
+        for score, chunk in hits:
+            key = (chunk['path'], chunk['start_line'])
+            if key not in merged or merged[key][0] < score:
+                merged[key] = (score, chunk)
+    return sorted(merged.values(), key=lambda hit: -hit[0])[:top_k]
+
+def _build_evaluation_prompt(doc_text, code_summary, rubric, context=''):
+    metric_criteria, output_structure_str, _ = rubric.fragments()
+    return f"""
     You are an expert code analyst and project evaluator. Your task is to evaluate the project based on specific criteria using the provided project description and code summary.
 
     Criteria:
@@ -145,7 +600,7 @@ def evaluate_project(doc_text, code_summary):
 
     Code Summary:
     {code_summary}
-
+    {_relevant_code_section(context)}
     Your evaluation should be in JSON format for all the metrics available in the criteria, with each metric having the following structure:
     {output_structure_str}
 
@@ -154,31 +609,219 @@ def evaluate_project(doc_text, code_summary):
     Provide your evaluation in valid JSON format only, without any additional explanation.
     """
 
-    # Here you would call your LLM (e.g., Ollama) with this prompt
-    # For demonstration, I'll just return the prompt
-    return get_llm_response(prompt, 'json')
+def _build_metric_group_prompt(prefix, rubric, metrics, context=''):
+    metric_criteria, output_structure_str, _ = rubric.fragments(metrics)
+    return f"""{prefix}
+    Criteria:
+    {metric_criteria}
+    {_relevant_code_section(context)}
+
+    Your evaluation should be in JSON format for the metrics in the criteria above, with each metric having the following structure:
+    {output_structure_str}
+
+    Replace <score> with a number from 1 to 10, and <justification> with proper highly critique justification and reasoning for the evaluation.
+    Don't give N/A as score make it 0 if not applicable
+    Provide your evaluation in valid JSON format only, without any additional explanation.
+    """
+
+def _pick_metric_results(response, titles):
+    """
+    Return the valid {title: result} entries of a model response, matching titles case-insensitively
+    """
+    if not isinstance(response, dict):
+        return {}
+    by_name = {str(name).strip().casefold(): value for name, value in response.items()}
+    results = {}
+    for title in titles:
+        value = response.get(title, by_name.get(title.casefold()))
+        if isinstance(value, dict) and 'score' in value and 'justification' in value:
+            results[title] = value
+    return results
+
+async def _evaluate_per_metric(doc_text, code_summary, rubric, cache, repo, model, group_size, max_workers, retries,
+                               report, on_metric, index, top_k):
+    # Every request starts with the same text so the server can reuse the prompt prefix
+    prefix = f"""
+    You are an expert code analyst and project evaluator. Your task is to evaluate the project based on specific criteria using the provided project description and code summary.
+
+    Project Description:
+    {doc_text}
+
+    Code Summary:
+    {code_summary}
+    """
+    metrics = rubric.metrics
+    workers = asyncio.Semaphore(max_workers)
+    metric_hits = {}
+    if index is not None:
+        hit_lists = await index.search_async([_metric_query(metric) for metric in metrics], top_k)
+        metric_hits = {metric['title']: hits for metric, hits in zip(metrics, hit_lists)}
+    latency = {}
+    attempts = {}
+    prompt_tokens = {}
+
+    async def evaluate_group(group):
+        results = {}
+        pending = list(group)
+        error = None
+        for attempt in range(retries + 1):
+            context = ''
+            if metric_hits:
+                context = format_chunks(_merge_hits([metric_hits[metric['title']] for metric in pending], top_k))
+            prompt = _build_metric_group_prompt(prefix, rubric, pending, context)
+            prompt_tokens[pending[0]['title']] = count_tokens(prompt)
+            _, _, schema = rubric.fragments(pending)
+            titles = list(schema)
+            picked = {}
+
+            def on_member(title, result):
+                picked[title] = result
+                if on_metric is not None:
+                    on_metric(title, result)
+
+            key = None
+            response = None
+            if cache is not None:
+                key = cache.make_key('evaluation', get_default_tiers().model('evaluation', model),
+                                     EVALUATION_PROMPT_VERSION, prompt)
+                response = cache.get(key)
+            start = time.perf_counter()
+            with tracing.span('evaluate.group', metrics=titles, attempt=attempt + 1, cache_hit=response is not None):
+                if response is not None:
+                    for title, result in _pick_metric_results(response, titles).items():
+                        on_member(title, result)
+                else:
+                    try:
+                        async with workers:
+                            response = await get_default_tiers().call(
+                                'evaluation', functools.partial(get_llm_response_async, prompt, 'json', schema=schema,
+                                                                on_member=on_member), model)
+                        if cache is not None:
+                            cache.put(key, response, repo=repo)
+                    except Exception as e:
+                        # Members that completed before the failure are kept
+                        error = e
+            elapsed = time.perf_counter() - start
+
+            for title in titles:
+                latency[title] = latency.get(title, 0.0) + elapsed
+                attempts[title] = attempt + 1
+            results.update(picked)
+
+            # Retry only the metrics that are still missing
+            pending = [metric for metric in pending if metric['title'] not in results]
+            if not pending:
+                break
+
+        for metric in pending:
+            reason = error or 'missing or malformed result'
+            print(f"Error evaluating metric {metric['title']}: {reason}")
+            results[metric['title']] = {"score": 0, "justification": f"Evaluation failed: {reason}"}
+        return results
+
+    groups = [metrics[i:i + group_size] for i in range(0, len(metrics), group_size)]
+    evaluation = {}
+    for results in await asyncio.gather(*(evaluate_group(group) for group in groups)):
+        evaluation.update(results)
+    # Keep the order of the rubric
+    evaluation = {metric['title']: evaluation[metric['title']] for metric in metrics}
+
+    if report is not None:
+        report['metric_latency'] = latency
+        report['attempts'] = attempts
+        report['prompt_tokens'] = sum(prompt_tokens.values())
+    return evaluation
+
+def _cached_response(cache, key, repo, prompt, response_type, stage, model=None, schema=None, on_member=None,
+                     strict=False):
+    """
+    Return the cached result for key, calling the LLM and storing the result on a miss
 
-def get_llm_response(prompt, response_type='text', model='llama3.2'):
+    The LLM call goes to the model tier of stage (see model_tiers), or to model if given.
+    """
+    return get_default_client().run(
+        _cached_response_async(cache, key, repo, prompt, response_type, stage, model, schema, on_member, strict))
+
+async def _cached_response_async(cache, key, repo, prompt, response_type, stage, model=None, schema=None,
+                                 on_member=None, strict=False):
+    request = functools.partial(get_llm_response_async, prompt, response_type, schema=schema, on_member=on_member,
+                                strict=strict)
+    if cache is None:
+        return await get_default_tiers().call(stage, request, model)
+    result = cache.get(key)
+    tracing.count('cache_lookups', kind=key.split(':', 1)[0], result='miss' if result is None else 'hit')
+    if result is None:
+        # Stored under the first model's key even when escalated, so the small model is not asked again
+        result = await get_default_tiers().call(stage, request, model)
+        cache.put(key, result, repo=repo)
+    elif on_member is not None and isinstance(result, dict):
+        for name, value in result.items():
+            on_member(name, value)
+    return result
+
+def get_llm_response(prompt, response_type='text', model=DEFAULT_MODEL):
     """
     Generic function to get responses from the LLM
 
     Args:
         prompt (str): The prompt to send to the model
         response_type (str): The type of response expected ('text', 'json', or 'list')
-        model (str): The model to use (default: 'llama2')
+        model (str): The model to use (default: DEFAULT_MODEL)
 
     Returns:
         The processed response based on response_type
     """
-    messages = [{'role': 'user', 'content': prompt}]
-    response = ''
+    return get_default_client().run(get_llm_response_async(prompt, response_type, model=model))
 
-    # Get the raw response
-    for chunk in ollama.chat(model=model, messages=messages, stream=True):
-        if 'message' in chunk:
-            response += chunk['message']['content']
-    response = response.strip()
-    print(response)
+async def get_llm_response_async(prompt, response_type='text', model=DEFAULT_MODEL, client=None, schema=None,
+                                 on_member=None, strict=False):
+    """
+    Coroutine version of get_llm_response, for use on the LLM client's event loop
+
+    In 'json' mode the stream is parsed incrementally: schema (a template like the
+    output_structure in evaluate_project) is checked member by member, on_member(key, value)
+    is called as each top-level member completes, and a json_stream.JSONStreamError
+    (a ValueError) is raised as soon as the output cannot become valid. Top-level keys the
+    schema does not name are ignored, or rejected with strict. The schema is also sent to
+    Ollama as the output format.
+
+    In 'text' mode with a schema, the text must contain a JSON object matching it (such as
+    the structured part of a summary); it is returned unchanged, or InvalidResponseError (a
+    ValueError holding the text) is raised.
+    """
+    client = client or get_default_client()
+    prompt_tokens = _check_prompt_size(prompt)
+    tracing.observe('prompt_tokens_estimated', prompt_tokens, response_type=response_type)
+    if response_type != 'json':
+        response = await client.chat(prompt, model, options=MODEL_OPTIONS)
+        if schema is not None and response_type == 'text':
+            try:
+                validate(parse_llm_response(response.strip(), 'json'), schema, strict=strict)
+            except ValueError as e:
+                raise InvalidResponseError(str(e), response) from e
+        return parse_llm_response(response.strip(), response_type)
+
+    # Parse while streaming so generation stops as soon as the object is complete
+    parser = IncrementalJSONParser(schema=schema, on_member=on_member, strict=strict)
+    format = json_schema(schema, strict) if schema is not None else ''
+    response = await client.chat(prompt, model, options=MODEL_OPTIONS, format=format, consumer=parser)
+    if parser.done:
+        return parser.result
+    result = parse_llm_response(response.strip(), 'json')
+    if schema is not None:
+        validate(result, schema, strict=strict)
+    return result
+
+def _check_prompt_size(prompt):
+    tokens = count_tokens(prompt)
+    if tokens > MODEL_OPTIONS['num_ctx'] - OUTPUT_RESERVE_TOKENS:
+        print(f"Warning: prompt of ~{tokens} tokens may not fit the {MODEL_OPTIONS['num_ctx']}-token context window")
+    return tokens
+
+def parse_llm_response(response, response_type):
+    """
+    Convert raw model output into the form requested by response_type
+    """
     if response_type == 'json':
         try:
             return json.loads(response)
@@ -190,13 +833,18 @@ def get_llm_response(prompt, response_type='text', model='llama3.2'):
             return json.loads(json_text)
     elif response_type == 'list':
         try:
-            return eval(response)
-        except:
-            return ["Error: Invalid response format"]
+            start_index = response.find('[')
+            end_index = response.rfind(']') + 1
+            result = ast.literal_eval(response[start_index:end_index])
+            if isinstance(result, (list, tuple)):
+                return list(result)
+        except (ValueError, SyntaxError):
+            pass
+        return ["Error: Invalid response format"]
     else:
         return response
 
-def generate_evaluation_factors(title, description):
+def generate_evaluation_factors(title, description, cache=None, model=None):
     prompt = f"""
 Given this metric title and description for a project evaluation system, generate specific evaluation factors.
 Each factor should be clear, measurable, and directly related to assessing this metric.
@@ -227,7 +875,12 @@ Format your response as a json object no extra text at the end , for example:
 
 Ensure each factor is concise but descriptive enough to be useful for evaluation.
 """
-    return get_llm_response(prompt, 'json')
+    key = None
+    if cache is not None:
+        key = cache.make_key('factors', get_default_tiers().model('factors', model), FACTORS_PROMPT_VERSION, title,
+                             description)
+    # The factors object is the whole answer, so anything beyond its keys means the model went off script
+    return _cached_response(cache, key, None, prompt, 'json', 'factors', model, schema=FACTORS_TEMPLATE, strict=True)
 
 
 # url  = "https://github.com/dougdragon/browser-info.git"
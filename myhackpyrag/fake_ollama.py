@@ -0,0 +1,279 @@
+# fake_ollama.py
+"""
+Deterministic local stand-in for the Ollama HTTP API.
+
+Serves /api/chat (streaming and not), /api/generate, /api/embeddings,
+/api/embed and /api/tags with configurable latency, token rate and canned
+outputs, and counts requests and prompt bytes. Used by bench.py and for
+trying the app without a model:
+
+    python fake_ollama.py --port 11434 --tokens-per-second 200
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_EMBEDDING_DIM = 64
+# Characters per streamed token
+TOKEN_CHARS = 4
+
+CANNED_ANALYSIS = {
+    "summary": "A small web application that loads data, processes it and serves the results.",
+    "main_functionality": ["Load input data", "Process records", "Serve results over HTTP"],
+    "technologies": {
+        "languages": ["Python"],
+        "frameworks": ["Streamlit"],
+        "libraries": ["pandas", "requests"],
+        "ai_components": ["LLM prompt pipeline"],
+    },
+    "code_patterns": ["Modular functions", "Configuration through constants"],
+    "complexity_analysis": {"level": "medium", "explanation": "Several modules with clear responsibilities."},
+    "potential_improvements": ["Add tests", "Handle network errors"],
+}
+CANNED_FACTORS = {
+    "title": "Metric",
+    "description": "Generated metric",
+    "weightage": 10,
+    "evaluationFactors": ["Clarity of purpose", "Quality of implementation", "Measurable outcomes"],
+}
+CANNED_TEXT = "This project implements a data processing pipeline with a small user interface."
+
+
+def default_responder(prompt, format=None):
+    """
+    Pick a canned reply that fits the requests evaluator.py sends
+
+    JSON requests are told apart by the properties of their format schema (see
+    json_stream.json_schema), not by the prompt, which may quote any of these words.
+    """
+    properties = format.get('properties', {}) if isinstance(format, dict) else {}
+    if 'evaluationFactors' in properties:
+        return json.dumps(CANNED_FACTORS)
+    if 'main_functionality' in properties:
+        return json.dumps(CANNED_ANALYSIS, indent=2)
+    if properties:
+        # Evaluation: one result per metric title in the requested schema
+        return json.dumps({title: {"score": 7, "justification": f"Meets the {title} criteria reasonably well."}
+                           for title in properties})
+    if 'Structured Analysis' in prompt:
+        # The single-pass summary asks for the analysis as text, without a format
+        return json.dumps(CANNED_ANALYSIS, indent=2)
+    return CANNED_TEXT
+
+
+def canned_responder(replies, fallback=default_responder):
+    """
+    Responder returning replies[key] for the first key found in the prompt
+
+    Args:
+        replies (dict): {prompt substring: reply text}
+    """
+    def respond(prompt, format=None):
+        for key, reply in replies.items():
+            if key in prompt:
+                return reply
+        return fallback(prompt, format)
+
+    return respond
+
+
+def embed_text(text, dim=DEFAULT_EMBEDDING_DIM):
+    """
+    Deterministic pseudo-embedding of text
+    """
+    digest = b''
+    counter = 0
+    while len(digest) < dim:
+        digest += hashlib.sha256(f"{counter}:{text}".encode('utf-8')).digest()
+        counter += 1
+    return [byte / 127.5 - 1.0 for byte in digest[:dim]]
+
+
+class FakeOllama:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, tokens_per_second=0.0, responder=None,
+                 embedding_dim=DEFAULT_EMBEDDING_DIM):
+        """
+        Args:
+            port (int): 0 picks a free port
+            latency (float): Seconds before the first token (or embedding) is sent
+            tokens_per_second (float): Output rate; 0 sends tokens as fast as possible
+            responder (callable): responder(prompt, format) -> reply text, where format is the
+                request's format ('', 'json' or a JSON schema; default: default_responder)
+        """
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.responder = responder or default_responder
+        self.embedding_dim = embedding_dim
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {'requests': 0, 'prompt_bytes': 0, 'output_tokens': 0, 'by_path': {}}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, by_path=dict(self._stats['by_path']))
+
+    def _record(self, path, prompt_bytes):
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['prompt_bytes'] += prompt_bytes
+            self._stats['by_path'][path] = self._stats['by_path'].get(path, 0) + 1
+
+    def _record_output(self, tokens):
+        with self._lock:
+            self._stats['output_tokens'] += tokens
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path in ('/api/tags', '/api/version'):
+                    self._send_json({'models': []} if self.path == '/api/tags' else {'version': '0.0.0-fake'})
+                else:
+                    self._send_json({'error': 'not found'}, status=404)
+
+            def do_POST(self):
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                    if self.path == '/api/chat':
+                        prompt = "".join(message.get('content', '') for message in body.get('messages', []))
+                        self._generate(body, prompt, chat=True)
+                    elif self.path == '/api/generate':
+                        self._generate(body, body.get('prompt', ''), chat=False)
+                    elif self.path in ('/api/embeddings', '/api/embed'):
+                        self._embed(body)
+                    else:
+                        self._send_json({'error': 'not found'}, status=404)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading, e.g. after early stopping
+                    pass
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _embed(self, body):
+                texts = body.get('input', body.get('prompt', ''))
+                batch = isinstance(texts, list)
+                texts = texts if batch else [texts]
+                fake._record(self.path, sum(len(text.encode('utf-8')) for text in texts))
+                if fake.latency:
+                    time.sleep(fake.latency)
+                vectors = [embed_text(text, fake.embedding_dim) for text in texts]
+                if self.path == '/api/embed':
+                    self._send_json({'model': body.get('model', ''), 'embeddings': vectors})
+                else:
+                    self._send_json({'embedding': vectors[0]})
+
+            def _generate(self, body, prompt, chat):
+                fake._record(self.path, len(prompt.encode('utf-8')))
+                model = body.get('model', '')
+                reply = fake.responder(prompt, body.get('format')) if prompt else ''
+                tokens = [reply[i:i + TOKEN_CHARS] for i in range(0, len(reply), TOKEN_CHARS)]
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                def piece(text, done):
+                    chunk = {'model': model, 'created_at': '2024-01-01T00:00:00Z', 'done': done}
+                    if chat:
+                        chunk['message'] = {'role': 'assistant', 'content': text}
+                    else:
+                        chunk['response'] = text
+                    if done:
+                        chunk.update(done_reason='stop', total_duration=int(fake.latency * 1e9),
+                                     load_duration=0, prompt_eval_count=len(prompt) // TOKEN_CHARS,
+                                     prompt_eval_duration=int(fake.latency * 1e9), eval_count=len(tokens),
+                                     eval_duration=int(len(tokens) / fake.tokens_per_second * 1e9)
+                                     if fake.tokens_per_second else len(tokens) * 1000)
+                    return chunk
+
+                if body.get('stream', True) is False:
+                    if fake.tokens_per_second:
+                        time.sleep(len(tokens) / fake.tokens_per_second)
+                    fake._record_output(len(tokens))
+                    final = piece(reply, True)
+                    self._send_json(final)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for token in tokens:
+                    if fake.tokens_per_second:
+                        time.sleep(1 / fake.tokens_per_second)
+                    self._write_chunk(piece(token, False))
+                    fake._record_output(1)
+                self._write_chunk(piece('', True))
+                self.wfile.write(b'0\r\n\r\n')
+
+            def _write_chunk(self, payload):
+                data = (json.dumps(payload) + '\n').encode('utf-8')
+                self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help="Output rate, 0 for unlimited")
+    parser.add_argument('--replies', help="JSON file of {prompt substring: reply} canned outputs")
+    args = parser.parse_args()
+    responder = None
+    if args.replies:
+        with open(args.replies, 'r', encoding='utf-8') as f:
+            responder = canned_responder(json.load(f))
+    server = FakeOllama(port=args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                        responder=responder)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
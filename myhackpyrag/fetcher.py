@@ -0,0 +1,245 @@
+# fetcher.py
+"""
+Cached, conditional download of GitHub repository archives.
+
+The default branch is resolved through the GitHub API (unless the URL names a
+branch), the archive is streamed in chunks into an on-disk cache, and later
+fetches send If-None-Match with the stored ETag so an unchanged repository
+costs one small 304 response. A single pooled HTTP client is reused across
+fetches. The base URLs are configurable so a local HTTP server can stand in
+for GitHub.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import httpx
+
+import tracing
+
+DEFAULT_ARCHIVE_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'evalbuddy', 'archives')
+DEFAULT_MAX_ARCHIVE_BYTES = 200 * 1024 * 1024
+DEFAULT_FETCH_TIMEOUT = 60.0
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+GITHUB_API_BASE = 'https://api.github.com'
+GITHUB_WEB_BASE = 'https://github.com'
+GITHUB_HOSTS = ('github.com', 'www.github.com')
+
+_GITHUB_PREFIX_RE = re.compile(r'^(?:www\.)?github\.com/', re.IGNORECASE)
+
+
+class FetchError(Exception):
+    pass
+
+
+def is_github_url(text):
+    """
+    True if text names a GitHub repository: an http(s) URL on github.com, or
+    github.com/owner/repo without a scheme. Paths such as uploads/repo.zip are not.
+    """
+    text = text.strip()
+    if '://' in text:
+        parsed = urlparse(text)
+        return parsed.scheme in ('http', 'https') and (parsed.hostname or '') in GITHUB_HOSTS
+    return bool(_GITHUB_PREFIX_RE.match(text))
+
+
+def parse_github_url(url):
+    """
+    Split a GitHub repository URL into (owner, repo, branch)
+
+    branch is None unless the URL points at a tree, e.g.
+    https://github.com/owner/repo/tree/dev. Without a scheme, both
+    github.com/owner/repo and owner/repo are accepted; with one, the host must
+    be github.com.
+    """
+    url = url.strip()
+    if '://' in url:
+        parsed = urlparse(url)
+        if (parsed.hostname or '') not in GITHUB_HOSTS:
+            raise FetchError(f"Not a GitHub repository URL: {url}")
+        path = parsed.path
+    else:
+        path = _GITHUB_PREFIX_RE.sub('', url)
+    parts = [part for part in path.split('/') if part]
+    # GitHub owners cannot contain dots, so a first part like "gitlab.com" is another host
+    if len(parts) < 2 or '.' in parts[0]:
+        raise FetchError(f"Not a GitHub repository URL: {url}")
+    owner, repo = parts[0], parts[1]
+    if repo.endswith('.git'):
+        repo = repo[:-len('.git')]
+    branch = '/'.join(parts[3:]) if len(parts) > 3 and parts[2] == 'tree' else None
+    return owner, repo, branch
+
+
+class ArchiveFetcher:
+    def __init__(self, cache_dir=DEFAULT_ARCHIVE_ROOT, max_bytes=DEFAULT_MAX_ARCHIVE_BYTES,
+                 timeout=DEFAULT_FETCH_TIMEOUT, api_base=GITHUB_API_BASE, web_base=GITHUB_WEB_BASE, token=None):
+        """
+        Args:
+            cache_dir (str): Directory holding downloaded archives and their metadata
+            max_bytes (int): Archives larger than this are rejected
+            timeout (float): Connect/read timeout in seconds
+            api_base (str): GitHub API root, used to look up the default branch
+            web_base (str): Root that serves /{owner}/{repo}/archive/refs/heads/{branch}.zip
+            token (str): Optional GitHub token, defaults to GITHUB_TOKEN
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.api_base = api_base.rstrip('/')
+        self.web_base = web_base.rstrip('/')
+        self.downloads = 0
+        self.revalidations = 0
+        token = token or os.environ.get('GITHUB_TOKEN')
+        headers = {'User-Agent': 'evalbuddy'}
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        self._client = httpx.Client(timeout=timeout, follow_redirects=True, headers=headers)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]
+        return os.path.join(self.cache_dir, f"{digest}.zip"), os.path.join(self.cache_dir, f"{digest}.json")
+
+    @staticmethod
+    def _read_meta(meta_path):
+        try:
+            with open(meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(meta_path, meta):
+        tmp_path = f"{meta_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def resolve_default_branch(self, owner, repo):
+        """
+        Return the default branch of a repository, revalidating the cached answer with its ETag
+        """
+        url = f"{self.api_base}/repos/{owner}/{repo}"
+        _, meta_path = self._paths(url)
+        meta = self._read_meta(meta_path)
+        headers = {'Accept': 'application/vnd.github+json'}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        try:
+            response = self._client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            if meta:
+                return meta['default_branch']
+            raise FetchError(f"Could not look up {owner}/{repo}: {e}") from e
+        if response.status_code == 304 and meta:
+            return meta['default_branch']
+        if response.status_code != 200:
+            if meta:
+                # Rate limited or unavailable; the last known answer is still the best guess
+                return meta['default_branch']
+            raise FetchError(f"Could not look up {owner}/{repo}: HTTP {response.status_code}")
+        branch = response.json()['default_branch']
+        self._write_meta(meta_path, {'url': url, 'etag': response.headers.get('etag'), 'default_branch': branch})
+        return branch
+
+    def fetch_url(self, url):
+        """
+        Download url into the cache, or revalidate the cached copy, and return its path
+        """
+        with tracing.span('download', url=url) as span:
+            return self._fetch_url(url, span)
+
+    def _fetch_url(self, url, span):
+        archive_path, meta_path = self._paths(url)
+        meta = self._read_meta(meta_path) if os.path.exists(archive_path) else None
+        headers = {}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        elif meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            with self._client.stream('GET', url, headers=headers) as response:
+                if response.status_code == 304 and meta:
+                    self.revalidations += 1
+                    span.set(result='not_modified')
+                    tracing.count('archive_fetches', result='not_modified')
+                    return archive_path
+                if response.status_code != 200:
+                    raise FetchError(f"Downloading {url} failed: HTTP {response.status_code}")
+                length = response.headers.get('content-length')
+                if length and int(length) > self.max_bytes:
+                    raise FetchError(f"{url} is {int(length)} bytes, over the {self.max_bytes} byte limit")
+                self._download(response, archive_path, url)
+        except httpx.HTTPError as e:
+            raise FetchError(f"Downloading {url} failed: {e}") from e
+
+        self.downloads += 1
+        size = os.path.getsize(archive_path)
+        span.set(result='downloaded', bytes=size)
+        tracing.count('archive_fetches', result='downloaded')
+        tracing.count('download_bytes', size)
+        self._write_meta(meta_path, {
+            'url': url,
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'size': size,
+            'fetched': time.time(),
+        })
+        return archive_path
+
+    def _download(self, response, archive_path, url):
+        # Write next to the final path and rename, so readers never see a partial archive
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        try:
+            written = 0
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_bytes(DOWNLOAD_CHUNK_BYTES):
+                    written += len(chunk)
+                    if written > self.max_bytes:
+                        raise FetchError(f"{url} is over the {self.max_bytes} byte limit")
+                    f.write(chunk)
+            os.replace(tmp_path, archive_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def fetch(self, repo_url):
+        """
+        Return the path of a local zip of the repository's branch (the default branch
+        unless the URL names one)
+        """
+        owner, repo, branch = parse_github_url(repo_url)
+        if branch is None:
+            try:
+                branch = self.resolve_default_branch(owner, repo)
+            except FetchError as e:
+                # HEAD.zip follows the default branch without needing the API
+                print(f"{e}; falling back to the HEAD archive")
+                branch = None
+        ref = f"refs/heads/{branch}" if branch else 'HEAD'
+        return self.fetch_url(f"{self.web_base}/{owner}/{repo}/archive/{ref}.zip")
+
+    def close(self):
+        self._client.close()
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_default_fetcher():
+    """
+    Return the process-wide ArchiveFetcher, creating it on first use
+    """
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = ArchiveFetcher()
+    return _default_fetcher
@@ -0,0 +1,41 @@
+# incremental.py
+"""
+Per-file content hashing for incremental re-evaluation.
+
+The manifest of a repository maps every ingested path to a hash of its
+content. Comparing it with the manifest stored on the previous run tells
+which files were added, modified or deleted.
+"""
+import hashlib
+
+
+def hash_records(records):
+    """
+    Return the {path: sha256 of content} manifest of ingested FileRecords
+    """
+    return {record.path: hashlib.sha256(record.content.encode('utf-8', errors='ignore')).hexdigest()
+            for record in records}
+
+
+def diff_manifests(previous, current):
+    """
+    Compare two manifests
+
+    Args:
+        previous (dict): Manifest of the last run, or None if there was none
+        current (dict): Manifest of this run
+
+    Returns:
+        {'first_run': bool, 'added': [...], 'modified': [...], 'deleted': [...], 'unchanged': int}
+    """
+    previous = previous or {}
+    added = sorted(path for path in current if path not in previous)
+    deleted = sorted(path for path in previous if path not in current)
+    modified = sorted(path for path in current if path in previous and previous[path] != current[path])
+    return {
+        'first_run': not previous,
+        'added': added,
+        'modified': modified,
+        'deleted': deleted,
+        'unchanged': len(current) - len(added) - len(modified),
+    }
@@ -0,0 +1,201 @@
+# ingest.py
+"""
+Streaming ingestion of project archives.
+
+Files are read straight out of the ZIP archive one member at a time, so
+nothing is extracted to disk and memory use is bounded by the configured
+limits instead of by the size of the repository.
+"""
+import hashlib
+import posixpath
+import zipfile
+from typing import NamedTuple
+
+import pathspec
+
+import tracing
+from budget import count_tokens
+
+# Per-file and per-archive limits on decoded source text
+DEFAULT_MAX_FILE_BYTES = 512 * 1024
+DEFAULT_MAX_TOTAL_BYTES = 16 * 1024 * 1024
+
+# Bytes inspected to decide whether a member is binary
+BINARY_SNIFF_BYTES = 8192
+
+# Paths that are never worth sending to the model, with or without a .gitignore
+DEFAULT_IGNORE_PATTERNS = [
+    '.git/',
+    '__MACOSX/',
+    '.DS_Store',
+    'node_modules/',
+    '__pycache__/',
+    '*.pyc',
+]
+
+
+class FileRecord(NamedTuple):
+    path: str
+    content: str
+    size: int
+
+
+def _archive_prefix(names):
+    """
+    Return the single top-level folder shared by every member (GitHub archives
+    wrap the repository in '<repo>-<branch>/'), or '' if there is none.
+    """
+    prefix = None
+    for name in names:
+        head, sep, _ = name.partition('/')
+        if not sep:
+            return ''
+        if prefix is None:
+            prefix = head
+        elif head != prefix:
+            return ''
+    return f"{prefix}/" if prefix else ''
+
+
+def _load_ignore_specs(zip_ref, infos, prefix):
+    """
+    Build a PathSpec for every .gitignore in the archive, keyed by the
+    directory it applies to. Only the small .gitignore members are read.
+    """
+    specs = {}
+    for info in infos:
+        if info.is_dir() or posixpath.basename(info.filename) != '.gitignore':
+            continue
+        relative_path = info.filename[len(prefix):]
+        with zip_ref.open(info) as f:
+            rules = f.read().decode('utf-8', errors='ignore').splitlines()
+        specs[posixpath.dirname(relative_path)] = pathspec.PathSpec.from_lines("gitwildmatch", rules)
+    return specs
+
+
+def _is_ignored(relative_path, specs, default_spec):
+    if default_spec.match_file(relative_path):
+        return True
+    for directory, spec in specs.items():
+        if not directory:
+            if spec.match_file(relative_path):
+                return True
+        elif relative_path.startswith(directory + '/'):
+            if spec.match_file(relative_path[len(directory) + 1:]):
+                return True
+    return False
+
+
+def iter_archive_files(zip_ref, max_file_bytes=DEFAULT_MAX_FILE_BYTES,
+                       max_total_bytes=DEFAULT_MAX_TOTAL_BYTES, ignore_patterns=None):
+    """
+    Yield a FileRecord for each text file in an open ZipFile without extracting it
+
+    Args:
+        zip_ref (zipfile.ZipFile): The open archive
+        max_file_bytes (int): Files larger than this are skipped before decompressing
+        max_total_bytes (int): Stop once this many bytes of source have been yielded
+        ignore_patterns (list): gitwildmatch patterns applied on top of any .gitignore
+            files (default: DEFAULT_IGNORE_PATTERNS)
+
+    Yields:
+        FileRecord(path, content, size) with paths relative to the repository root
+    """
+    infos = zip_ref.infolist()
+    prefix = _archive_prefix([info.filename for info in infos])
+    specs = _load_ignore_specs(zip_ref, infos, prefix)
+    if ignore_patterns is None:
+        ignore_patterns = DEFAULT_IGNORE_PATTERNS
+    default_spec = pathspec.PathSpec.from_lines("gitwildmatch", ignore_patterns)
+
+    total_bytes = 0
+    for info in infos:
+        if info.is_dir():
+            continue
+        relative_path = info.filename[len(prefix):]
+        # Filter on the archive path and header size, before any decompression
+        if _is_ignored(relative_path, specs, default_spec):
+            tracing.count('files_skipped', reason='ignored')
+            continue
+        if info.file_size > max_file_bytes:
+            tracing.count('files_skipped', reason='too_large')
+            continue
+        if total_bytes + info.file_size > max_total_bytes:
+            print(f"Ingestion limit of {max_total_bytes} bytes reached, skipping remaining files")
+            tracing.count('files_skipped', reason='total_limit')
+            return
+
+        try:
+            with zip_ref.open(info) as f:
+                head = f.read(BINARY_SNIFF_BYTES)
+                if b'\0' in head:
+                    tracing.count('files_skipped', reason='binary')
+                    continue
+                data = head + f.read(max_file_bytes - len(head))
+        except (zipfile.BadZipFile, RuntimeError, OSError) as e:
+            print(f"Error reading file {relative_path}: {e}")
+            tracing.count('files_skipped', reason='read_error')
+            continue
+
+        total_bytes += len(data)
+        tracing.count('files_ingested')
+        tracing.count('bytes_ingested', len(data))
+        yield FileRecord(relative_path, data.decode('utf-8', errors='ignore'), len(data))
+
+
+def _is_anchor(path, anchor_every):
+    digest = hashlib.sha1(path.encode('utf-8', errors='ignore')).digest()
+    return int.from_bytes(digest[:4], 'little') % anchor_every == 0
+
+
+def chunk_records(records, chunk_tokens, anchor_every=None):
+    """
+    Pack file records into prompt-sized chunks
+
+    Files are added in order until the next one would exceed chunk_tokens; files
+    that are larger than a whole chunk are split on line boundaries.
+
+    With anchor_every set, a chunk also always starts at files whose path hashes to
+    an "anchor" (about one file in anchor_every). Boundaries then depend on the file
+    paths rather than on everything before them, so editing, adding or removing a
+    file only changes the chunks around it and the rest keep their cached summaries.
+
+    Returns:
+        A list of chunk strings, each made of '=== File: <path> ===' sections
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("".join(current))
+        current = []
+        current_tokens = 0
+
+    for record in records:
+        header = f"\n\n=== File: {record.path} ===\n"
+        tokens = count_tokens(header) + count_tokens(record.content)
+        if tokens <= chunk_tokens:
+            if current_tokens + tokens > chunk_tokens or (anchor_every and _is_anchor(record.path, anchor_every)):
+                flush()
+            current.append(header + record.content)
+            current_tokens += tokens
+            continue
+
+        # Too big for one chunk: give each piece its own chunk
+        flush()
+        part, part_tokens, part_number = [], 0, 1
+        for line in record.content.splitlines(keepends=True):
+            line_tokens = count_tokens(line)
+            if part and part_tokens + line_tokens > chunk_tokens:
+                chunks.append(f"\n\n=== File: {record.path} (part {part_number}) ===\n" + "".join(part))
+                part, part_tokens, part_number = [], 0, part_number + 1
+            part.append(line)
+            part_tokens += line_tokens
+        if part:
+            chunks.append(f"\n\n=== File: {record.path} (part {part_number}) ===\n" + "".join(part))
+
+    flush()
+    return chunks
@@ -0,0 +1,191 @@
+# jobs.py
+"""
+Background jobs for the Streamlit app.
+
+Long-running work (summarizing a repository, evaluating a project) is handed
+to a JobManager, which runs it on a small thread pool and returns a job ID.
+The page keeps only the ID and polls the job for progress, so reruns and
+other sessions never block on or restart the work. Submitting a job whose
+key matches one already queued or running returns the existing job instead;
+each submitter is a subscriber of the job, and cancelling only detaches the
+caller until the last subscriber leaves.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_JOB_WORKERS = 4
+# Finished jobs are forgotten this long after they end
+DEFAULT_JOB_TTL = 3600.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, key=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.key = key
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = 'Waiting for a worker'
+        self.result = None
+        self.error = None
+        self.report = {}
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self.subscribers = set()
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def update(self, progress=None, message=None):
+        """
+        Record progress (0 to 1) and a status message. Safe to call from any thread.
+        """
+        if progress is not None:
+            self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self):
+        """
+        Raise JobCancelled if the job was cancelled; call between stages of the work
+        """
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+
+class JobManager:
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS, ttl=DEFAULT_JOB_TTL):
+        """
+        Args:
+            max_workers (int): Jobs run at once; the LLM client bounds the requests underneath
+            ttl (float): Seconds a finished job stays available for polling
+        """
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._active_keys = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, key=None, subscriber=None, **kwargs):
+        """
+        Run fn(job, *args, **kwargs) in the background and return the job ID
+
+        Args:
+            kind (str): Label shown to the user, e.g. 'summarize'
+            key: Hashable identity of the work; while a job with the same key is
+                queued or running its ID is returned instead of starting another
+            subscriber: Identity of the caller (e.g. a session ID) passed to cancel
+                later; by default every call is a subscriber of its own
+        """
+        subscriber = subscriber if subscriber is not None else uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            if key is not None and key in self._active_keys:
+                job_id = self._active_keys[key]
+                self._jobs[job_id].subscribers.add(subscriber)
+                return job_id
+            job = Job(kind, key)
+            job.subscribers.add(subscriber)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active_keys[key] = job.id
+            job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancelled:
+            self._finish(job, CANCELLED, 'Cancelled')
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        job.message = 'Running'
+        try:
+            job.result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED, 'Cancelled')
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            self._finish(job, FAILED, job.error)
+        else:
+            job.progress = 1.0
+            self._finish(job, DONE, 'Done')
+
+    def _finish(self, job, status, message):
+        with self._lock:
+            job.status = status
+            job.message = message
+            job.finished = time.time()
+            if job.key is not None and self._active_keys.get(job.key) == job.id:
+                del self._active_keys[job.key]
+
+    def get(self, job_id):
+        """
+        Return the Job with this ID, or None if it is unknown or has expired
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id, subscriber=None):
+        """
+        Detach subscriber from a job, and ask the job to stop once no subscriber is
+        left (at once without a subscriber). A queued job never starts; a running job
+        stops at its next check_cancelled call.
+
+        Returns:
+            True if the job was asked to stop
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            if subscriber is not None:
+                job.subscribers.discard(subscriber)
+                if job.subscribers:
+                    # Other sessions still wait for the result
+                    return False
+            job._cancel.set()
+            # Later submissions of the same work start a new job rather than joining a stopping one
+            if job.key is not None and self._active_keys.get(job.key) == job.id:
+                del self._active_keys[job.key]
+        if job.future is not None and job.future.cancel():
+            # Never started, so _run will not record the outcome
+            self._finish(job, CANCELLED, 'Cancelled')
+        return True
+
+    def active(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if job.status not in FINISHED]
+
+    def _prune(self):
+        # Caller holds the lock
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        for job in self.active():
+            self.cancel(job.id)
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,182 @@
+# json_stream.py
+"""
+Incremental JSON parsing of streamed LLM output.
+
+The parser is fed text as the model generates it. It reports each top-level
+member of the JSON object as soon as that member is complete, signals when
+the whole object has been received so generation can be stopped, and raises
+JSONStreamError as soon as the output can no longer produce a valid result.
+"""
+import json
+
+# Text allowed before the opening '{' (e.g. "Here is the evaluation:" or a ``` fence)
+DEFAULT_MAX_PREAMBLE_CHARS = 2000
+
+
+class JSONStreamError(ValueError):
+    pass
+
+
+def validate(value, template, path='$', strict=False):
+    """
+    Check value against a template such as the output_structure built in evaluate_project
+
+    Dict templates require every template key to be present and valid, list templates
+    require a list, and any other template value accepts anything. With strict, objects
+    may not have keys their (non-empty) template lacks; otherwise extra keys are allowed.
+
+    Raises:
+        JSONStreamError: If value does not match
+    """
+    if isinstance(template, dict):
+        if not isinstance(value, dict):
+            raise JSONStreamError(f"{path}: expected an object, got {type(value).__name__}")
+        for key, sub_template in template.items():
+            if key not in value:
+                raise JSONStreamError(f"{path}: missing key {key!r}")
+            validate(value[key], sub_template, f"{path}.{key}", strict)
+        if strict and template:
+            extra = [key for key in value if key not in template]
+            if extra:
+                raise JSONStreamError(f"{path}: unexpected keys {', '.join(map(repr, extra))}")
+    elif isinstance(template, list):
+        if not isinstance(value, list):
+            raise JSONStreamError(f"{path}: expected a list, got {type(value).__name__}")
+
+
+def json_schema(template, strict=False):
+    """
+    JSON Schema for a validate template, for Ollama's structured output (the format argument)
+
+    Dict templates become objects requiring their keys (closed to other keys with strict),
+    list templates arrays, and any other template value allows anything.
+    """
+    if isinstance(template, dict):
+        schema = {"type": "object"}
+        if template:
+            schema["properties"] = {key: json_schema(sub_template, strict) for key, sub_template in template.items()}
+            schema["required"] = list(template)
+            if strict:
+                schema["additionalProperties"] = False
+        return schema
+    if isinstance(template, list):
+        return {"type": "array"}
+    return {}
+
+
+class IncrementalJSONParser:
+    def __init__(self, schema=None, on_member=None, max_preamble_chars=DEFAULT_MAX_PREAMBLE_CHARS, strict=False):
+        """
+        Args:
+            schema (dict): Optional template; each top-level member is validated against
+                schema[key] when it completes
+            on_member (callable): Called as on_member(key, value) for each completed member
+            max_preamble_chars (int): Give up if no '{' appears within this many characters
+            strict (bool): Reject members the schema does not name, instead of ignoring them
+        """
+        self.schema = schema
+        self.strict = strict
+        self.on_member = on_member
+        self.max_preamble_chars = max_preamble_chars
+        if schema is not None:
+            self._schema_keys = {str(key).casefold(): key for key in schema}
+        self.reset()
+
+    def reset(self):
+        """
+        Discard everything fed so far, e.g. before a retried request
+        """
+        self.members = {}
+        self.result = None
+        self.done = False
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # Pieces of the member being read that arrived in earlier feed() calls
+        self._parts = []
+        self._seen = 0
+
+    def feed(self, text):
+        """
+        Consume the next piece of model output
+
+        Returns:
+            True once a complete, valid object has been parsed
+
+        Raises:
+            JSONStreamError: If the output cannot become valid JSON matching the schema
+        """
+        if self.done:
+            return True
+        # Where the current member starts in this piece; earlier parts of it are in self._parts
+        member_start = 0
+        for i, char in enumerate(text):
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+                    member_start = i + 1
+                elif self._seen + i >= self.max_preamble_chars:
+                    raise JSONStreamError(f"No JSON object within the first {self.max_preamble_chars} characters")
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    if char != '}':
+                        raise JSONStreamError("Mismatched closing bracket")
+                    self._finish_member(text[member_start:i])
+                    self._finish()
+                    return True
+            elif char == ',' and self._depth == 1:
+                self._finish_member(text[member_start:i])
+                member_start = i + 1
+        if self._started:
+            self._parts.append(text[member_start:])
+        self._seen += len(text)
+        return False
+
+    def _finish_member(self, tail):
+        segment = ''.join(self._parts + [tail]).strip()
+        self._parts = []
+        if not segment:
+            return
+        try:
+            member = json.loads('{' + segment + '}')
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(f"Invalid JSON member: {e}") from e
+        for key, value in member.items():
+            if self.schema is not None:
+                schema_key = self._schema_keys.get(str(key).strip().casefold())
+                if schema_key is None:
+                    if self.strict:
+                        raise JSONStreamError(f"Unexpected key {key!r}")
+                    # Extra fields (a model adding "title", say) do not invalidate the rest
+                    continue
+                validate(value, self.schema[schema_key], f"$.{schema_key}")
+                key = schema_key
+            self.members[key] = value
+            if self.on_member is not None:
+                self.on_member(key, value)
+
+    def _finish(self):
+        if self.schema is not None:
+            missing = [key for key in self.schema if key not in self.members]
+            if missing:
+                raise JSONStreamError(f"Missing keys: {', '.join(map(str, missing))}")
+        self.result = self.members
+        self.done = True
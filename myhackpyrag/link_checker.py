@@ -0,0 +1,285 @@
+# link_checker.py
+"""
+Concurrent checker for the links of submissions.
+
+URLs are checked on asyncio with one pooled httpx.AsyncClient: a global limit
+and a per-host limit bound the requests in flight, every request has a
+timeout, and redirects are followed hop by hop so the chain is recorded (and
+each hop counts against its own host's limit). A HEAD request is tried first;
+servers that reject HEAD or fail it are asked again with a GET whose body is
+never read. Results are cached in memory, successes for longer than failures,
+and concurrent checks of the same URL share one request.
+
+Used by batch.py as a pre-flight check of submission links before fetching,
+and from the command line over a urls.txt file:
+
+    python link_checker.py urls.txt --log logging.txt
+"""
+import argparse
+import asyncio
+import re
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import httpx
+
+import tracing
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_PER_HOST = 4
+DEFAULT_MAX_REDIRECTS = 10
+# Seconds a result is reused; failures are rechecked sooner since they may be transient
+DEFAULT_OK_TTL = 3600.0
+DEFAULT_FAILED_TTL = 300.0
+# Statuses some servers return for HEAD although GET works
+HEAD_FALLBACK_STATUSES = {400, 403, 404, 405, 406, 501}
+# Statuses that mean the link itself is wrong, not that the server is busy or shy
+BROKEN_STATUSES = {404, 410}
+USER_AGENT = 'evalbuddy-link-checker'
+
+_URL_RE = re.compile(r'https?://[^\s<>"\'()\[\]{}]+')
+
+
+def is_url(text):
+    return text.startswith('http://') or text.startswith('https://')
+
+
+def extract_urls(text):
+    """
+    http(s) URLs in free text, in order of appearance and without duplicates
+    """
+    urls = (match.rstrip('.,;:!?') for match in _URL_RE.findall(text or ''))
+    return list(dict.fromkeys(urls))
+
+
+def read_url_file(path):
+    """
+    URLs of a urls.txt file: one per line, blank lines and '#' comments ignored
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+def is_broken(result):
+    """
+    True if a check result shows the link cannot work: a missing page, an unknown
+    host or a refused connection. Timeouts, rate limits and server errors are not.
+    """
+    if result['status'] is not None:
+        return result['status'] in BROKEN_STATUSES
+    return result['error_type'] in ('ConnectError', 'UnsupportedProtocol', 'TooManyRedirects', 'InvalidURL')
+
+
+class LinkChecker:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_concurrency=DEFAULT_MAX_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                 max_redirects=DEFAULT_MAX_REDIRECTS, ok_ttl=DEFAULT_OK_TTL, failed_ttl=DEFAULT_FAILED_TTL):
+        """
+        Args:
+            timeout (float): Connect/read timeout of each request in seconds
+            max_concurrency (int): Requests in flight across all hosts
+            per_host (int): Requests in flight to any one host
+            max_redirects (int): Redirect hops followed before giving up
+            ok_ttl (float): Seconds a working link's result is reused
+            failed_ttl (float): Seconds a failed link's result is reused
+        """
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.max_redirects = max_redirects
+        self.ok_ttl = ok_ttl
+        self.failed_ttl = failed_ttl
+        self.requests = 0
+        self._client = None
+        self._slots = None
+        self._host_slots = {}
+        self._results = {}
+        self._pending = {}
+
+    def _ensure_client(self):
+        # Created on first use so the client and semaphores belong to the running loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout, follow_redirects=False, headers={'User-Agent': USER_AGENT},
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency))
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._slots = None
+            self._host_slots = {}
+            self._pending = {}
+
+    async def check(self, url):
+        """
+        Check one URL
+
+        Returns:
+            {'url', 'ok' (final status below 400), 'status' (final status, None if no
+            response), 'final_url', 'redirects': [{'status', 'url'}], 'method' ('HEAD' or
+            'GET'), 'error', 'error_type', 'seconds', 'cached'}
+        """
+        cached = self._results.get(url)
+        if cached is not None and cached[0] > time.monotonic():
+            tracing.count('links_checked', result='cached')
+            return dict(cached[1], cached=True)
+        # Concurrent checks of the same URL wait for the first one
+        pending = self._pending.get(url)
+        if pending is None:
+            pending = asyncio.ensure_future(self._check(url))
+            self._pending[url] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(url, None))
+        return dict(await asyncio.shield(pending))
+
+    async def check_all(self, urls):
+        """
+        Check URLs concurrently
+
+        Returns:
+            {url: check result} in the order given
+        """
+        unique = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.check(url) for url in unique))
+        return dict(zip(unique, results))
+
+    async def _check(self, url):
+        client = self._ensure_client()
+        start = time.perf_counter()
+        result = {'url': url, 'ok': False, 'status': None, 'final_url': url, 'redirects': [], 'method': 'HEAD',
+                  'error': None, 'error_type': None, 'seconds': 0.0, 'cached': False}
+        with tracing.span('link_check', host=urlparse(url).hostname) as span:
+            try:
+                response = await self._head_or_get(client, url, result)
+                result['status'] = response.status_code
+                result['final_url'] = str(response.url)
+                result['ok'] = response.status_code < 400
+            except (httpx.HTTPError, httpx.InvalidURL) as e:
+                result['error_type'] = type(e).__name__
+                result['error'] = str(e) or result['error_type']
+            result['seconds'] = round(time.perf_counter() - start, 3)
+            span.set(status=result['status'], method=result['method'], redirects=len(result['redirects']),
+                     ok=result['ok'])
+        tracing.count('links_checked', result='ok' if result['ok'] else 'failed')
+        ttl = self.ok_ttl if result['ok'] else self.failed_ttl
+        self._results[url] = (time.monotonic() + ttl, result)
+        return result
+
+    async def _head_or_get(self, client, url, result):
+        try:
+            response = await self._follow(client, 'HEAD', url, result)
+            if response.status_code not in HEAD_FALLBACK_STATUSES:
+                return response
+        except httpx.RemoteProtocolError:
+            # Some servers drop the connection on HEAD
+            pass
+        result['method'] = 'GET'
+        result['redirects'] = []
+        return await self._follow(client, 'GET', url, result)
+
+    async def _follow(self, client, method, url, result):
+        """
+        Send method to url and follow redirects, recording each hop in result['redirects']
+        """
+        request = client.build_request(method, url)
+        seen = {url}
+        for _ in range(self.max_redirects + 1):
+            response = await self._send(client, request)
+            if not response.has_redirect_location:
+                return response
+            next_request = response.next_request
+            next_url = str(next_request.url)
+            result['redirects'].append({'status': response.status_code, 'url': next_url})
+            if next_url in seen:
+                raise httpx.TooManyRedirects(f"Redirect loop at {next_url}", request=request)
+            seen.add(next_url)
+            request = next_request
+        raise httpx.TooManyRedirects(f"More than {self.max_redirects} redirects", request=request)
+
+    async def _send(self, client, request):
+        host = request.url.host
+        host_slots = self._host_slots.get(host)
+        if host_slots is None:
+            host_slots = self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        # The host's slot first: waiting for a busy host must not hold a global slot other hosts could use
+        async with host_slots, self._slots:
+            self.requests += 1
+            # Only the headers are needed; the body of a GET is never downloaded
+            response = await client.send(request, stream=True)
+            await response.aclose()
+            return response
+
+
+async def check_urls(urls, **options):
+    """
+    Check URLs with a new LinkChecker(**options), closed afterwards
+
+    Returns:
+        {url: check result}
+    """
+    checker = LinkChecker(**options)
+    try:
+        return await checker.check_all(urls)
+    finally:
+        await checker.aclose()
+
+
+def format_result(result):
+    if result['status'] is None:
+        outcome = f"ERROR {result['error_type']}: {result['error']}"
+    else:
+        outcome = f"{result['status']} ({result['method']})"
+    if result['redirects']:
+        outcome += f" -> {result['final_url']} after {len(result['redirects'])} redirects"
+    return f"{result['url']} - {outcome}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a list of URLs concurrently")
+    parser.add_argument('urls', nargs='?', default='urls.txt', help="File with one URL per line")
+    parser.add_argument('--log', default='logging.txt', help="File failures and the summary are appended to")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Seconds per request")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY, help="Requests in flight")
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, help="Requests in flight per host")
+    parser.add_argument('--max-redirects', type=int, default=DEFAULT_MAX_REDIRECTS)
+    args = parser.parse_args(argv)
+
+    begin = datetime.now()
+    try:
+        urls = read_url_file(args.urls)
+    except OSError as e:
+        print(f"Could not read {args.urls}: {e}")
+        return 1
+    print(f"Checking {len(urls)} URLs from {args.urls}...")
+    results = asyncio.run(check_urls(urls, timeout=args.timeout, max_concurrency=args.concurrency,
+                                     per_host=args.per_host, max_redirects=args.max_redirects))
+    failed = [result for result in results.values() if not result['ok']]
+    end = datetime.now()
+
+    with open(args.log, 'a', encoding='utf-8') as log:
+        log.write('-' * 100 + '\n')
+        for result in failed:
+            log.write(f"{end} - FAILED: {format_result(result)}\n")
+        log.write(f"Total URLs tested: {len(results)} -- Passed URLs: {len(results) - len(failed)} -- "
+                  f"Failed URLs: {len(failed)}\n")
+
+    print("---------------------------------------")
+    print(f"Total URLs tested: {len(results)}.")
+    print(f"Passed URLs: {len(results) - len(failed)}.")
+    print(f"Failed URLs: {len(failed)}.")
+    for result in failed:
+        print(f"  {format_result(result)}")
+    redirected = sum(1 for result in results.values() if result['redirects'])
+    if redirected:
+        print(f"Redirected URLs: {redirected}.")
+    print("---------------------------------------")
+    print(f"Test time: {end - begin}.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,275 @@
+# llm_client.py
+"""
+Asynchronous, pooled client for the Ollama API.
+
+A single ollama.AsyncClient (and so a single pooled HTTP connection set) is
+shared by every call. All coroutines run on one background event loop so
+synchronous code such as the Streamlit app can use the client through
+`run`/`submit` without managing an event loop of its own.
+"""
+import asyncio
+import contextvars
+import random
+import threading
+import time
+
+import httpx
+import ollama
+
+import tracing
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 600.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+# How long Ollama keeps the model loaded after the last request
+DEFAULT_KEEP_ALIVE = '30m'
+
+# When set (see streaming.py), called once per chat request to get an extra consumer
+# that sees every piece of generated text; it propagates to tasks started from the caller
+token_listener = contextvars.ContextVar('token_listener', default=None)
+
+
+def _is_retryable(error):
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500 or error.status_code == 429
+    return False
+
+
+class LLMClient:
+    def __init__(self, host=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, keep_alive=DEFAULT_KEEP_ALIVE):
+        """
+        Args:
+            host (str): Ollama host, defaults to OLLAMA_HOST or the local server
+            max_concurrency (int): Requests allowed in flight at once
+            timeout (float): Per-call timeout in seconds, including streaming
+            retries (int): Extra attempts for connection errors, timeouts and 5xx responses
+            backoff (float): Base delay in seconds for exponential backoff between attempts
+            keep_alive (str|int): Passed to Ollama so the model stays resident between calls
+        """
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='llm-client', daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def _get_client(self):
+        # Only called on the client's own loop, so no locking is needed
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_concurrency,
+                                  max_keepalive_connections=self.max_concurrency)
+            self._client = ollama.AsyncClient(host=self.host, limits=limits)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def stream(self, prompt, model, options=None, format=''):
+        """
+        Yield raw response chunks for a single chat request as they arrive
+
+        Breaking out of the iteration closes the HTTP response, which stops generation
+        on the server. No retries are made once the first chunk has been received.
+        """
+        client = self._get_client()
+        messages = [{'role': 'user', 'content': prompt}]
+        async with self._semaphore:
+            chunks = await client.chat(model=model, messages=messages, stream=True, format=format,
+                                       options=options, keep_alive=self.keep_alive)
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                # Runs when the caller stops early too: closing ollama's stream closes its HTTP response
+                await chunks.aclose()
+
+    async def chat(self, prompt, model, options=None, format='', timeout=None, consumer=None):
+        """
+        Send a prompt and return the response text, retrying transient failures
+
+        Args:
+            consumer: Optional object with feed(text) and reset() methods, such as
+                json_stream.IncrementalJSONParser. Each piece of output is fed to it as it
+                arrives; when feed returns True generation is stopped early. reset() is
+                called before a retry.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        listener = token_listener.get()
+        if listener is not None:
+            consumer = _Tee(listener(), consumer)
+        for attempt in range(self.retries + 1):
+            try:
+                return await asyncio.wait_for(self._chat_once(prompt, model, options, format, consumer), timeout)
+            except Exception as e:
+                if attempt == self.retries or not _is_retryable(e):
+                    raise
+                if consumer is not None:
+                    consumer.reset()
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                print(f"LLM call failed ({e!r}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _chat_once(self, prompt, model, options, format, consumer):
+        parts = []
+        final = None
+        first_token = None
+        chunks = 0
+        start = time.perf_counter()
+        with tracing.span('llm.chat', model=model, prompt_chars=len(prompt)) as span:
+            stream = self.stream(prompt, model, options=options, format=format)
+            try:
+                async for chunk in stream:
+                    if chunk.get('done'):
+                        final = chunk
+                    if 'message' in chunk:
+                        text = chunk['message']['content']
+                        if text:
+                            chunks += 1
+                            if first_token is None:
+                                first_token = time.perf_counter() - start
+                        parts.append(text)
+                        if consumer is not None and consumer.feed(text):
+                            break
+            finally:
+                # Closing the stream closes the HTTP response so the server stops generating
+                await stream.aclose()
+            if tracing.is_enabled():
+                _record_generation(span, model, final, first_token, chunks, time.perf_counter() - start)
+        return "".join(parts)
+
+    async def embed(self, texts, model):
+        """
+        Return one embedding vector per text, requesting them concurrently
+        """
+        client = self._get_client()
+
+        async def embed_one(text):
+            for attempt in range(self.retries + 1):
+                try:
+                    async with self._semaphore:
+                        response = await asyncio.wait_for(
+                            client.embeddings(model=model, prompt=text, keep_alive=self.keep_alive), self.timeout)
+                    return list(response['embedding'])
+                except Exception as e:
+                    if attempt == self.retries or not _is_retryable(e):
+                        raise
+                    await asyncio.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+        return list(await asyncio.gather(*(embed_one(text) for text in texts)))
+
+    async def warm_up(self, model):
+        """
+        Load the model into memory without generating anything
+        """
+        client = self._get_client()
+        await client.generate(model=model, prompt='', keep_alive=self.keep_alive)
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the client's loop and return a concurrent.futures.Future.
+        Cancelling the future cancels the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro):
+        """
+        Run a coroutine on the client's loop and wait for its result
+        """
+        future = self.submit(coro)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            if self._client is not None:
+                asyncio.run_coroutine_threadsafe(self._client._client.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._client = None
+            self._loop = None
+
+
+def _record_generation(span, model, final, first_token, chunks, elapsed):
+    """
+    Record LLM metrics from Ollama's counters on the final chunk (durations are in ns)
+
+    A request stopped early never receives the final chunk; its output is then
+    counted from the streamed chunks, which Ollama sends one token at a time.
+    """
+    stopped_early = final is None
+    span.set(stopped_early=stopped_early)
+    tracing.count('llm_requests', model=model, stopped_early=stopped_early)
+    if first_token is not None:
+        span.set(ttft=first_token)
+        tracing.observe('llm_ttft_seconds', first_token, model=model)
+
+    if final is not None:
+        prompt_tokens = final.get('prompt_eval_count') or 0
+        output_tokens = final.get('eval_count') or 0
+        eval_seconds = (final.get('eval_duration') or 0) / 1e9
+        server_ttft = ((final.get('load_duration') or 0) + (final.get('prompt_eval_duration') or 0)) / 1e9
+        span.set(prompt_tokens=prompt_tokens, server_ttft=server_ttft)
+        tracing.count('llm_prompt_tokens', prompt_tokens, model=model)
+        tracing.observe('llm_server_ttft_seconds', server_ttft, model=model)
+    else:
+        output_tokens = chunks
+        eval_seconds = elapsed - first_token if first_token is not None else 0
+    span.set(output_tokens=output_tokens)
+    tracing.count('llm_output_tokens', output_tokens, model=model)
+    if eval_seconds > 0:
+        span.set(tokens_per_second=output_tokens / eval_seconds)
+        tracing.observe('llm_tokens_per_second', output_tokens / eval_seconds, model=model)
+
+
+class _Tee:
+    """
+    Consumer that shows every piece of text to a watcher before the real consumer
+    """
+    def __init__(self, watcher, consumer=None):
+        self.watcher = watcher
+        self.consumer = consumer
+
+    def feed(self, text):
+        self.watcher.feed(text)
+        return self.consumer.feed(text) if self.consumer is not None else False
+
+    def reset(self):
+        self.watcher.reset()
+        if self.consumer is not None:
+            self.consumer.reset()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """
+    Return the process-wide LLMClient, creating it on first use
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = LLMClient()
+    return _default_client
@@ -0,0 +1,361 @@
+# metrics_store.py
+"""
+Versioned store of evaluation metrics (rubrics).
+
+Metrics are kept in named rubric sets in a SQLite file; every change to a set
+adds a new version instead of rewriting it, in a single write transaction, so
+concurrent judges adding metrics cannot lose each other's changes. JSON
+files in the metrics.json format are the import/export format of every set,
+and metrics.json itself mirrors the default set: the set follows edits to the
+file (checked by mtime) and is written back to it after each change.
+
+Rubrics are cached in-process and only reloaded when the database or the JSON
+file changes. Each Rubric carries its prompt fragments (criteria text and
+output structure) built once per version.
+
+    python metrics_store.py import hackathon.json --rubric hackathon
+    python metrics_store.py export hackathon.json --rubric hackathon
+    python metrics_store.py list
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+DEFAULT_METRICS_DB = os.path.join(os.path.expanduser('~'), '.cache', 'evalbuddy', 'metrics.sqlite3')
+DEFAULT_METRICS_JSON = 'metrics.json'
+DEFAULT_RUBRIC = 'default'
+
+
+def factor_text(factor):
+    # Generated metrics sometimes describe a factor as an object rather than a string
+    if isinstance(factor, dict):
+        return " - ".join(str(value) for value in factor.values())
+    return str(factor)
+
+
+def metric_criterion(metric):
+    """
+    Criteria text of one metric as it appears in evaluation prompts
+    """
+    return (f"{metric['title']}: {metric['description']}\n   Evaluation Factors: "
+            f"{', '.join(factor_text(factor) for factor in metric['evaluationFactors'])}")
+
+
+def _unchanged(metrics):
+    return metrics
+
+
+class Rubric:
+    def __init__(self, name, version, metrics, created=None, note=''):
+        self.name = name
+        self.version = version
+        self.metrics = metrics
+        self.created = created
+        self.note = note
+        self._criteria = {metric['title']: metric_criterion(metric) for metric in metrics}
+        self.metric_criteria, self.output_structure_str, self.output_structure = self.fragments(metrics)
+
+    @property
+    def id(self):
+        return f"{self.name}@v{self.version}"
+
+    @property
+    def titles(self):
+        return [metric['title'] for metric in self.metrics]
+
+    def fragments(self, metrics=None):
+        """
+        Criteria text, output structure string and output structure for some of the
+        metrics (default: all), from the per-metric text built with the rubric
+
+        Returns:
+            (metric_criteria, output_structure_str, output_structure)
+        """
+        if metrics is None:
+            return self.metric_criteria, self.output_structure_str, self.output_structure
+        metric_criteria = "\n".join(self._criteria.get(metric['title']) or metric_criterion(metric)
+                                    for metric in metrics)
+        output_structure = {metric['title']: {"score": "<score>", "justification": "<justification>"}
+                            for metric in metrics}
+        return metric_criteria, json.dumps(output_structure, indent=2), output_structure
+
+    def to_json(self):
+        return {"metrics": self.metrics}
+
+    def __repr__(self):
+        return f"Rubric({self.id}, {len(self.metrics)} metrics)"
+
+
+class MetricsStore:
+    def __init__(self, path=DEFAULT_METRICS_DB, json_path=DEFAULT_METRICS_JSON):
+        """
+        Open (or create) a metrics database
+
+        Args:
+            path (str): Location of the SQLite file
+            json_path (str): metrics.json mirrored by the default rubric set, or None
+        """
+        self.path = path
+        self.json_path = json_path
+        self._lock = threading.Lock()
+        self._rubrics = {}
+        self._json_mtime = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rubric_versions (
+                rubric TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                metrics TEXT NOT NULL,
+                note TEXT NOT NULL DEFAULT '',
+                created REAL NOT NULL,
+                PRIMARY KEY (rubric, version)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS json_imports (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL
+            )
+        """)
+
+    def _data_version(self):
+        # Changes whenever another connection commits; our own writes clear the cache directly
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def rubric_sets(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT rubric FROM rubric_versions ORDER BY rubric").fetchall()
+        return [row[0] for row in rows]
+
+    def versions(self, name=DEFAULT_RUBRIC):
+        """
+        History of a rubric set, oldest first: [{'version', 'created', 'note', 'metrics'}]
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT version, created, note, metrics FROM rubric_versions WHERE rubric = ? "
+                                      "ORDER BY version", (name,)).fetchall()
+        return [{'version': version, 'created': created, 'note': note, 'metrics': len(json.loads(metrics))}
+                for version, created, note, metrics in rows]
+
+    def get_rubric(self, name=DEFAULT_RUBRIC, version=None):
+        """
+        Return a Rubric (the latest version unless version is given), or None if the set
+        does not exist. The default set is first synced with metrics.json if that changed.
+        """
+        if name == DEFAULT_RUBRIC:
+            self.sync_json()
+        return self._load(name, version)
+
+    def _load(self, name, version=None):
+        with self._lock:
+            data_version = self._data_version()
+            cached = self._rubrics.get((name, version))
+            if cached is not None and cached[0] == data_version:
+                return cached[1]
+            if version is None:
+                row = self._conn.execute("SELECT version, metrics, created, note FROM rubric_versions "
+                                         "WHERE rubric = ? ORDER BY version DESC LIMIT 1", (name,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT version, metrics, created, note FROM rubric_versions "
+                                         "WHERE rubric = ? AND version = ?", (name, version)).fetchone()
+            if row is None:
+                return None
+            rubric = Rubric(name, row[0], json.loads(row[1]), row[2], row[3])
+            self._rubrics[(name, version)] = (data_version, rubric)
+            return rubric
+
+    def save_rubric(self, name, metrics, note=''):
+        """
+        Store metrics as the next version of a rubric set, unless they equal the latest
+
+        Returns:
+            The latest Rubric of the set
+        """
+        return self._update(name, lambda current: metrics, note)
+
+    def add_metric(self, metric, name=DEFAULT_RUBRIC):
+        """
+        Append a metric (replacing one with the same title) as a new rubric version
+        """
+        def change(current):
+            return [existing for existing in current if existing['title'] != metric['title']] + [metric]
+        return self._update(name, change, f"add {metric['title']}")
+
+    def _update(self, name, change, note):
+        mirror = name == DEFAULT_RUBRIC and bool(self.json_path)
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock before reading, so concurrent updates (and the
+            # metrics.json import and export that go with them) serialize
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT version, metrics FROM rubric_versions WHERE rubric = ? "
+                                         "ORDER BY version DESC LIMIT 1", (name,)).fetchone()
+                version, current = (row[0], json.loads(row[1])) if row else (0, [])
+                edited = self._edited_json() if mirror else None
+                if edited is not None and (row is None or edited != current):
+                    # Hand edits to metrics.json become a version first, so they are not overwritten
+                    version += 1
+                    self._insert(name, version, edited, f"import {os.path.basename(self.json_path)}")
+                    current = edited
+                metrics = change(current)
+                changed = metrics != current or (version == 0 and change is not _unchanged)
+                if changed:
+                    version += 1
+                    self._insert(name, version, metrics, note)
+                if mirror and changed:
+                    self._write_json(self.json_path, metrics)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._rubrics.clear()
+        return self._load(name)
+
+    def _insert(self, name, version, metrics, note):
+        # Caller holds the lock inside a write transaction
+        self._conn.execute("INSERT INTO rubric_versions (rubric, version, metrics, note, created) "
+                           "VALUES (?, ?, ?, ?, ?)", (name, version, json.dumps(metrics), note, time.time()))
+
+    def _edited_json(self):
+        """
+        Metrics of metrics.json if it changed since it was last imported or exported, else None
+        """
+        # Caller holds the lock inside a write transaction
+        try:
+            mtime = os.path.getmtime(self.json_path)
+        except OSError:
+            return None
+        row = self._conn.execute("SELECT mtime FROM json_imports WHERE path = ?",
+                                 (os.path.abspath(self.json_path),)).fetchone()
+        if row is not None and row[0] == mtime:
+            self._json_mtime = mtime
+            return None
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                metrics = json.load(f).get('metrics', [])
+        except ValueError as e:
+            print(f"Error reading {self.json_path}: {e}")
+            return None
+        self._record_json_mtime(mtime)
+        return metrics
+
+    def _record_json_mtime(self, mtime):
+        self._conn.execute("INSERT OR REPLACE INTO json_imports (path, mtime) VALUES (?, ?)",
+                           (os.path.abspath(self.json_path), mtime))
+        self._json_mtime = mtime
+
+    def _write_json(self, path, metrics):
+        # Write to a temporary file and rename, so readers never see a partial file
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"metrics": metrics}, f, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.json_path and os.path.abspath(path) == os.path.abspath(self.json_path):
+            self._record_json_mtime(os.path.getmtime(path))
+
+    def import_json(self, path, name=DEFAULT_RUBRIC):
+        """
+        Load a metrics.json-format file into a rubric set; a new version is only added if
+        the metrics differ from the latest
+
+        Returns:
+            The latest Rubric of the set
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            metrics = json.load(f).get('metrics', [])
+        return self._update(name, lambda current: metrics, f"import {os.path.basename(path)}")
+
+    def export_json(self, name, path, version=None):
+        """
+        Write a rubric set (the latest version unless version is given) to a
+        metrics.json-format file, replacing it atomically
+
+        Returns:
+            The exported Rubric
+        """
+        rubric = self.get_rubric(name, version)
+        if rubric is None:
+            raise KeyError(f"Unknown rubric {name}" + (f" version {version}" if version is not None else ""))
+        with self._lock:
+            self._write_json(path, rubric.metrics)
+        return rubric
+
+    def sync_json(self):
+        """
+        Import metrics.json into the default set if the file changed since it was last
+        imported or exported (by any process sharing this database)
+        """
+        if not self.json_path:
+            return
+        try:
+            mtime = os.path.getmtime(self.json_path)
+        except OSError:
+            return
+        if mtime != self._json_mtime:
+            self._update(DEFAULT_RUBRIC, _unchanged, "")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store():
+    """
+    Process-wide MetricsStore (override the database location with EVALBUDDY_METRICS_DB)
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = MetricsStore(os.environ.get('EVALBUDDY_METRICS_DB', DEFAULT_METRICS_DB))
+        return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, export and list rubric sets")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('import', "Add a metrics.json-format file as a new version of a set"),
+                               ('export', "Write a set to a metrics.json-format file")):
+        sub = commands.add_parser(command, help=help_text)
+        sub.add_argument('path', help="JSON file with a 'metrics' list")
+        sub.add_argument('--rubric', default=DEFAULT_RUBRIC, help="Rubric set")
+        if command == 'export':
+            sub.add_argument('--version', type=int, default=None, help="Version (default: latest)")
+    commands.add_parser('list', help="List rubric sets and their versions")
+    args = parser.parse_args()
+
+    store = get_default_store()
+    if args.command == 'import':
+        rubric = store.import_json(args.path, args.rubric)
+        print(f"Imported {args.path} as {rubric.id} ({len(rubric.metrics)} metrics)")
+    elif args.command == 'export':
+        try:
+            rubric = store.export_json(args.rubric, args.path, args.version)
+        except KeyError as e:
+            parser.error(e.args[0])
+        print(f"Exported {rubric.id} ({len(rubric.metrics)} metrics) to {args.path}")
+    else:
+        for name in store.rubric_sets():
+            versions = store.versions(name)
+            latest = versions[-1]
+            print(f"{name}: {len(versions)} versions, latest v{latest['version']} with {latest['metrics']} metrics")
+
+
+if __name__ == "__main__":
+    main()
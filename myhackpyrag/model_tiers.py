@@ -0,0 +1,197 @@
+# model_tiers.py
+"""
+Small and large model tiers.
+
+High-volume stages (chunk summaries, reducing them, the single-pass code
+summary and evaluation factor generation) run on a small, fast model; the
+final evaluate_project step, which decides the scores, runs on a larger one.
+When the small model's JSON output does not parse or fails schema validation,
+the same prompt is sent to the large model instead (escalation).
+
+Calls, invalid outputs, escalations and latency are counted per tier and
+stage, so the mix can be tuned: a stage whose escalation rate is high is
+cheaper to run on the large model directly.
+
+Set the models with EVALBUDDY_SMALL_MODEL and EVALBUDDY_LARGE_MODEL (both
+default to DEFAULT_MODEL, which disables escalation).
+"""
+import os
+import threading
+import time
+
+import tracing
+
+DEFAULT_MODEL = 'llama3.2'
+SMALL = 'small'
+LARGE = 'large'
+TIERS = (SMALL, LARGE)
+# Tier each LLM stage runs on; stages not listed use the large model
+DEFAULT_STAGE_TIERS = {
+    'chunk': SMALL,
+    'reduce': SMALL,
+    'summary': SMALL,
+    'factors': SMALL,
+    'evaluation': LARGE,
+}
+
+
+class ModelTiers:
+    def __init__(self, small=DEFAULT_MODEL, large=DEFAULT_MODEL, stages=None, escalate=True):
+        """
+        Args:
+            small (str): Model of the small tier
+            large (str): Model of the large tier
+            stages (dict): {stage: tier} overriding DEFAULT_STAGE_TIERS
+            escalate (bool): Retry invalid small-tier output on the large model
+        """
+        self.models = {SMALL: small, LARGE: large}
+        self.stages = dict(DEFAULT_STAGE_TIERS, **(stages or {}))
+        self.escalate = escalate
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def tier(self, stage):
+        return self.stages.get(stage, LARGE)
+
+    def model(self, stage, model=None):
+        """
+        Model that answers a stage first: model if given, else the model of the stage's tier
+        """
+        return model or self.models[self.tier(stage)]
+
+    def label(self, model=None):
+        """
+        Models used by all stages, for cache keys of results built from several stages
+        """
+        if model:
+            return model
+        return self.models[SMALL] if self.models[SMALL] == self.models[LARGE] else \
+            f"{self.models[SMALL]}+{self.models[LARGE]}"
+
+    def route(self, stage, model=None):
+        """
+        Models to try for a stage, in order: [(tier, model)]. An explicit model is the
+        only one tried.
+        """
+        tier = self.tier(stage)
+        if model:
+            return [(tier, model)]
+        route = [(tier, self.models[tier])]
+        if tier == SMALL and self.escalate and self.models[LARGE] != self.models[SMALL]:
+            route.append((LARGE, self.models[LARGE]))
+        return route
+
+    async def call(self, stage, request, model=None):
+        """
+        Await request(model) for each model of the stage's route until one returns
+
+        A ValueError (invalid JSON or a json_stream.JSONStreamError) moves on to the next
+        model; the last one's error is raised. Other errors are raised at once.
+        """
+        route = self.route(stage, model)
+        for step, (tier, tier_model) in enumerate(route):
+            start = time.perf_counter()
+            try:
+                result = await request(tier_model)
+            except ValueError as e:
+                self._record(stage, tier, tier_model, time.perf_counter() - start, valid=False)
+                if step == len(route) - 1:
+                    raise
+                next_model = route[step + 1][1]
+                self._record_escalation(stage, tier)
+                print(f"Invalid {stage} output from {tier_model} ({e}), escalating to {next_model}")
+                continue
+            self._record(stage, tier, tier_model, time.perf_counter() - start, valid=True)
+            return result
+
+    def _record(self, stage, tier, model, seconds, valid):
+        tracing.count('model_tier_calls', tier=tier, stage=stage, result='valid' if valid else 'invalid')
+        tracing.observe('model_tier_seconds', seconds, tier=tier, stage=stage)
+        with self._lock:
+            entry = self._entry(stage, tier, model)
+            entry['calls'] += 1
+            entry['invalid'] += 0 if valid else 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+
+    def _record_escalation(self, stage, tier):
+        tracing.count('model_tier_escalations', tier=tier, stage=stage)
+        with self._lock:
+            self._entry(stage, tier, self.models[tier])['escalations'] += 1
+
+    def _entry(self, stage, tier, model):
+        # Caller holds the lock
+        return self._stats.setdefault((tier, stage, model), {'calls': 0, 'invalid': 0, 'escalations': 0,
+                                                             'seconds': 0.0, 'max_seconds': 0.0})
+
+    def stats(self, by_stage=False):
+        """
+        Calls, invalid outputs, escalations and latency so far
+
+        Returns:
+            [{'tier', 'model', 'calls', 'invalid', 'escalations', 'escalation_rate',
+            'mean_seconds', 'max_seconds'}] with one row per tier and model used, or per
+            tier, model and 'stage' with by_stage
+        """
+        with self._lock:
+            entries = [(key, dict(entry)) for key, entry in self._stats.items()]
+        rows = {}
+        for (tier, stage, model), entry in entries:
+            key = (tier, model, stage) if by_stage else (tier, model)
+            row = rows.setdefault(key, dict({'tier': tier, 'model': model}, **({'stage': stage} if by_stage else {}),
+                                            calls=0, invalid=0, escalations=0, seconds=0.0, max_seconds=0.0))
+            for name in ('calls', 'invalid', 'escalations', 'seconds'):
+                row[name] += entry[name]
+            row['max_seconds'] = max(row['max_seconds'], entry['max_seconds'])
+        result = []
+        for key in sorted(rows, key=lambda key: (TIERS.index(key[0]) if key[0] in TIERS else len(TIERS),) + key[1:]):
+            row = rows[key]
+            calls = row['calls']
+            row['escalation_rate'] = round(row['escalations'] / calls, 4) if calls else 0.0
+            row['mean_seconds'] = round(row.pop('seconds') / calls, 3) if calls else 0.0
+            row['max_seconds'] = round(row['max_seconds'], 3)
+            result.append(row)
+        return result
+
+    def format_stats(self):
+        """
+        One line per tier for logs and footers, or '' before any call
+        """
+        return "\n".join(f"{row['tier']} ({row['model']}): {row['calls']} calls, mean {row['mean_seconds']:.2f}s, "
+                         f"max {row['max_seconds']:.2f}s, {row['escalations']} escalated "
+                         f"({row['escalation_rate'] * 100:.0f}%)" for row in self.stats())
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+_default_tiers = None
+_default_lock = threading.Lock()
+
+
+def get_default_tiers():
+    """
+    Process-wide ModelTiers (models from EVALBUDDY_SMALL_MODEL and EVALBUDDY_LARGE_MODEL)
+    """
+    global _default_tiers
+    with _default_lock:
+        if _default_tiers is None:
+            _default_tiers = ModelTiers(os.environ.get('EVALBUDDY_SMALL_MODEL', DEFAULT_MODEL),
+                                        os.environ.get('EVALBUDDY_LARGE_MODEL', DEFAULT_MODEL))
+        return _default_tiers
+
+
+def configure_tiers(small=None, large=None, escalate=None):
+    """
+    Change the models of the process-wide tiers (None keeps the current setting)
+    """
+    tiers = get_default_tiers()
+    with tiers._lock:
+        if small:
+            tiers.models[SMALL] = small
+        if large:
+            tiers.models[LARGE] = large
+        if escalate is not None:
+            tiers.escalate = escalate
+    return tiers
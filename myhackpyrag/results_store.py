@@ -0,0 +1,300 @@
+# results_store.py
+"""
+Persistent evaluation results and leaderboards.
+
+Every metric result of an evaluation is stored in a SQLite file keyed by
+submission, rubric version, model and metric. A leaderboard for one rubric
+version is computed in a single vectorized pass: the results become a
+submissions x metrics score matrix, from which weighted totals (using each
+metric's weightage), per-metric min-max normalization and ranks follow with
+numpy. Cohort percentiles per metric are stored alongside the results and
+only recomputed after new results arrive; leaderboards are kept in memory on
+the same terms.
+
+    python results_store.py --rubric default --top 20
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from metrics_store import DEFAULT_RUBRIC, get_default_store
+
+DEFAULT_RESULTS_DB = os.path.join(os.path.expanduser('~'), '.cache', 'evalbuddy', 'results.sqlite3')
+COHORT_PERCENTILES = (25, 50, 75, 90)
+MAX_SCORE = 10
+
+
+def parse_score(score):
+    """
+    Numeric score of a metric result, or None if the model did not give a number
+    """
+    try:
+        value = float(score)
+    except (TypeError, ValueError):
+        return None
+    return value if np.isfinite(value) else None
+
+
+def weighted_scores(scores, weights):
+    """
+    Weighted totals, normalized scores and ranks of a score matrix
+
+    Args:
+        scores (np.ndarray): submissions x metrics, NaN where a metric has no result
+        weights (np.ndarray): Weightage of each metric
+
+    Returns:
+        (totals, normalized, normalized_totals, ranks): the weighted mean score per submission
+        (missing metrics are left out of the mean), the scores min-max normalized per metric,
+        the weighted mean of the normalized scores, and the 1-based rank by total
+        (ties share the better rank)
+    """
+    scores = np.asarray(scores, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    present = ~np.isnan(scores)
+    weight_sums = present @ weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        totals = np.where(weight_sums > 0, np.nansum(scores * weights, axis=1) / weight_sums, np.nan)
+        low = np.nanmin(np.where(present, scores, np.inf), axis=0)
+        high = np.nanmax(np.where(present, scores, -np.inf), axis=0)
+        spread = np.where(high > low, high - low, 1.0)
+        normalized = np.where(present, (scores - low) / spread, np.nan)
+        normalized_totals = np.where(weight_sums > 0, np.nansum(np.nan_to_num(normalized) * weights, axis=1)
+                                     / weight_sums, np.nan)
+    # Rank by total, highest first; submissions without any score rank last
+    ordered = np.where(np.isnan(totals), -np.inf, totals)
+    ranks = pd.Series(ordered).rank(method='min', ascending=False).to_numpy(dtype=int)
+    return totals, normalized, normalized_totals, ranks
+
+
+class ResultsStore:
+    def __init__(self, path=DEFAULT_RESULTS_DB):
+        """
+        Open (or create) a results database
+
+        Args:
+            path (str): Location of the SQLite file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._cohorts = {}
+        self._boards = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                submission TEXT NOT NULL,
+                rubric TEXT NOT NULL,
+                rubric_version INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                score REAL,
+                justification TEXT,
+                created REAL NOT NULL,
+                PRIMARY KEY (rubric, rubric_version, model, submission, metric)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_submission ON results (submission)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cohorts (
+                rubric TEXT NOT NULL,
+                rubric_version INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                generation INTEGER NOT NULL,
+                percentiles TEXT NOT NULL,
+                PRIMARY KEY (rubric, rubric_version, model)
+            )
+        """)
+        self._conn.commit()
+
+    def record(self, submission, rubric, model, evaluation):
+        """
+        Store (or replace) the results of one evaluation
+
+        Args:
+            rubric (metrics_store.Rubric): The rubric version the evaluation used
+            evaluation (dict): {title: {"score": ..., "justification": ...}}
+        """
+        now = time.time()
+        rows = [(submission, rubric.name, rubric.version, model, title, parse_score(result.get('score')),
+                 result.get('justification'), now)
+                for title, result in evaluation.items() if isinstance(result, dict)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (submission, rubric, rubric_version, model, metric, score, "
+                "justification, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def get(self, submission, rubric, model):
+        """
+        Return the stored {title: {"score", "justification"}} of a submission, or None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT metric, score, justification FROM results WHERE rubric = ? AND rubric_version = ? "
+                "AND model = ? AND submission = ?", (rubric.name, rubric.version, model, submission)).fetchall()
+        if not rows:
+            return None
+        return {metric: {'score': score, 'justification': justification} for metric, score, justification in rows}
+
+    def models(self, rubric):
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT model FROM results WHERE rubric = ? AND rubric_version = ?",
+                                      (rubric.name, rubric.version)).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def scores(self, rubric, model):
+        """
+        Score matrix of a rubric version: a DataFrame indexed by submission with one column
+        per metric of the rubric (NaN where a result is missing)
+        """
+        with self._lock:
+            frame = pd.read_sql_query(
+                "SELECT submission, metric, score FROM results WHERE rubric = ? AND rubric_version = ? AND model = ?",
+                self._conn, params=(rubric.name, rubric.version, model))
+        matrix = frame.pivot(index='submission', columns='metric', values='score')
+        return matrix.reindex(columns=rubric.titles).astype(float)
+
+    def _generation(self, rubric, model):
+        # Replaced and new rows always get a higher rowid, so this changes with every record()
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(MAX(rowid), 0) FROM results WHERE rubric = ? AND rubric_version = ? AND model = ?",
+                (rubric.name, rubric.version, model)).fetchone()[0]
+
+    def leaderboard(self, rubric, model):
+        """
+        Rank every submission evaluated with a rubric version and model
+
+        The result is reused until new results are recorded; callers get a copy.
+
+        Returns:
+            A DataFrame sorted by rank with the per-metric scores and columns 'total'
+            (weighted mean score), 'normalized_total' (weighted mean of the per-metric
+            min-max normalized scores), 'rank' and 'percentile'
+        """
+        key = (rubric.name, rubric.version, model)
+        generation = self._generation(rubric, model)
+        cached = self._boards.get(key)
+        if cached is not None and cached[0] == generation:
+            return cached[1].copy()
+        board = self._compute_leaderboard(rubric, model)
+        with self._lock:
+            self._boards[key] = (generation, board)
+        return board.copy()
+
+    def _compute_leaderboard(self, rubric, model):
+        matrix = self.scores(rubric, model)
+        weights = np.array([float(metric.get('weightage') or 0) for metric in rubric.metrics])
+        if not weights.any():
+            weights = np.ones(len(rubric.metrics))
+        totals, _, normalized_totals, ranks = weighted_scores(matrix.to_numpy(), weights)
+        board = matrix.copy()
+        board['total'] = totals
+        board['normalized_total'] = normalized_totals
+        board['rank'] = ranks
+        board['percentile'] = (1 - (ranks - 1) / max(len(ranks), 1)) * 100
+        return board.sort_values(['rank', 'total']).rename_axis(index='submission', columns=None).reset_index()
+
+    def cohort_percentiles(self, rubric, model, percentiles=COHORT_PERCENTILES):
+        """
+        Percentiles of each metric's scores across all submissions of a rubric version
+
+        They are kept in the database and in memory, and only recomputed once new
+        results have been recorded.
+
+        Returns:
+            A DataFrame indexed by metric title with one column per percentile ('p25', ...)
+            and 'count', or None if there are no results
+        """
+        key = (rubric.name, rubric.version, model, tuple(percentiles))
+        generation = self._generation(rubric, model)
+        with self._lock:
+            cached = self._cohorts.get(key)
+            if cached is not None and cached[0] == generation:
+                return cached[1]
+            row = self._conn.execute("SELECT generation, percentiles FROM cohorts WHERE rubric = ? AND "
+                                     "rubric_version = ? AND model = ?", key[:3]).fetchone()
+        if not generation:
+            return None
+        stored = json.loads(row[1]) if row is not None and row[0] == generation else None
+        if stored is None or stored.get('percentiles') != list(percentiles):
+            stored = self._compute_cohort(rubric, model, percentiles)
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO cohorts (rubric, rubric_version, model, generation, "
+                                   "percentiles) VALUES (?, ?, ?, ?, ?)", key[:3] + (generation, json.dumps(stored)))
+                self._conn.commit()
+        cohort = pd.DataFrame(stored['table']).set_index('metric')
+        with self._lock:
+            self._cohorts[key] = (generation, cohort)
+        return cohort
+
+    def _compute_cohort(self, rubric, model, percentiles):
+        matrix = self.scores(rubric, model).to_numpy()
+        with np.errstate(invalid='ignore'):
+            values = np.nanpercentile(matrix, percentiles, axis=0) if matrix.size else \
+                np.full((len(percentiles), len(rubric.titles)), np.nan)
+        counts = (~np.isnan(matrix)).sum(axis=0) if matrix.size else np.zeros(len(rubric.titles), dtype=int)
+        table = [dict({f"p{p}": (None if np.isnan(values[i, j]) else float(values[i, j]))
+                       for i, p in enumerate(percentiles)}, metric=title, count=int(counts[j]))
+                 for j, title in enumerate(rubric.titles)]
+        return {'percentiles': list(percentiles), 'table': table}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_results_store():
+    """
+    Process-wide ResultsStore (override the database location with EVALBUDDY_RESULTS_DB)
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ResultsStore(os.environ.get('EVALBUDDY_RESULTS_DB', DEFAULT_RESULTS_DB))
+        return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the leaderboard of stored evaluation results")
+    parser.add_argument('--rubric', default=DEFAULT_RUBRIC, help="Rubric set")
+    parser.add_argument('--rubric-version', type=int, default=None, help="Rubric version (default: latest)")
+    parser.add_argument('--model', default=None, help="Model (default: the only one with results)")
+    parser.add_argument('--top', type=int, default=20, help="Rows to print")
+    parser.add_argument('--csv', help="Write the full leaderboard to this CSV file")
+    args = parser.parse_args()
+
+    rubric = get_default_store().get_rubric(args.rubric, args.rubric_version)
+    if rubric is None:
+        parser.error(f"Unknown rubric {args.rubric}")
+    store = get_default_results_store()
+    models = store.models(rubric)
+    model = args.model or (models[0] if len(models) == 1 else None)
+    if model is None:
+        parser.error(f"Results for {rubric.id} come from several models, pick one with --model: {', '.join(models)}"
+                     if models else f"No results stored for {rubric.id}")
+    board = store.leaderboard(rubric, model)
+    print(f"Leaderboard for {rubric.id} ({model}), {len(board)} submissions")
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(board[['rank', 'submission', 'total', 'normalized_total', 'percentile']].head(args.top)
+              .to_string(index=False))
+    if args.csv:
+        board.to_csv(args.csv, index=False)
+        print(f"Leaderboard written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
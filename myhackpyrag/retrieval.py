@@ -0,0 +1,171 @@
+# retrieval.py
+"""
+Local vector index over code chunks.
+
+Chunks produced during ingestion are embedded either with a local Ollama
+embedding model or with a deterministic hashing embedder (no model needed,
+used for tests and as an offline fallback). Vectors are stored in a .npy file
+that is memory-mapped on load, so a large index costs almost nothing until
+it is searched.
+"""
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from llm_client import get_default_client
+
+DEFAULT_EMBEDDING_MODEL = 'nomic-embed-text'
+HASH_EMBEDDING_DIM = 512
+DEFAULT_RETRIEVAL_CHUNK_LINES = 60
+DEFAULT_TOP_K = 4
+DEFAULT_INDEX_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'evalbuddy', 'indexes')
+
+VECTORS_FILE = 'vectors.npy'
+CHUNKS_FILE = 'chunks.json'
+
+_TOKEN_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+')
+
+
+def index_dir_for(repo, root=DEFAULT_INDEX_ROOT):
+    """
+    Return the directory used to persist the index of a repository
+    """
+    return os.path.join(root, hashlib.sha256(str(repo).encode('utf-8')).hexdigest()[:16])
+
+
+def split_records(records, max_lines=DEFAULT_RETRIEVAL_CHUNK_LINES):
+    """
+    Split file records into small line windows suitable for retrieval
+
+    Returns:
+        A list of {'path', 'start_line', 'text'} dicts
+    """
+    chunks = []
+    for record in records:
+        lines = record.content.splitlines()
+        for start in range(0, len(lines), max_lines):
+            text = "\n".join(lines[start:start + max_lines])
+            if text.strip():
+                chunks.append({'path': record.path, 'start_line': start + 1, 'text': text})
+    return chunks
+
+
+def hash_embed(texts, dim=HASH_EMBEDDING_DIM):
+    """
+    Deterministic bag-of-identifiers embedding using the hashing trick
+
+    Identifiers are also split on camelCase and snake_case so 'get_llm_response'
+    and 'LLM response' share features.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in _TOKEN_RE.findall(text):
+            parts = [token] + re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+', token)
+            for part in parts:
+                digest = hashlib.blake2b(part.lower().encode('utf-8'), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vectors[row, bucket] += sign
+    return _normalize(vectors)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+async def embed_texts(texts, embedder='ollama', model=DEFAULT_EMBEDDING_MODEL, client=None):
+    """
+    Embed texts with the given embedder ('ollama' or 'hash') as unit-length float32 rows
+    """
+    if embedder == 'hash':
+        return hash_embed(texts)
+    client = client or get_default_client()
+    vectors = await client.embed(texts, model)
+    return _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+
+
+class VectorIndex:
+    def __init__(self, vectors, chunks, embedder='ollama', model=DEFAULT_EMBEDDING_MODEL):
+        """
+        Args:
+            vectors (np.ndarray): One unit-length row per chunk (may be a memmap)
+            chunks (list): Chunk dicts as produced by split_records
+        """
+        self.vectors = vectors
+        self.chunks = chunks
+        self.embedder = embedder
+        self.model = model
+
+    @classmethod
+    async def build_async(cls, records, embedder='ollama', model=DEFAULT_EMBEDDING_MODEL,
+                          max_lines=DEFAULT_RETRIEVAL_CHUNK_LINES):
+        chunks = split_records(records, max_lines)
+        if chunks:
+            vectors = await embed_texts([f"{chunk['path']}\n{chunk['text']}" for chunk in chunks], embedder, model)
+        else:
+            vectors = np.zeros((0, HASH_EMBEDDING_DIM), dtype=np.float32)
+        return cls(vectors, chunks, embedder, model)
+
+    @classmethod
+    def build(cls, records, embedder='ollama', model=DEFAULT_EMBEDDING_MODEL, max_lines=DEFAULT_RETRIEVAL_CHUNK_LINES):
+        """
+        Chunk and embed file records into a new index
+        """
+        return get_default_client().run(cls.build_async(records, embedder, model, max_lines))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        vectors = np.lib.format.open_memmap(os.path.join(directory, VECTORS_FILE), mode='w+',
+                                            dtype=np.float32, shape=self.vectors.shape)
+        vectors[:] = self.vectors
+        vectors.flush()
+        with open(os.path.join(directory, CHUNKS_FILE), 'w') as f:
+            json.dump({'embedder': self.embedder, 'model': self.model, 'chunks': self.chunks}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Open a saved index; the vectors are memory-mapped rather than read into memory
+        """
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode='r')
+        with open(os.path.join(directory, CHUNKS_FILE), 'r') as f:
+            data = json.load(f)
+        return cls(vectors, data['chunks'], data['embedder'], data['model'])
+
+    def search_vectors(self, query_vectors, k=DEFAULT_TOP_K):
+        """
+        Return, for each query row, the k best (score, chunk) pairs by cosine similarity
+        """
+        if not self.chunks:
+            return [[] for _ in range(len(query_vectors))]
+        scores = np.asarray(query_vectors, dtype=np.float32) @ np.asarray(self.vectors).T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([(float(scores[row, i]), self.chunks[i]) for i in ordered])
+        return results
+
+    async def search_async(self, queries, k=DEFAULT_TOP_K):
+        query_vectors = await embed_texts(list(queries), self.embedder, self.model)
+        return self.search_vectors(query_vectors, k)
+
+    def search(self, queries, k=DEFAULT_TOP_K):
+        """
+        Return the k most relevant chunks for each query string
+        """
+        return get_default_client().run(self.search_async(queries, k))
+
+
+def format_chunks(hits):
+    """
+    Render retrieved (score, chunk) pairs as prompt text
+    """
+    return "\n".join(f"\n=== File: {chunk['path']} (from line {chunk['start_line']}) ===\n{chunk['text']}"
+                     for _, chunk in hits)
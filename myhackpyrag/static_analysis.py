@@ -0,0 +1,394 @@
+# static_analysis.py
+"""
+Deterministic code facts computed without the LLM.
+
+Languages (by extension or shebang), file and line counts, dependencies from
+requirements.txt, environment.yml, package.json and Python imports, and the
+cyclomatic complexity of Python functions are computed in milliseconds per
+file, in a process pool for large repositories. Other languages have no
+parser here, so they do not count towards the complexity. The pool is
+started once, with the 'spawn' method, since analyze_records runs on
+executor threads and forking a threaded process can copy locks held by other
+threads. The facts are given to the model in place of the dependency
+manifests and merged into the technologies and complexity_analysis parts of
+the summary.
+"""
+import ast
+import json
+import multiprocessing
+import posixpath
+import re
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Below this many files the analysis runs in-process; starting a pool costs more
+POOL_MIN_FILES = 500
+POOL_BATCH_FILES = 200
+MOST_COMPLEX_FUNCTIONS = 5
+MAX_LISTED_LIBRARIES = 25
+
+LANGUAGE_BY_EXTENSION = {
+    '.py': 'Python', '.ipynb': 'Python', '.js': 'JavaScript', '.jsx': 'JavaScript', '.mjs': 'JavaScript',
+    '.ts': 'TypeScript', '.tsx': 'TypeScript', '.java': 'Java', '.kt': 'Kotlin', '.go': 'Go', '.rs': 'Rust',
+    '.c': 'C', '.h': 'C', '.cpp': 'C++', '.cc': 'C++', '.hpp': 'C++', '.cs': 'C#', '.rb': 'Ruby', '.php': 'PHP',
+    '.swift': 'Swift', '.scala': 'Scala', '.r': 'R', '.jl': 'Julia', '.dart': 'Dart', '.vue': 'Vue',
+    '.svelte': 'Svelte', '.sh': 'Shell', '.bash': 'Shell', '.sql': 'SQL', '.html': 'HTML', '.css': 'CSS',
+    '.scss': 'CSS',
+}
+LANGUAGE_BY_INTERPRETER = {
+    'python': 'Python', 'python3': 'Python', 'node': 'JavaScript', 'bash': 'Shell', 'sh': 'Shell',
+    'zsh': 'Shell', 'ruby': 'Ruby', 'perl': 'Perl', 'php': 'PHP',
+}
+FRAMEWORKS = {
+    'streamlit': 'Streamlit', 'django': 'Django', 'flask': 'Flask', 'fastapi': 'FastAPI', 'gradio': 'Gradio',
+    'react': 'React', 'next': 'Next.js', 'vue': 'Vue', 'svelte': 'Svelte', 'express': 'Express',
+    '@angular/core': 'Angular', 'spring': 'Spring', 'pytest': 'pytest', 'dash': 'Dash',
+}
+AI_LIBRARIES = {
+    'openai': 'OpenAI API', 'anthropic': 'Anthropic API', 'ollama': 'Ollama', 'langchain': 'LangChain',
+    'llama_index': 'LlamaIndex', 'transformers': 'Hugging Face Transformers', 'torch': 'PyTorch',
+    'tensorflow': 'TensorFlow', 'keras': 'Keras', 'sklearn': 'scikit-learn', 'scikit-learn': 'scikit-learn',
+    'sentence_transformers': 'Sentence Transformers', 'chromadb': 'Chroma', 'faiss': 'FAISS',
+    'google.generativeai': 'Gemini API', 'cohere': 'Cohere',
+}
+
+_STDLIB = set(getattr(sys, 'stdlib_module_names', ()))
+_SHEBANG_RE = re.compile(r'^#!\s*(?:/usr/bin/env\s+)?\S*?([A-Za-z]+[0-9.]*)\b')
+_REQUIREMENT_RE = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+_JS_IMPORT_RE = re.compile(r'''(?:import\s[^'"]*?from\s*|import\s*|require\(\s*)['"]([^'"./][^'"]*)['"]''')
+
+
+def detect_language(path, content):
+    """
+    Language of a file from its extension, or its shebang line for scripts without one
+    """
+    extension = posixpath.splitext(path.lower())[1]
+    if extension in LANGUAGE_BY_EXTENSION:
+        return LANGUAGE_BY_EXTENSION[extension]
+    if content.startswith('#!'):
+        match = _SHEBANG_RE.match(content.split('\n', 1)[0])
+        if match:
+            return LANGUAGE_BY_INTERPRETER.get(match.group(1).rstrip('0123456789.'), None)
+    return None
+
+
+# Node types adding one branch to the McCabe complexity of the function containing them
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert,
+                 ast.comprehension) + ((ast.match_case,) if hasattr(ast, 'match_case') else ())
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _python_facts(content):
+    """
+    Top-level imported modules and the McCabe complexity (1 plus one per branch point)
+    of every function, or None if the file does not parse
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    imports = set()
+    functions = []
+    # One explicit-stack pass; ast.NodeVisitor is several times slower on large repositories
+    stack = [(tree, None)]
+    while stack:
+        node, function = stack.pop()
+        if isinstance(node, _FUNCTION_NODES):
+            function = [node.name, 1]
+            functions.append(function)
+        elif isinstance(node, ast.Import):
+            imports.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.module and not node.level:
+                imports.add(node.module.split('.')[0])
+        elif function is not None:
+            if isinstance(node, _BRANCH_NODES):
+                function[1] += 1
+            elif isinstance(node, ast.BoolOp):
+                function[1] += len(node.values) - 1
+        stack.extend((child, function) for child in ast.iter_child_nodes(node))
+    return imports, [tuple(function) for function in functions]
+
+
+def _notebook_source(content):
+    try:
+        cells = json.loads(content).get('cells', [])
+    except (ValueError, AttributeError):
+        return ''
+    return "\n".join("".join(cell.get('source', [])) for cell in cells if cell.get('cell_type') == 'code')
+
+
+def parse_requirements(content):
+    names = []
+    for line in content.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line or line.startswith('-'):
+            continue
+        match = _REQUIREMENT_RE.match(line)
+        if match:
+            names.append(match.group(1).lower())
+    return names
+
+
+def parse_environment_yml(content):
+    """
+    Package names from a conda environment file, including its pip section
+    """
+    names = []
+    in_dependencies = False
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not line.startswith((' ', '-', '\t')) and stripped:
+            in_dependencies = stripped.startswith('dependencies:')
+            continue
+        if in_dependencies and stripped.startswith('- ') and not stripped.endswith(':'):
+            match = _REQUIREMENT_RE.match(stripped[2:].split('::')[-1])
+            if match and match.group(1) not in ('pip', 'python'):
+                names.append(match.group(1).lower())
+    return names
+
+
+def parse_package_json(content):
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return []
+    names = []
+    for section in ('dependencies', 'devDependencies', 'peerDependencies'):
+        names.extend(data.get(section, {}) or {})
+    return names
+
+
+MANIFEST_PARSERS = {
+    'requirements.txt': ('python', parse_requirements),
+    'environment.yml': ('python', parse_environment_yml),
+    'environment.yaml': ('python', parse_environment_yml),
+    'package.json': ('javascript', parse_package_json),
+}
+
+
+def analyze_file(path, content):
+    """
+    Facts about one file: language, lines of code, imports, declared dependencies
+    and the complexity of each function (Python only; other files list none)
+    """
+    name = posixpath.basename(path.lower())
+    language = detect_language(path, content)
+    facts = {
+        'path': path,
+        'language': language,
+        'loc': sum(1 for line in content.splitlines() if line.strip()),
+        'imports': [],
+        'dependencies': {},
+        'functions': [],
+    }
+    if name in MANIFEST_PARSERS:
+        ecosystem, parse = MANIFEST_PARSERS[name]
+        facts['dependencies'] = {ecosystem: parse(content)}
+
+    source = _notebook_source(content) if path.lower().endswith('.ipynb') else content
+    if language == 'Python':
+        parsed = _python_facts(source)
+        if parsed is not None:
+            imports, functions = parsed
+            facts['imports'] = sorted(module for module in imports if module not in _STDLIB)
+            facts['functions'] = functions
+            return facts
+    if language in ('JavaScript', 'TypeScript', 'Vue', 'Svelte'):
+        facts['imports'] = sorted({module.split('/')[0] if not module.startswith('@') else
+                                   '/'.join(module.split('/')[:2]) for module in _JS_IMPORT_RE.findall(source)})
+    return facts
+
+
+def covered_paths(records):
+    """
+    Paths of dependency manifests, whose content the facts already describe
+    """
+    return {record.path for record in records if posixpath.basename(record.path.lower()) in MANIFEST_PARSERS}
+
+
+def _analyze_batch(items):
+    return [analyze_file(path, content) for path, content in items]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(max_workers=None):
+    """
+    Process pool shared by all analyze_records calls, created on first use
+
+    Args:
+        max_workers (int): Worker count, used only when the pool is created
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def complexity_level(average):
+    if average <= 3:
+        return 'low'
+    if average <= 7:
+        return 'medium'
+    return 'high'
+
+
+def analyze_records(records, max_workers=None):
+    """
+    Compute repository facts from ingested FileRecords
+
+    Returns:
+        {'files', 'loc', 'languages': {language: {'files', 'loc'}}, 'dependencies':
+        {'python': [...], 'javascript': [...]}, 'imports': [...], 'frameworks': [...],
+        'ai_components': [...], 'complexity': {'functions', 'average', 'max', 'level',
+        'most_complex': [...]}}, where level is None if no function was measured
+    """
+    items = [(record.path, record.content) for record in records]
+    if len(items) < POOL_MIN_FILES:
+        per_file = _analyze_batch(items)
+    else:
+        batches = [items[i:i + POOL_BATCH_FILES] for i in range(0, len(items), POOL_BATCH_FILES)]
+        pool = _get_pool(max_workers)
+        try:
+            per_file = [facts for batch in pool.map(_analyze_batch, batches) for facts in batch]
+        except BrokenProcessPool as e:
+            # A worker died (killed, out of memory); start a new pool next time
+            print(f"Static analysis pool failed ({e}), analyzing in-process")
+            _discard_pool(pool)
+            per_file = _analyze_batch(items)
+    return summarize_facts(per_file)
+
+
+def summarize_facts(per_file):
+    """
+    Combine analyze_file results into repository facts (see analyze_records)
+    """
+    languages = {}
+    dependencies = {}
+    imports = Counter()
+    functions = []
+    for facts in per_file:
+        if facts['language']:
+            entry = languages.setdefault(facts['language'], {'files': 0, 'loc': 0})
+            entry['files'] += 1
+            entry['loc'] += facts['loc']
+        for ecosystem, names in facts['dependencies'].items():
+            dependencies.setdefault(ecosystem, set()).update(names)
+        imports.update(facts['imports'])
+        functions.extend((f"{facts['path']}:{name}", complexity) for name, complexity in facts['functions'])
+
+    known = {name.lower().replace('-', '_') for names in dependencies.values() for name in names}
+    known.update(module.lower() for module in imports)
+    frameworks = sorted({label for name, label in FRAMEWORKS.items() if name.replace('-', '_') in known})
+    ai_components = sorted({label for name, label in AI_LIBRARIES.items() if name.replace('-', '_') in known})
+
+    complexities = [complexity for _, complexity in functions]
+    average = sum(complexities) / len(complexities) if complexities else 0.0
+    return {
+        'files': len(per_file),
+        'loc': sum(facts['loc'] for facts in per_file),
+        'languages': dict(sorted(languages.items(), key=lambda item: -item[1]['loc'])),
+        'dependencies': {ecosystem: sorted(names) for ecosystem, names in dependencies.items()},
+        'imports': [module for module, _ in imports.most_common()],
+        'frameworks': frameworks,
+        'ai_components': ai_components,
+        'complexity': {
+            'functions': len(complexities),
+            'average': round(average, 2),
+            'max': max(complexities, default=0),
+            'level': complexity_level(average) if complexities else None,
+            'most_complex': [f"{name} ({complexity})" for name, complexity in
+                             sorted(functions, key=lambda item: -item[1])[:MOST_COMPLEX_FUNCTIONS]],
+        },
+    }
+
+
+def format_facts(facts):
+    """
+    Render repository facts as prompt text
+    """
+    languages = ", ".join(f"{language} ({entry['files']} files, {entry['loc']} lines)"
+                          for language, entry in facts['languages'].items()) or "unknown"
+    lines = [
+        "Static analysis (computed exactly, do not re-derive):",
+        f"- Files: {facts['files']}, non-blank lines: {facts['loc']}",
+        f"- Languages: {languages}",
+    ]
+    for ecosystem, names in facts['dependencies'].items():
+        lines.append(f"- Declared {ecosystem} dependencies: {', '.join(names[:MAX_LISTED_LIBRARIES]) or 'none'}")
+    if facts['imports']:
+        lines.append(f"- Third-party imports: {', '.join(facts['imports'][:MAX_LISTED_LIBRARIES])}")
+    if facts['frameworks']:
+        lines.append(f"- Frameworks: {', '.join(facts['frameworks'])}")
+    if facts['ai_components']:
+        lines.append(f"- AI libraries: {', '.join(facts['ai_components'])}")
+    complexity = facts['complexity']
+    if complexity['functions']:
+        lines.append(f"- Cyclomatic complexity: {complexity['functions']} Python functions, average "
+                     f"{complexity['average']}, max {complexity['max']} ({complexity['level']})")
+    if complexity['most_complex']:
+        lines.append(f"- Most complex: {', '.join(complexity['most_complex'])}")
+    return "\n".join(lines)
+
+
+def _union(first, second):
+    seen = {}
+    for item in list(first) + list(second or []):
+        if isinstance(item, str) and item.lower() not in seen:
+            seen[item.lower()] = item
+    return list(seen.values())
+
+
+def merge_facts(analysis, facts):
+    """
+    Merge repository facts into a structured analysis dict (STRUCTURED_ANALYSIS_SCHEMA)
+
+    Languages, frameworks, libraries and AI components found statically are added to
+    'technologies'; the complexity level comes from the measured complexity when any
+    function was measured, and is otherwise left to the model.
+    """
+    analysis = dict(analysis)
+    technologies = analysis.get('technologies')
+    if not isinstance(technologies, dict):
+        technologies = {}
+    libraries = [name for names in facts['dependencies'].values() for name in names] or facts['imports']
+    analysis['technologies'] = dict(
+        technologies,
+        languages=_union(facts['languages'], technologies.get('languages')),
+        frameworks=_union(facts['frameworks'], technologies.get('frameworks')),
+        libraries=_union(libraries[:MAX_LISTED_LIBRARIES], technologies.get('libraries')),
+        ai_components=_union(facts['ai_components'], technologies.get('ai_components')),
+    )
+    complexity = analysis.get('complexity_analysis')
+    if not isinstance(complexity, dict):
+        complexity = {}
+    measured = facts['complexity']
+    note = f"Static analysis: {facts['files']} files, {facts['loc']} lines"
+    if measured['functions']:
+        note += (f", {measured['functions']} Python functions with average cyclomatic complexity "
+                 f"{measured['average']} (max {measured['max']})")
+    note += "."
+    explanation = complexity.get('explanation')
+    analysis['complexity_analysis'] = dict(
+        complexity,
+        level=measured['level'] if measured['functions'] else complexity.get('level'),
+        explanation=f"{explanation} {note}" if explanation else note,
+        metrics={'files': facts['files'], 'loc': facts['loc'], 'functions': measured['functions'],
+                 'average_complexity': measured['average'], 'max_complexity': measured['max']},
+    )
+    return analysis
@@ -0,0 +1,146 @@
+# streaming.py
+"""
+Live event streams for summarization and evaluation.
+
+stream_summary_async and stream_evaluation_async run the same pipelines as
+summarize_records_async and evaluate_project_async, but are async iterators
+of events produced while the work is under way:
+
+    {'type': 'token', 'call': n, 'text': ...}           text generated by LLM call n
+    {'type': 'reset', 'call': n}                         call n is being retried, drop its text
+    {'type': 'metric', 'title': ..., 'result': {...}}    a validated metric result
+    {'type': 'timing', 'name': ..., 'seconds': ...}      'first_token', 'first_metric' and 'total'
+    {'type': 'result', 'value': ...}                     the return value, always the last event
+
+Several LLM calls may stream at once (map-reduce chunks, per-metric requests);
+their tokens are told apart by 'call'. iterate_events consumes a stream from
+synchronous code such as the Streamlit app.
+"""
+import asyncio
+import itertools
+import queue
+import time
+
+from evaluator import evaluate_project_async, summarize_records_async
+from llm_client import get_default_client, token_listener
+
+EVENT_POLL_SECONDS = 0.2
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+async def stream_events(run):
+    """
+    Run run(emit) -> coroutine and yield the events it and its LLM calls produce
+
+    Token events come from every chat request made while the coroutine runs; emit(event)
+    adds further events. A 'timing' event is added the first time a token and a metric
+    arrive, and 'total' plus 'result' when the coroutine returns.
+    """
+    events = asyncio.Queue()
+    start = time.perf_counter()
+    seen = set()
+    calls = itertools.count()
+
+    def emit(event):
+        first = f"first_{event['type']}"
+        if event['type'] in ('token', 'metric') and first not in seen:
+            seen.add(first)
+            events.put_nowait({'type': 'timing', 'name': first, 'seconds': time.perf_counter() - start})
+        events.put_nowait(event)
+
+    class CallWatcher:
+        def __init__(self):
+            self.call = next(calls)
+
+        def feed(self, text):
+            if text:
+                emit({'type': 'token', 'call': self.call, 'text': text})
+            return False
+
+        def reset(self):
+            emit({'type': 'reset', 'call': self.call})
+
+    async def watched():
+        # Set inside the task so only this run's requests report to this stream
+        token_listener.set(CallWatcher)
+        return await run(emit)
+
+    task = asyncio.ensure_future(watched())
+    task.add_done_callback(lambda _: events.put_nowait(_END))
+    try:
+        while True:
+            event = await events.get()
+            if event is _END:
+                break
+            yield event
+        value = task.result()
+        yield {'type': 'timing', 'name': 'total', 'seconds': time.perf_counter() - start}
+        yield {'type': 'result', 'value': value}
+    finally:
+        task.cancel()
+
+
+def stream_summary_async(records, **kwargs):
+    """
+    Event stream of summarize_records_async(records, **kwargs)
+    """
+    return stream_events(lambda emit: summarize_records_async(records, **kwargs))
+
+
+def stream_evaluation_async(doc_text, code_summary, on_metric=None, **kwargs):
+    """
+    Event stream of evaluate_project_async(doc_text, code_summary, **kwargs), with a
+    'metric' event as soon as each metric's result is validated
+    """
+    def run(emit):
+        def metric_done(title, result):
+            emit({'type': 'metric', 'title': title, 'result': result})
+            if on_metric is not None:
+                on_metric(title, result)
+
+        return evaluate_project_async(doc_text, code_summary, on_metric=metric_done, **kwargs)
+
+    return stream_events(run)
+
+
+def iterate_events(stream, should_stop=None, client=None):
+    """
+    Iterate an async event stream from synchronous code
+
+    The stream runs on the LLM client's loop. Closing the generator, or should_stop()
+    returning True while waiting for the next event, cancels the work underneath.
+    """
+    client = client or get_default_client()
+    pending = queue.Queue()
+
+    async def pump():
+        try:
+            async for event in stream:
+                pending.put(event)
+        except Exception as e:
+            pending.put(_Failure(e))
+        finally:
+            pending.put(_END)
+
+    future = client.submit(pump())
+    try:
+        while True:
+            if should_stop is not None and should_stop():
+                return
+            try:
+                item = pending.get(timeout=EVENT_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        future.cancel()
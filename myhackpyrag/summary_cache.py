@@ -0,0 +1,153 @@
+# summary_cache.py
+"""
+Persistent, content-addressed cache for LLM results.
+
+Entries are keyed by a hash of the prompt inputs, the model name and a prompt
+version, stored in a single SQLite file and evicted least-recently-used once
+the cache grows past its size limit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'evalbuddy', 'summaries.sqlite3')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class SummaryCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Open (or create) a cache database
+
+        Args:
+            path (str): Location of the SQLite file
+            max_bytes (int): Total size of stored values before LRU eviction kicks in
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                repo TEXT,
+                kind TEXT,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_repo ON entries (repo)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS manifests (
+                repo TEXT PRIMARY KEY,
+                hashes TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(kind, model, prompt_version, *parts):
+        """
+        Hash the inputs of an LLM call into a cache key
+        """
+        digest = hashlib.sha256()
+        for part in (kind, model, prompt_version) + parts:
+            encoded = str(part).encode('utf-8', errors='ignore')
+            # Length-prefix each part so ('ab', 'c') and ('a', 'bc') differ
+            digest.update(f"{len(encoded)}:".encode())
+            digest.update(encoded)
+        return f"{kind}:{digest.hexdigest()}"
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value, repo=None):
+        """
+        Store a JSON-serialisable value, evicting old entries if over the size limit
+        """
+        encoded = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, repo, kind, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, repo, key.split(':', 1)[0], encoded, len(encoded), now, now))
+            self._evict()
+            self._conn.commit()
+
+    def invalidate_repo(self, repo):
+        """
+        Drop every entry and the file manifest recorded for a repository. Returns the
+        number of entries removed.
+        """
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM entries WHERE repo = ?", (repo,)).rowcount
+            self._conn.execute("DELETE FROM manifests WHERE repo = ?", (repo,))
+            self._conn.commit()
+        return removed
+
+    def get_manifest(self, repo):
+        """
+        Return the {path: content hash} manifest last stored for repo, or None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT hashes FROM manifests WHERE repo = ?", (repo,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_manifest(self, repo, hashes):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO manifests (repo, hashes, updated) VALUES (?, ?, ?)",
+                               (repo, json.dumps(hashes), time.time()))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM manifests")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': total}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        # Caller holds the lock
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC")
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
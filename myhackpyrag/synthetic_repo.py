@@ -0,0 +1,95 @@
+# synthetic_repo.py
+"""
+Deterministic synthetic repositories for benchmarks.
+
+A repository of any size is generated from a seed: Python and JavaScript
+sources, a README and dependency manifests, a .gitignore, binary assets and
+directories that ingestion should skip (node_modules, .git, __pycache__).
+It can be written straight into a ZIP laid out like a GitHub archive, or
+into a directory tree.
+"""
+import os
+import random
+import zipfile
+
+ARCHIVE_PREFIX = 'synthetic-main/'
+BINARY_FRACTION = 0.05
+IGNORED_FRACTION = 0.10
+IGNORED_DIRS = ('node_modules/pkg', '.git/objects', '__pycache__')
+
+_WORDS = ('data', 'user', 'model', 'score', 'item', 'result', 'config', 'cache', 'event', 'record', 'report',
+          'metric', 'batch', 'token', 'request', 'index')
+
+
+def _python_source(rng, index):
+    name = f"{rng.choice(_WORDS)}_{index}"
+    functions = []
+    for i in range(rng.randint(2, 8)):
+        word = rng.choice(_WORDS)
+        functions.append(f'''
+def process_{word}_{i}(items, limit={rng.randint(1, 100)}):
+    """Process {word} items up to the limit."""
+    results = []
+    for item in items[:limit]:
+        if item.get("{word}") is not None:
+            results.append(item["{word}"] * {rng.randint(2, 9)})
+        else:
+            results.append(None)
+    return results
+''')
+    imports = sorted(rng.sample(['os', 'json', 'time', 'requests', 'pandas', 'numpy', 'streamlit'], 3))
+    return "\n".join(f"import {module}" for module in imports) + f"\n\n# Module {name}\n" + "".join(functions)
+
+
+def _javascript_source(rng, index):
+    word = rng.choice(_WORDS)
+    return (f"import React from 'react';\n\n"
+            f"export function {word.capitalize()}View{index}({{ items }}) {{\n"
+            f"  const visible = items.filter((item) => item.{word} > {rng.randint(0, 50)});\n"
+            f"  return <ul>{{visible.map((item) => <li key={{item.id}}>{{item.{word}}}</li>)}}</ul>;\n"
+            f"}}\n")
+
+
+def iter_files(n_files, seed=0, binary_fraction=BINARY_FRACTION, ignored_fraction=IGNORED_FRACTION):
+    """
+    Yield (path, bytes) for a synthetic repository of n_files files
+    """
+    rng = random.Random(seed)
+    yield 'README.md', f"# Synthetic project {seed}\n\nGenerated with {n_files} files for benchmarks.\n".encode()
+    yield 'requirements.txt', b"requests==2.32.3\npandas==2.2.2\nnumpy==1.26.4\nstreamlit==1.39.0\n"
+    yield 'package.json', b'{"name": "synthetic", "dependencies": {"react": "^18.2.0"}}\n'
+    yield '.gitignore', b"*.log\nbuild/\n"
+    for index in range(max(n_files - 4, 0)):
+        roll = rng.random()
+        package = f"src/pkg{index % 50}"
+        if roll < binary_fraction:
+            yield f"assets/image_{index}.png", b'\x89PNG\r\n\x1a\n\0' + rng.randbytes(rng.randint(200, 4000))
+        elif roll < binary_fraction + ignored_fraction:
+            directory = IGNORED_DIRS[index % len(IGNORED_DIRS)]
+            yield f"{directory}/file_{index}.js", _javascript_source(rng, index).encode()
+        elif roll < 0.3:
+            yield f"web/components/view_{index}.jsx", _javascript_source(rng, index).encode()
+        else:
+            yield f"{package}/module_{index}.py", _python_source(rng, index).encode()
+
+
+def make_zip(path, n_files, seed=0, **kwargs):
+    """
+    Write a synthetic repository as a GitHub-style archive and return its path
+    """
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in iter_files(n_files, seed, **kwargs):
+            archive.writestr(ARCHIVE_PREFIX + name, data)
+    return path
+
+
+def make_tree(root, n_files, seed=0, **kwargs):
+    """
+    Write a synthetic repository into a directory and return its path
+    """
+    for name, data in iter_files(n_files, seed, **kwargs):
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    return root
@@ -0,0 +1,54 @@
+# conftest.py
+"""
+Shared fixtures. The modules live flat in the parent directory and import each
+other by name, so it is put on sys.path here.
+"""
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ollama import FakeOllama
+from llm_client import LLMClient
+
+
+@pytest.fixture
+def http_server():
+    """
+    Start a ThreadingHTTPServer for a handler class and return its base URL
+
+    Usage: url = http_server(Handler)
+    """
+    servers = []
+
+    def start(handler_class, host='127.0.0.1'):
+        server = ThreadingHTTPServer((host, 0), handler_class)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        servers.append(server)
+        return f"http://{host}:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fake():
+    with FakeOllama() as server:
+        yield server
+
+
+@pytest.fixture
+def client(fake):
+    """
+    LLMClient talking to the fake server, without retries
+    """
+    client = LLMClient(host=fake.url, retries=0)
+    yield client
+    client.close()
@@ -0,0 +1,35 @@
+import zipfile
+
+import pytest
+
+from batch import ingest_submission
+
+
+def test_scheme_less_github_link_is_fetched(monkeypatch, tmp_path):
+    archive = tmp_path / 'repo.zip'
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.writestr('repo-main/app.py', 'print(1)\n')
+    fetched = []
+
+    class Fetcher:
+        def fetch(self, url):
+            fetched.append(url)
+            return str(archive)
+
+    monkeypatch.setattr('evaluator.get_default_fetcher', lambda: Fetcher())
+    result = ingest_submission({'id': 'a', 'source': 'github.com/owner/repo'})
+    assert fetched == ['github.com/owner/repo']
+    assert [record.path for record in result['records']] == ['app.py']
+
+
+def test_zip_path_is_read_directly(tmp_path):
+    archive = tmp_path / 'upload.zip'
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.writestr('app.py', 'print(1)\n')
+    result = ingest_submission({'id': 'a', 'source': str(archive)})
+    assert [record.path for record in result['records']] == ['app.py']
+
+
+def test_other_hosts_are_rejected():
+    with pytest.raises(ValueError, match='Only GitHub links'):
+        ingest_submission({'id': 'a', 'source': 'https://gitlab.com/owner/repo'})
@@ -0,0 +1,51 @@
+from budget import compact_content
+
+PYTHON = '''#!/usr/bin/env python
+# A comment line
+def main():
+    """Usage:
+    # prog --flag
+    """
+    pattern = "# not a comment"
+        # indented comment
+    value = 1  # trailing comment
+
+    return """
+# inside a string
+"""
+'''
+
+
+def test_python_comments_are_found_with_tokenize():
+    compacted = compact_content('app.py', PYTHON)
+    assert '# A comment line' not in compacted and '# indented comment' not in compacted
+    for kept in ('#!/usr/bin/env python', '    # prog --flag', '"# not a comment"', '# trailing comment',
+                 '# inside a string'):
+        assert kept in compacted
+    assert '\n\n' not in compacted
+
+
+def test_python_that_does_not_tokenize_is_kept():
+    assert compact_content('broken.py', 'call(\n# comment\n') == 'call(\n# comment'
+
+
+def test_c_like_comments_outside_strings_are_removed():
+    source = '''// header
+/* block
+   comment */
+const files = glob("src/**/*.js");
+const text = 'a /* b */ c // d';
+const template = `line
+// still the template`;
+let x = 1; // trailing
+'''
+    assert compact_content('app.js', source) == '''const files = glob("src/**/*.js");
+const text = 'a /* b */ c // d';
+const template = `line
+// still the template`;
+let x = 1; // trailing'''
+
+
+def test_other_languages_keep_their_hash_lines():
+    script = 'cat <<EOF\n# part of the heredoc\nEOF\n'
+    assert compact_content('run.sh', script) == script.strip('\n')
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+import dedup
+from dedup import DuplicateIndex, band_keys, file_signatures, minhash, shingles, similarity_text
+from ingest import FileRecord
+
+
+def source(seed, lines=40):
+    return "\n".join(f"def function_{seed}_{i}(value):\n    return value * {i} + {seed}" for i in range(lines))
+
+
+def record(path, content):
+    return FileRecord(path, content, len(content))
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DuplicateIndex(str(tmp_path / 'dedup.sqlite3'))
+    yield index
+    index.close()
+
+
+def test_shingles_and_minhash():
+    assert len(shingles('too few words')) == 0
+    hashes = shingles(source(1))
+    assert len(hashes) >= dedup.MIN_SHINGLES
+    signature = minhash(hashes)
+    assert signature.dtype == np.uint32 and len(signature) == dedup.NUM_PERMUTATIONS
+    # Deterministic across calls, so stored signatures stay comparable
+    assert np.array_equal(signature, minhash(shingles(source(1))))
+
+
+def test_band_keys():
+    signature = minhash(shingles(source(1)))
+    keys = band_keys(signature)
+    assert len(keys) == dedup.BANDS and all(0 <= key < 1 << 63 for key in keys)
+    changed = signature.copy()
+    changed[0] += 1
+    # Changing one row only moves the bucket of its own band
+    assert [a == b for a, b in zip(keys, band_keys(changed))] == [False] + [True] * (dedup.BANDS - 1)
+
+
+def test_file_signatures_skip_short_files():
+    signatures = file_signatures([record('__init__.py', ''), record('main.py', source(1))])
+    assert [path for path, _, _, _ in signatures] == ['main.py']
+
+
+def test_match_identical_and_near_duplicate(index):
+    template = source(1)
+    index.add('template', file_signatures([record('app.py', template), record('util.py', source(2))]))
+
+    # One line edited out of 80: still a near-duplicate, not an exact copy
+    edited = template.replace('return value * 7 + 1', 'return value * 7 + 100')
+    signatures = file_signatures([record('app.py', edited), record('util.py', source(2)),
+                                  record('own.py', source(3))])
+    report = index.match(signatures, submission='entry')
+    assert report['files'] == 3 and report['shared_files'] == 2
+    assert report['matches']['util.py'] == {'submission': 'template', 'path': 'util.py', 'similarity': 1.0}
+    assert dedup.NEAR_DUPLICATE_THRESHOLD <= report['matches']['app.py']['similarity'] < 1.0
+    assert 'own.py' not in report['matches']
+    sizes = {path: size for path, size, _, _ in signatures}
+    assert report['overlap'] == round((sizes['app.py'] + sizes['util.py']) / report['bytes'], 4)
+    assert report['shared_with'] == 1
+    assert report['top_matches'] == [{'submission': 'template', 'overlap': report['overlap']}]
+    assert 'identical or near-identical' in similarity_text(report)
+
+
+def test_match_distinct_files(index):
+    index.add('other', file_signatures([record('app.py', source(1))]))
+    report = index.match(file_signatures([record('app.py', source(2))]), submission='entry')
+    assert report['shared_files'] == 0 and report['overlap'] == 0.0 and report['matches'] == {}
+    assert similarity_text(report) == ''
+
+
+def test_match_ignores_own_submission(index):
+    signatures = file_signatures([record('app.py', source(1))])
+    index.add('entry', signatures)
+    assert index.match(signatures, submission='entry')['shared_files'] == 0
+    assert index.match(signatures)['shared_files'] == 1
+
+
+def test_shared_with_counts_submissions_once(index):
+    index.add('small', file_signatures([record('tiny.py', source(1, lines=4))]))
+    index.add('big', file_signatures([record('a.py', source(2)), record('b.py', source(3))]))
+    signatures = file_signatures([record('tiny.py', source(1, lines=4)), record('a.py', source(2)),
+                                  record('b.py', source(3)), record('own.py', source(4, lines=200))])
+    report = index.match(signatures, submission='entry')
+    assert [match['submission'] for match in report['top_matches']] == ['big', 'small']
+    # 'small' holds under SHARED_SUBMISSION_FRACTION of the bytes, so it is not counted
+    assert report['top_matches'][1]['overlap'] < dedup.SHARED_SUBMISSION_FRACTION
+    assert report['shared_with'] == 1
+
+
+def test_add_replaces_and_remove(index):
+    index.add('entry', file_signatures([record('a.py', source(1)), record('b.py', source(2))]))
+    index.add('entry', file_signatures([record('a.py', source(1))]))
+    assert index.stats() == {'submissions': 1, 'files': 1}
+    assert index.match(file_signatures([record('b.py', source(2))]))['shared_files'] == 0
+    index.remove('entry')
+    assert index.stats() == {'submissions': 0, 'files': 0}
+    assert index.match(file_signatures([record('a.py', source(1))]))['shared_files'] == 0
+
+
+def test_match_empty(index):
+    report = index.match([])
+    assert report['files'] == 0 and report['overlap'] == 0.0
@@ -0,0 +1,57 @@
+import json
+import os
+
+import pytest
+
+import evaluator
+from fake_ollama import CANNED_ANALYSIS
+from model_tiers import ModelTiers
+from summary_cache import SummaryCache
+
+
+
+def _llama_sample():
+    # static_data.py cannot be imported (its second f-string is invalid), so the sample is read as text
+    with open(os.path.join(os.path.dirname(evaluator.__file__), 'static_data.py'), encoding='utf-8') as f:
+        source = f.read()
+    sample = source.split('static_summary = f"""', 1)[1].split('"""', 1)[0]
+    return sample.split("Summary of Complete Codebase:", 1)[1].replace('{{', '{').replace('}}', '}')
+
+
+# llama3.2's usual single-pass output: a narrative and almost-JSON (missing commas)
+ALMOST_JSON_SUMMARY = _llama_sample()
+
+
+@pytest.fixture
+def tiers(client, monkeypatch):
+    tiers = ModelTiers('tiny', 'big')
+    monkeypatch.setattr(evaluator, 'get_default_client', lambda: client)
+    monkeypatch.setattr(evaluator, 'get_default_tiers', lambda: tiers)
+    return tiers
+
+
+def test_summary_keeps_raw_text_when_every_tier_is_invalid(fake, tiers):
+    fake.responder = lambda prompt, format=None: ALMOST_JSON_SUMMARY
+    summary = evaluator.summarize_code("int main() {}", "main.cpp")
+    assert "classic game of Minesweeper" in summary
+    assert summary.startswith("\nSummary of main.cpp:\n")
+    rows = {row['tier']: row for row in tiers.stats()}
+    assert rows['small']['invalid'] == 1 and rows['small']['escalations'] == 1
+    assert rows['large']['invalid'] == 1
+
+
+def test_invalid_summary_is_not_cached(fake, tiers, tmp_path):
+    cache = SummaryCache(str(tmp_path / 'cache.sqlite3'))
+    fake.responder = lambda prompt, format=None: ALMOST_JSON_SUMMARY
+    evaluator.summarize_code("int main() {}", "main.cpp", cache=cache)
+    fake.responder = lambda prompt, format=None: json.dumps(CANNED_ANALYSIS)
+    summary = evaluator.summarize_code("int main() {}", "main.cpp", cache=cache)
+    assert json.loads(summary.split(":\n", 1)[1]) == CANNED_ANALYSIS
+
+
+def test_valid_small_tier_summary_does_not_escalate(fake, tiers):
+    fake.responder = lambda prompt, format=None: "Narrative.\n" + json.dumps(CANNED_ANALYSIS)
+    summary = evaluator.summarize_code("print(1)", "app.py")
+    assert "Narrative." in summary
+    assert [row['tier'] for row in tiers.stats()] == ['small']
+    assert fake.stats()['by_path'] == {'/api/chat': 1}
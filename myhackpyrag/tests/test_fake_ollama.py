@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from evaluator import FACTORS_TEMPLATE, STRUCTURED_ANALYSIS_TEMPLATE, get_llm_response_async
+from fake_ollama import CANNED_ANALYSIS, CANNED_FACTORS, CANNED_TEXT, canned_responder, default_responder
+from json_stream import IncrementalJSONParser, json_schema
+
+
+def test_replies_follow_the_format_schema_not_the_prompt():
+    prompt = "Summarize this chunk. It defines evaluationFactors and mentions Structured Analysis."
+    assert json.loads(default_responder(prompt, json_schema(STRUCTURED_ANALYSIS_TEMPLATE))) == CANNED_ANALYSIS
+    assert json.loads(default_responder(prompt, json_schema(FACTORS_TEMPLATE, strict=True))) == CANNED_FACTORS
+    evaluation = json.loads(default_responder(prompt, json_schema({"Design": {}, "Impact": {}})))
+    assert list(evaluation) == ["Design", "Impact"]
+    assert default_responder("Describe the project.") == CANNED_TEXT
+
+
+def test_canned_responder_falls_back_with_the_format():
+    respond = canned_responder({"ping": "pong"})
+    assert respond("ping?") == "pong"
+    assert json.loads(respond("other", json_schema(FACTORS_TEMPLATE))) == CANNED_FACTORS
+
+
+def test_chat_streams_the_reply(fake, client):
+    assert client.run(client.chat("Describe the project.", "m")) == CANNED_TEXT
+    stats = fake.stats()
+    assert stats['by_path'] == {'/api/chat': 1}
+    assert stats['prompt_bytes'] == len("Describe the project.")
+
+
+def test_consumer_stops_generation_early(fake, client):
+    class StopAfterTwo:
+        def __init__(self):
+            self.pieces = 0
+
+        def feed(self, text):
+            self.pieces += 1
+            return self.pieces == 2
+
+        def reset(self):
+            self.pieces = 0
+
+    reply = client.run(client.chat("Describe the project.", "m", consumer=StopAfterTwo()))
+    assert reply == CANNED_TEXT[:8]
+
+
+def test_structured_request_sends_its_schema(client):
+    prompt = "This chunk mentions evaluationFactors. Structured Analysis (in JSON format):"
+    seen = []
+    result = client.run(get_llm_response_async(prompt, 'json', model='m', client=client,
+                                               schema=STRUCTURED_ANALYSIS_TEMPLATE,
+                                               on_member=lambda key, value: seen.append(key)))
+    assert result == CANNED_ANALYSIS
+    assert seen == list(CANNED_ANALYSIS)
+
+
+def test_strict_request_rejects_extra_keys(fake, client):
+    fake.responder = lambda prompt, format=None: json.dumps(dict(CANNED_FACTORS, extra=1))
+    with pytest.raises(ValueError, match='extra'):
+        client.run(get_llm_response_async("factors", 'json', model='m', client=client, schema=FACTORS_TEMPLATE,
+                                          strict=True))
+    # Without strict the extra member is dropped
+    result = client.run(get_llm_response_async("factors", 'json', model='m', client=client, schema=FACTORS_TEMPLATE))
+    assert result == CANNED_FACTORS
+
+
+def test_embeddings_are_deterministic(client):
+    first, second = client.run(client.embed(["a", "a"], "embed"))
+    assert first == second and len(first) == 64
+
+
+def test_incremental_parser_on_a_streamed_reply(client):
+    parser = IncrementalJSONParser(schema=STRUCTURED_ANALYSIS_TEMPLATE)
+    client.run(client.chat("x", "m", format=json_schema(STRUCTURED_ANALYSIS_TEMPLATE), consumer=parser))
+    assert parser.done and parser.result == CANNED_ANALYSIS
@@ -0,0 +1,149 @@
+import io
+import json
+import zipfile
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from fetcher import ArchiveFetcher, FetchError, is_github_url, parse_github_url
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+class FakeGitHub:
+    """
+    State behind a handler serving the API lookup and the branch archives of owner/repo
+    """
+    def __init__(self):
+        self.archives = {'main': make_zip({'repo-main/app.py': 'print("v1")\n'})}
+        self.etag = '"v1"'
+        self.api_status = 200
+        self.requests = []
+
+    def handler(self):
+        github = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                github.requests.append((self.path, self.headers.get('If-None-Match')))
+                if self.path == '/api/repos/owner/repo':
+                    if github.api_status != 200:
+                        return self._send(github.api_status, b'{}')
+                    return self._send(200, json.dumps({'default_branch': 'main'}).encode(), etag='"api"')
+                for ref in ('refs/heads/main', 'HEAD'):
+                    if self.path == f"/web/owner/repo/archive/{ref}.zip":
+                        if self.headers.get('If-None-Match') == github.etag:
+                            return self._send(304, b'')
+                        return self._send(200, github.archives['main'], etag=github.etag)
+                self._send(404, b'')
+
+            def _send(self, status, body, etag=None):
+                self.send_response(status)
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+@pytest.fixture
+def github(http_server, tmp_path):
+    state = FakeGitHub()
+    url = http_server(state.handler())
+    fetcher = ArchiveFetcher(cache_dir=str(tmp_path / 'archives'), api_base=f"{url}/api", web_base=f"{url}/web",
+                             token='')
+    yield state, fetcher
+    fetcher.close()
+
+
+def read_member(path, name):
+    with zipfile.ZipFile(path) as archive:
+        return archive.read(name).decode()
+
+
+def test_unchanged_archive_is_revalidated_with_its_etag(github):
+    state, fetcher = github
+    first = fetcher.fetch('https://github.com/owner/repo')
+    second = fetcher.fetch('https://github.com/owner/repo')
+    assert first == second
+    assert (fetcher.downloads, fetcher.revalidations) == (1, 1)
+    assert read_member(second, 'repo-main/app.py') == 'print("v1")\n'
+    archive_requests = [request for request in state.requests if request[0].endswith('.zip')]
+    assert archive_requests == [('/web/owner/repo/archive/refs/heads/main.zip', None),
+                                ('/web/owner/repo/archive/refs/heads/main.zip', '"v1"')]
+    # The default branch lookup is revalidated too
+    assert state.requests[2] == ('/api/repos/owner/repo', '"api"')
+
+
+def test_changed_archive_is_downloaded_again(github):
+    state, fetcher = github
+    fetcher.fetch('github.com/owner/repo')
+    state.archives['main'] = make_zip({'repo-main/app.py': 'print("v2")\n'})
+    state.etag = '"v2"'
+    path = fetcher.fetch('github.com/owner/repo')
+    assert (fetcher.downloads, fetcher.revalidations) == (2, 0)
+    assert read_member(path, 'repo-main/app.py') == 'print("v2")\n'
+
+
+def test_failed_branch_lookup_falls_back_to_head(github):
+    state, fetcher = github
+    state.api_status = 403
+    path = fetcher.fetch('https://github.com/owner/repo')
+    assert read_member(path, 'repo-main/app.py') == 'print("v1")\n'
+    assert state.requests[-1][0] == '/web/owner/repo/archive/HEAD.zip'
+
+
+def test_oversized_archive_is_rejected(github, tmp_path):
+    state, fetcher = github
+    fetcher.max_bytes = 10
+    with pytest.raises(FetchError, match='byte limit'):
+        fetcher.fetch('https://github.com/owner/repo/tree/main')
+    assert not list((tmp_path / 'archives').glob('*.zip'))
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://github.com/owner/repo', ('owner', 'repo', None)),
+    ('https://github.com/owner/repo.git', ('owner', 'repo', None)),
+    ('https://github.com/owner/repo/tree/feature/x', ('owner', 'repo', 'feature/x')),
+    ('github.com/owner/repo', ('owner', 'repo', None)),
+    ('www.github.com/owner/repo/', ('owner', 'repo', None)),
+    ('owner/repo', ('owner', 'repo', None)),
+])
+def test_parse_github_url(url, expected):
+    assert parse_github_url(url) == expected
+
+
+@pytest.mark.parametrize('url', ['github.com/owner', 'gitlab.com/owner/repo', 'https://github.com/'])
+def test_parse_github_url_rejects(url):
+    with pytest.raises(FetchError):
+        parse_github_url(url)
+
+
+@pytest.mark.parametrize('url', ['https://gitlab.com/owner/repo', 'http://example.com/owner/repo'])
+def test_parse_github_url_rejects_other_hosts(url):
+    with pytest.raises(FetchError, match='Not a GitHub'):
+        parse_github_url(url)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('https://github.com/owner/repo', True),
+    ('http://www.github.com/owner/repo', True),
+    ('github.com/owner/repo', True),
+    ('https://gitlab.com/owner/repo', False),
+    ('ftp://github.com/owner/repo', False),
+    ('uploads/repo.zip', False),
+    ('/tmp/owner/repo.zip', False),
+])
+def test_is_github_url(text, expected):
+    assert is_github_url(text) is expected
@@ -0,0 +1,28 @@
+from incremental import diff_manifests, hash_records
+from ingest import FileRecord
+
+
+def test_first_run_reports_everything_added():
+    diff = diff_manifests(None, {'a.py': '1', 'b.py': '2'})
+    assert diff == {'first_run': True, 'added': ['a.py', 'b.py'], 'modified': [], 'deleted': [], 'unchanged': 0}
+
+
+def test_added_modified_deleted_and_unchanged():
+    previous = {'a.py': '1', 'b.py': '2', 'c.py': '3'}
+    current = {'a.py': '1', 'b.py': '20', 'd.py': '4'}
+    diff = diff_manifests(previous, current)
+    assert diff == {'first_run': False, 'added': ['d.py'], 'modified': ['b.py'], 'deleted': ['c.py'],
+                    'unchanged': 1}
+
+
+def test_identical_manifests():
+    manifest = hash_records([FileRecord('a.py', 'x = 1\n', 6), FileRecord('b.py', 'y = 2\n', 6)])
+    diff = diff_manifests(manifest, dict(manifest))
+    assert diff['added'] == diff['modified'] == diff['deleted'] == []
+    assert diff['unchanged'] == 2
+
+
+def test_hash_records_follows_content():
+    first = hash_records([FileRecord('a.py', 'x = 1\n', 6)])
+    second = hash_records([FileRecord('a.py', 'x = 2\n', 6)])
+    assert first.keys() == second.keys() and first != second
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from json_stream import IncrementalJSONParser, JSONStreamError, json_schema, validate
+
+SCHEMA = {"summary": None, "items": [], "details": {}}
+OBJECT = {"summary": "uses {braces}, \"quotes\" and commas", "items": [1, [2, 3]], "details": {"a": {"b": "}"}}}
+
+
+def feed_in_pieces(parser, text, size):
+    for start in range(0, len(text), size):
+        if parser.feed(text[start:start + size]):
+            return True
+    return False
+
+
+@pytest.mark.parametrize('size', [1, 2, 5, 17, 10000])
+def test_members_are_reported_as_they_complete(size):
+    seen = []
+    parser = IncrementalJSONParser(schema=SCHEMA, on_member=lambda key, value: seen.append(key))
+    assert feed_in_pieces(parser, "Here you go:\n```json\n" + json.dumps(OBJECT) + "\n```", size)
+    assert parser.done
+    assert parser.result == OBJECT
+    assert seen == ['summary', 'items', 'details']
+
+
+def test_stops_at_the_closing_brace():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": 1}')
+    # Text after the object is never looked at
+    assert parser.feed('{"b": not json')
+    assert parser.result == {"a": 1}
+
+
+def test_unknown_keys_are_ignored_unless_strict():
+    text = json.dumps(dict(OBJECT, title="extra"))
+    parser = IncrementalJSONParser(schema=SCHEMA)
+    assert feed_in_pieces(parser, text, 3)
+    assert parser.result == OBJECT
+
+    strict = IncrementalJSONParser(schema=SCHEMA, strict=True)
+    with pytest.raises(JSONStreamError, match="Unexpected key 'title'"):
+        feed_in_pieces(strict, text, 3)
+
+
+def test_invalid_member_fails_before_the_object_ends():
+    parser = IncrementalJSONParser(schema=SCHEMA)
+    with pytest.raises(JSONStreamError):
+        parser.feed('{"summary": "ok", "items": "not a list",')
+
+
+def test_missing_keys_fail_at_the_end():
+    parser = IncrementalJSONParser(schema=SCHEMA)
+    with pytest.raises(JSONStreamError, match='details'):
+        parser.feed('{"summary": "ok", "items": []}')
+
+
+def test_preamble_limit_spans_pieces():
+    parser = IncrementalJSONParser(max_preamble_chars=10)
+    parser.feed('x' * 6)
+    with pytest.raises(JSONStreamError):
+        parser.feed('y' * 6)
+
+
+def test_reset_discards_partial_output():
+    parser = IncrementalJSONParser(schema={"a": None})
+    parser.feed('{"a": "first attem')
+    parser.reset()
+    assert parser.feed('{"a": "second"}')
+    assert parser.result == {"a": "second"}
+
+
+def test_validate_strict_only_rejects_extra_keys():
+    validate({"a": 1, "b": {"x": 1, "y": 2}}, {"a": None, "b": {}})
+    validate({"a": 1, "b": {"x": 1, "y": 2}}, {"a": None, "b": {}}, strict=True)
+    with pytest.raises(JSONStreamError, match="unexpected keys 'c'"):
+        validate({"a": 1, "b": {}, "c": 3}, {"a": None, "b": {}}, strict=True)
+
+
+def test_json_schema_of_template():
+    assert json_schema({"a": None, "b": [], "c": {}}, strict=True) == {
+        "type": "object",
+        "properties": {"a": {}, "b": {"type": "array"}, "c": {"type": "object"}},
+        "required": ["a", "b", "c"],
+        "additionalProperties": False,
+    }
+    assert "additionalProperties" not in json_schema({"a": None})
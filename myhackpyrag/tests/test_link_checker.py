@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from link_checker import LinkChecker, check_urls, extract_urls, is_broken
+
+SLOW_SECONDS = 0.3
+
+
+class Server:
+    """
+    State behind a handler with redirects, a HEAD-refusing page and slow pages that
+    record how many requests were in flight at once
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.methods = []
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self._respond('HEAD')
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def _respond(self, method):
+                server.methods.append((method, self.path))
+                if self.path == '/redirect':
+                    return self._send(301, location='/hop')
+                if self.path == '/hop':
+                    return self._send(302, location='/ok')
+                if self.path in ('/loop-a', '/loop-b'):
+                    return self._send(302, location='/loop-b' if self.path == '/loop-a' else '/loop-a')
+                if self.path == '/no-head' and method == 'HEAD':
+                    return self._send(405)
+                if self.path == '/missing':
+                    return self._send(404)
+                if self.path.startswith('/slow'):
+                    with server.lock:
+                        server.in_flight += 1
+                        server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    time.sleep(SLOW_SECONDS)
+                    with server.lock:
+                        server.in_flight -= 1
+                self._send(200, body=b'page' if method == 'GET' else b'')
+
+            def _send(self, status, location=None, body=b''):
+                self.send_response(status)
+                if location:
+                    self.send_header('Location', location)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+@pytest.fixture
+def server(http_server):
+    state = Server()
+    state.url = http_server(state.handler())
+    return state
+
+
+def check(urls, **options):
+    return asyncio.run(check_urls(urls, **options))
+
+
+def test_redirects_are_followed_and_recorded(server):
+    result = check([f"{server.url}/redirect"])[f"{server.url}/redirect"]
+    assert result['ok'] and result['status'] == 200 and result['method'] == 'HEAD'
+    assert result['final_url'] == f"{server.url}/ok"
+    assert result['redirects'] == [{'status': 301, 'url': f"{server.url}/hop"},
+                                   {'status': 302, 'url': f"{server.url}/ok"}]
+
+
+def test_redirect_loop_is_an_error(server):
+    result = check([f"{server.url}/loop-a"])[f"{server.url}/loop-a"]
+    assert not result['ok'] and result['error_type'] == 'TooManyRedirects'
+    assert is_broken(result)
+
+
+def test_too_many_redirects(server):
+    result = check([f"{server.url}/redirect"], max_redirects=1)[f"{server.url}/redirect"]
+    assert result['error_type'] == 'TooManyRedirects'
+
+
+def test_head_refused_falls_back_to_get(server):
+    result = check([f"{server.url}/no-head"])[f"{server.url}/no-head"]
+    assert result['ok'] and result['method'] == 'GET'
+    assert server.methods == [('HEAD', '/no-head'), ('GET', '/no-head')]
+
+
+def test_missing_page_is_broken(server):
+    result = check([f"{server.url}/missing"])[f"{server.url}/missing"]
+    assert result['status'] == 404 and result['method'] == 'GET'
+    assert is_broken(result)
+
+
+def test_results_are_cached_and_shared(server):
+    async def run():
+        checker = LinkChecker()
+        try:
+            url = f"{server.url}/ok"
+            first, second = await asyncio.gather(checker.check(url), checker.check(url))
+            third = await checker.check(url)
+            return checker.requests, first, second, third
+        finally:
+            await checker.aclose()
+
+    requests, first, second, third = asyncio.run(run())
+    assert requests == 1
+    assert first['ok'] and second['ok'] and third['cached']
+
+
+def test_per_host_limit(server):
+    check([f"{server.url}/slow{i}" for i in range(6)], per_host=2, max_concurrency=10)
+    assert server.max_in_flight == 2
+
+
+def test_global_limit_across_hosts(server):
+    other_host = server.url.replace('127.0.0.1', 'localhost')
+    urls = [f"{base}/slow{i}" for base in (server.url, other_host) for i in range(4)]
+    check(urls, per_host=10, max_concurrency=3)
+    assert server.max_in_flight == 3
+
+
+def test_busy_host_does_not_hold_global_slots(server):
+    fast_url = f"{server.url.replace('127.0.0.1', 'localhost')}/ok"
+
+    async def run():
+        checker = LinkChecker(per_host=1, max_concurrency=2)
+        try:
+            slow = asyncio.ensure_future(checker.check_all([f"{server.url}/slow{i}" for i in range(4)]))
+            await asyncio.sleep(0.05)
+            fast = await checker.check(fast_url)
+            await slow
+            return fast
+        finally:
+            await checker.aclose()
+
+    assert asyncio.run(run())['seconds'] < SLOW_SECONDS
+
+
+def test_extract_urls():
+    text = "See https://example.com/a, (http://example.org/b) and https://example.com/a."
+    assert extract_urls(text) == ['https://example.com/a', 'http://example.org/b']
@@ -0,0 +1,93 @@
+import json
+import threading
+
+import pytest
+
+from metrics_store import DEFAULT_RUBRIC, MetricsStore
+
+
+def metric(title, weightage=10):
+    return {'title': title, 'description': f"{title} description", 'weightage': weightage,
+            'evaluationFactors': [f"{title} factor"]}
+
+
+def write_metrics(path, metrics):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'metrics': metrics}, f)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetricsStore(str(tmp_path / 'metrics.sqlite3'), json_path=None)
+    yield store
+    store.close()
+
+
+def test_named_set_import_and_export(store, tmp_path):
+    source = tmp_path / 'hackathon.json'
+    write_metrics(source, [metric('Design'), metric('Impact', 20)])
+    rubric = store.import_json(str(source), 'hackathon')
+    assert (rubric.id, rubric.titles) == ('hackathon@v1', ['Design', 'Impact'])
+    assert store.rubric_sets() == ['hackathon']
+
+    # Importing the same metrics again adds no version
+    assert store.import_json(str(source), 'hackathon').version == 1
+
+    store.add_metric(metric('Polish'), 'hackathon')
+    exported = tmp_path / 'out.json'
+    assert store.export_json('hackathon', str(exported)).version == 2
+    with open(exported, encoding='utf-8') as f:
+        assert [entry['title'] for entry in json.load(f)['metrics']] == ['Design', 'Impact', 'Polish']
+
+    store.export_json('hackathon', str(exported), version=1)
+    with open(exported, encoding='utf-8') as f:
+        assert [entry['title'] for entry in json.load(f)['metrics']] == ['Design', 'Impact']
+
+
+def test_export_of_unknown_set_fails(store, tmp_path):
+    with pytest.raises(KeyError):
+        store.export_json('missing', str(tmp_path / 'out.json'))
+
+
+def test_default_set_follows_metrics_json(tmp_path):
+    json_path = tmp_path / 'metrics.json'
+    write_metrics(json_path, [metric('Design')])
+    store = MetricsStore(str(tmp_path / 'metrics.sqlite3'), json_path=str(json_path))
+    try:
+        assert store.get_rubric().titles == ['Design']
+        store.add_metric(metric('Impact'))
+        with open(json_path, encoding='utf-8') as f:
+            assert [entry['title'] for entry in json.load(f)['metrics']] == ['Design', 'Impact']
+        # Named sets never touch metrics.json
+        store.add_metric(metric('Other'), 'hackathon')
+        assert store.get_rubric(DEFAULT_RUBRIC).titles == ['Design', 'Impact']
+    finally:
+        store.close()
+
+
+def test_concurrent_add_metric_loses_nothing(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    stores = [MetricsStore(path, json_path=None) for _ in range(4)]
+    errors = []
+
+    def add(store, judge):
+        try:
+            for i in range(10):
+                store.add_metric(metric(f"judge{judge}-{i}"), 'shared')
+        except Exception as e:
+            errors.append(e)
+
+    # Several threads per connection and several connections (as separate processes would have)
+    threads = [threading.Thread(target=add, args=(stores[judge % len(stores)], judge)) for judge in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert not errors
+        rubric = stores[0].get_rubric('shared')
+        assert len(rubric.metrics) == 80 and len(set(rubric.titles)) == 80
+        assert rubric.version == 80
+    finally:
+        for store in stores:
+            store.close()
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+import model_tiers
+from json_stream import JSONStreamError
+from model_tiers import LARGE, SMALL, ModelTiers, configure_tiers, get_default_tiers
+
+
+def responder(replies):
+    """
+    Request function answering each model from replies ({model: value or exception}), logging the calls
+    """
+    calls = []
+
+    async def request(model):
+        calls.append(model)
+        reply = replies[model]
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    return request, calls
+
+
+def by_model(tiers, **kwargs):
+    return {row['model']: row for row in tiers.stats(**kwargs)}
+
+
+def test_route():
+    tiers = ModelTiers('tiny', 'big')
+    assert tiers.route('chunk') == [(SMALL, 'tiny'), (LARGE, 'big')]
+    assert tiers.route('evaluation') == [(LARGE, 'big')]
+    assert tiers.route('unknown') == [(LARGE, 'big')]
+    assert tiers.route('chunk', model='other') == [(SMALL, 'other')]
+    assert ModelTiers('tiny', 'big', escalate=False).route('chunk') == [(SMALL, 'tiny')]
+    assert ModelTiers('same', 'same').route('chunk') == [(SMALL, 'same')]
+    assert ModelTiers('tiny', 'big', stages={'evaluation': SMALL}).tier('evaluation') == SMALL
+    assert tiers.label() == 'tiny+big' and ModelTiers('same', 'same').label() == 'same'
+
+
+def test_valid_small_output_does_not_escalate():
+    tiers = ModelTiers('tiny', 'big')
+    request, calls = responder({'tiny': 'ok', 'big': 'unused'})
+    assert asyncio.run(tiers.call('chunk', request)) == 'ok'
+    assert calls == ['tiny']
+    assert by_model(tiers)['tiny']['escalations'] == 0
+
+
+def test_invalid_small_output_escalates():
+    tiers = ModelTiers('tiny', 'big')
+    request, calls = responder({'tiny': JSONStreamError('not JSON'), 'big': 'ok'})
+    assert asyncio.run(tiers.call('summary', request)) == 'ok'
+    assert calls == ['tiny', 'big']
+    stats = by_model(tiers)
+    assert stats['tiny']['calls'] == 1 and stats['tiny']['invalid'] == 1 and stats['tiny']['escalations'] == 1
+    assert stats['tiny']['escalation_rate'] == 1.0
+    assert stats['big']['calls'] == 1 and stats['big']['invalid'] == 0
+
+
+def test_last_error_is_raised():
+    tiers = ModelTiers('tiny', 'big')
+    request, calls = responder({'tiny': ValueError('small'), 'big': ValueError('large')})
+    with pytest.raises(ValueError, match='large'):
+        asyncio.run(tiers.call('chunk', request))
+    assert calls == ['tiny', 'big']
+    assert by_model(tiers)['big']['invalid'] == 1 and by_model(tiers)['big']['escalations'] == 0
+
+
+def test_other_errors_do_not_escalate():
+    tiers = ModelTiers('tiny', 'big')
+    request, calls = responder({'tiny': ConnectionError('down'), 'big': 'ok'})
+    with pytest.raises(ConnectionError):
+        asyncio.run(tiers.call('chunk', request))
+    assert calls == ['tiny']
+
+
+@pytest.mark.parametrize('tiers, model, expected', [
+    (ModelTiers('tiny', 'big', escalate=False), None, ['tiny']),
+    (ModelTiers('same', 'same'), None, ['same']),
+    (ModelTiers('tiny', 'big'), 'tiny', ['tiny']),
+])
+def test_single_model_routes_raise_at_once(tiers, model, expected):
+    request, calls = responder({'tiny': ValueError('bad'), 'big': 'ok', 'same': ValueError('bad')})
+    with pytest.raises(ValueError):
+        asyncio.run(tiers.call('chunk', request, model=model))
+    assert calls == expected
+
+
+def test_stats_by_stage_and_reset():
+    tiers = ModelTiers('tiny', 'big')
+    request, _ = responder({'tiny': ValueError('bad'), 'big': 'ok'})
+    asyncio.run(tiers.call('chunk', request))
+    asyncio.run(tiers.call('evaluation', request))
+    rows = tiers.stats()
+    assert [(row['tier'], row['model'], row['calls']) for row in rows] == [(SMALL, 'tiny', 1), (LARGE, 'big', 2)]
+    stages = {(row['model'], row['stage']): row['calls'] for row in tiers.stats(by_stage=True)}
+    assert stages == {('tiny', 'chunk'): 1, ('big', 'chunk'): 1, ('big', 'evaluation'): 1}
+    assert 'small (tiny): 1 calls' in tiers.format_stats() and '1 escalated (100%)' in tiers.format_stats()
+    tiers.reset_stats()
+    assert tiers.stats() == [] and tiers.format_stats() == ''
+
+
+def test_configure_tiers(monkeypatch):
+    monkeypatch.setattr(model_tiers, '_default_tiers', None)
+    monkeypatch.setenv('EVALBUDDY_SMALL_MODEL', 'tiny')
+    monkeypatch.delenv('EVALBUDDY_LARGE_MODEL', raising=False)
+    tiers = get_default_tiers()
+    assert tiers.models == {SMALL: 'tiny', LARGE: model_tiers.DEFAULT_MODEL}
+    assert configure_tiers(large='big', escalate=False) is tiers
+    assert tiers.models == {SMALL: 'tiny', LARGE: 'big'} and tiers.route('chunk') == [(SMALL, 'tiny')]
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from metrics_store import MetricsStore
+from results_store import ResultsStore, parse_score, weighted_scores
+
+
+@pytest.fixture
+def rubric(tmp_path):
+    store = MetricsStore(str(tmp_path / 'metrics.sqlite3'), json_path=None)
+    rubric = store.save_rubric('hackathon', [
+        {'title': 'Design', 'description': 'd', 'weightage': 30, 'evaluationFactors': []},
+        {'title': 'Impact', 'description': 'i', 'weightage': 10, 'evaluationFactors': []},
+    ])
+    store.close()
+    return rubric
+
+
+@pytest.fixture
+def results(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite3'))
+    yield store
+    store.close()
+
+
+def evaluation(design, impact):
+    return {'Design': {'score': design, 'justification': ''}, 'Impact': {'score': impact, 'justification': ''}}
+
+
+def test_parse_score():
+    assert parse_score('7') == 7.0 and parse_score(8) == 8.0
+    assert parse_score('seven') is None and parse_score(None) is None and parse_score('nan') is None
+
+
+def test_weighted_scores():
+    scores = np.array([[8, 4], [6, 8], [np.nan, 2], [np.nan, np.nan]])
+    totals, normalized, normalized_totals, ranks = weighted_scores(scores, np.array([3, 1]))
+    # Missing metrics are left out of the weighted mean
+    assert totals[:3] == pytest.approx([7.0, 6.5, 2.0])
+    assert np.isnan(totals[3])
+    # Normalized per metric over the scores present
+    assert normalized[:2, 0] == pytest.approx([1.0, 0.0])
+    assert normalized[:3, 1] == pytest.approx([1 / 3, 1.0, 0.0])
+    assert normalized_totals[:3] == pytest.approx([(3 * 1.0 + 1 / 3) / 4, 1.0 / 4, 0.0])
+    assert list(ranks) == [1, 2, 3, 4]
+
+
+def test_ties_share_the_better_rank():
+    _, _, _, ranks = weighted_scores(np.array([[5.0], [7.0], [5.0]]), np.array([1.0]))
+    assert list(ranks) == [2, 1, 2]
+
+
+def test_leaderboard(results, rubric):
+    results.record('a', rubric, 'm', evaluation(6, 10))
+    results.record('b', rubric, 'm', evaluation(9, 0))
+    results.record('c', rubric, 'm', evaluation('n/a', 5))
+    board = results.leaderboard(rubric, 'm')
+    # a: (6 * 30 + 10 * 10) / 40, b: (9 * 30 + 0) / 40, c: only Impact has a number
+    assert list(board['submission']) == ['a', 'b', 'c']
+    assert board['total'].tolist() == pytest.approx([7.0, 6.75, 5.0])
+    assert list(board['rank']) == [1, 2, 3]
+    assert board['percentile'].tolist() == pytest.approx([100.0, 200 / 3, 100 / 3])
+
+
+def test_leaderboard_and_cohort_follow_new_results(results, rubric):
+    results.record('a', rubric, 'm', evaluation(4, 4))
+    first = results.leaderboard(rubric, 'm')
+    cohort = results.cohort_percentiles(rubric, 'm')
+    assert cohort.loc['Design', 'p50'] == 4 and cohort.loc['Design', 'count'] == 1
+    # Unchanged results reuse the cached objects
+    assert results.cohort_percentiles(rubric, 'm') is cohort
+    first.loc[0, 'total'] = -1
+    assert results.leaderboard(rubric, 'm').loc[0, 'total'] == 4
+
+    results.record('b', rubric, 'm', evaluation(8, 8))
+    assert len(results.leaderboard(rubric, 'm')) == 2
+    cohort = results.cohort_percentiles(rubric, 'm')
+    assert cohort.loc['Design', 'p50'] == 6 and cohort.loc['Design', 'count'] == 2
+
+    # Replacing a result invalidates too
+    results.record('b', rubric, 'm', evaluation(2, 2))
+    assert results.leaderboard(rubric, 'm')['submission'].tolist() == ['a', 'b']
+
+
+def test_cohort_is_shared_through_the_database(tmp_path, rubric):
+    path = str(tmp_path / 'results.sqlite3')
+    writer, reader = ResultsStore(path), ResultsStore(path)
+    try:
+        writer.record('a', rubric, 'm', evaluation(4, 6))
+        assert writer.cohort_percentiles(rubric, 'm').loc['Impact', 'p50'] == 6
+        assert reader.cohort_percentiles(rubric, 'm').loc['Impact', 'p50'] == 6
+        assert reader.cohort_percentiles(rubric, 'other-model') is None
+    finally:
+        writer.close()
+        reader.close()
@@ -0,0 +1,23 @@
+import numpy as np
+
+from retrieval import hash_embed
+
+
+def test_deterministic_and_normalized():
+    first = hash_embed(["def get_llm_response(prompt):", "class VectorIndex:"], dim=64)
+    second = hash_embed(["def get_llm_response(prompt):", "class VectorIndex:"], dim=64)
+    assert first.shape == (2, 64) and first.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+
+
+def test_empty_text_is_a_zero_vector():
+    vectors = hash_embed(["", "!!!"], dim=32)
+    assert not vectors.any()
+
+
+def test_identifier_parts_are_shared_features():
+    query, related, unrelated = hash_embed(["LLM response", "get_llm_response", "numpy matrix multiply"])
+    assert float(query @ related) > float(query @ unrelated)
+    camel, snake = hash_embed(["vectorIndex", "vector_index"])
+    assert float(camel @ snake) > 0.5
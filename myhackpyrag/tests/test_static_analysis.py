@@ -0,0 +1,50 @@
+from ingest import FileRecord
+from static_analysis import analyze_file, analyze_records, format_facts, merge_facts
+
+PYTHON = '''
+import requests
+
+def simple(x):
+    return x
+
+def branchy(items):
+    for item in items:
+        if item and item > 1:
+            yield item
+'''
+JAVASCRIPT = "\n".join(f"function f{i}(x) {{ if (x) {{ return x; }} return 0; }}" for i in range(30))
+HTML = "<p>" + " ".join("if you want it, for a while" for _ in range(20)) + "</p>"
+
+
+def records(files):
+    return [FileRecord(path, content, len(content)) for path, content in files.items()]
+
+
+def test_python_functions_are_measured():
+    facts = analyze_file('app.py', PYTHON)
+    assert dict(facts['functions']) == {'simple': 1, 'branchy': 4}
+    assert facts['imports'] == ['requests']
+
+
+def test_unparsed_languages_do_not_count_towards_complexity():
+    facts = analyze_records(records({'app.js': JAVASCRIPT, 'index.html': HTML}))
+    assert set(facts['languages']) == {'JavaScript', 'HTML'}
+    assert facts['complexity']['functions'] == 0
+    assert facts['complexity']['level'] is None
+    assert 'Cyclomatic complexity' not in format_facts(facts)
+
+    facts = analyze_records(records({'app.py': PYTHON, 'app.js': JAVASCRIPT, 'index.html': HTML}))
+    assert facts['complexity']['functions'] == 2
+    assert facts['complexity']['level'] == 'low'
+
+
+def test_level_is_only_overridden_when_measured():
+    analysis = {'technologies': {'languages': ['JavaScript']},
+                'complexity_analysis': {'level': 'medium', 'explanation': 'A few modules.'}}
+    merged = merge_facts(analysis, analyze_records(records({'app.js': JAVASCRIPT})))
+    assert merged['complexity_analysis']['level'] == 'medium'
+    assert 'functions' not in merged['complexity_analysis']['explanation']
+
+    merged = merge_facts(analysis, analyze_records(records({'app.py': PYTHON})))
+    assert merged['complexity_analysis']['level'] == 'low'
+    assert merged['technologies']['languages'] == ['Python', 'JavaScript']
@@ -0,0 +1,246 @@
+# tracing.py
+"""
+Lightweight tracing and metrics.
+
+Stages are wrapped in nested spans (`with span('ingest'): ...`); the parent
+of a span is tracked with a context variable, so spans opened inside asyncio
+tasks nest under the span that started them. Counters and observations
+(`count`, `observe`) collect numbers such as bytes ingested or LLM tokens per
+second. Finished spans can be written as JSON lines and all metrics rendered
+in the Prometheus text format.
+
+Tracing is off unless enable() is called or EVALBUDDY_TRACE is set. While it
+is off span() returns a shared no-op object and count/observe return at once.
+"""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Finished spans kept in memory for export; older ones are dropped
+DEFAULT_MAX_SPANS = 10000
+METRIC_PREFIX = 'evalbuddy_'
+
+_enabled = bool(os.environ.get('EVALBUDDY_TRACE'))
+_current_span = contextvars.ContextVar('current_span', default=None)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_spans = deque(maxlen=DEFAULT_MAX_SPANS)
+_counters = {}
+_observations = {}
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """
+    Drop all recorded spans and metrics
+    """
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _observations.clear()
+
+
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.id = next(_ids)
+        parent = _current_span.get()
+        self.parent = parent.id if parent is not None else None
+        self._token = None
+        self._start = None
+        self.started = None
+
+    def set(self, **attrs):
+        """
+        Add attributes, e.g. sizes only known once the stage has run
+        """
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        record = {'name': self.name, 'id': self.id, 'parent': self.parent, 'start': self.started,
+                  'duration': duration, 'attrs': self.attrs}
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        with _lock:
+            _spans.append(record)
+            _add_observation('span_seconds', duration, {'span': self.name})
+        return False
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **attrs):
+    """
+    Context manager timing one stage; nested spans record their parent
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+
+def count(name, value=1, **labels):
+    """
+    Add value to a counter, e.g. count('files_skipped', reason='binary')
+    """
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """
+    Record one measurement, e.g. observe('llm_tokens_per_second', 41.2, model='llama3.2')
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _add_observation(name, value, labels)
+
+
+def _add_observation(name, value, labels):
+    # Caller holds the lock
+    key = (name, tuple(sorted(labels.items())))
+    entry = _observations.get(key)
+    if entry is None:
+        _observations[key] = [1, value, value]
+    else:
+        entry[0] += 1
+        entry[1] += value
+        entry[2] = max(entry[2], value)
+
+
+def spans():
+    with _lock:
+        return list(_spans)
+
+
+def collect():
+    """
+    Return and clear everything recorded so far, e.g. to send it from a worker process to merge()
+    """
+    with _lock:
+        data = {'spans': list(_spans), 'counters': list(_counters.items()),
+                'observations': list(_observations.items())}
+    reset()
+    return data
+
+
+def merge(data):
+    """
+    Add the output of collect() from another process. Its top-level spans become
+    children of the current span.
+    """
+    if not _enabled or not data:
+        return
+    current = _current_span.get()
+    new_ids = {}
+    with _lock:
+        for record in data['spans']:
+            new_ids[record['id']] = next(_ids)
+        for record in data['spans']:
+            parent = new_ids.get(record['parent'], current.id if current is not None else None)
+            _spans.append(dict(record, id=new_ids[record['id']], parent=parent))
+        for key, value in data['counters']:
+            _counters[key] = _counters.get(key, 0) + value
+        for key, (n, total, maximum) in data['observations']:
+            entry = _observations.setdefault(key, [0, 0, maximum])
+            entry[0] += n
+            entry[1] += total
+            entry[2] = max(entry[2], maximum)
+
+
+def export_jsonl(path):
+    """
+    Append the finished spans to a JSON lines file and return how many were written
+    """
+    records = spans()
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + '\n')
+    return len(records)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def prometheus_text():
+    """
+    Render counters and observations in the Prometheus text exposition format
+
+    Counters become <name>_total; observations become a summary (<name>_count and
+    <name>_sum) plus a <name>_max gauge.
+    """
+    with _lock:
+        counters = sorted(_counters.items())
+        observations = sorted(_observations.items())
+    lines = []
+    declared = set()
+
+    def declare(metric, kind):
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} {kind}")
+
+    for (name, labels), value in counters:
+        metric = f"{METRIC_PREFIX}{name}_total"
+        declare(metric, 'counter')
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+    for (name, labels), (n, total, _) in observations:
+        metric = f"{METRIC_PREFIX}{name}"
+        declare(metric, 'summary')
+        lines.append(f"{metric}_count{_format_labels(labels)} {n}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+    for (name, labels), (_, _, maximum) in observations:
+        metric = f"{METRIC_PREFIX}{name}_max"
+        declare(metric, 'gauge')
+        lines.append(f"{metric}{_format_labels(labels)} {maximum}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())